@@ -12,6 +12,9 @@ from auth import AuthManager
 from language_utils import get_text, get_current_language
 from voice_assistant import VoiceAssistant, render_voice_controls
 from database import Database
+from pagination import paginate, PAGE_SIZE
+import map_clustering
+import map_render_cache
 import folium
 from streamlit_folium import st_folium
 import requests
@@ -381,11 +384,12 @@ class AdditionalFeatures:
         with col2:
             pesticide_type = st.selectbox("Type", ["All", "Herbicide", "Insecticide", "Fungicide", "Bactericide"])
         
-        # Search pesticides
-        if search_term:
-            pesticides = self.db.search_pesticides(search_term)
-        else:
-            pesticides = self.db.search_pesticides("")  # Get all pesticides
+        # Search pesticides, one page at a time
+        pesticides = paginate(
+            "pesticide_info_page",
+            lambda after: self.db.get_pesticides_page(search_term, after, PAGE_SIZE),
+            reset_on=search_term
+        )
         
         # Display pesticides
         if pesticides:
@@ -489,47 +493,60 @@ class AdditionalFeatures:
             if st.button("Search Shops"):
                 st.info("Searching for nearby shops...")
         
-        # Get shops from database
-        shops = self.db.get_pesticide_shops()
-        
-        if shops:
-            # Create map centered on India (default)
-            m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
-            
-            # Add shop markers
-            for shop in shops:
-                if shop[2] and shop[3]:  # If lat/lng available
-                    folium.Marker(
-                        location=[shop[2], shop[3]],
-                        popup=f"""
-                        <b>{shop[0]}</b><br>
-                        {shop[1]}<br>
-                        📞 {shop[4]}
-                        """,
-                        tooltip=shop[0],
-                        icon=folium.Icon(color='red', icon='shopping-cart', prefix='fa')
-                    ).add_to(m)
+        # Get the current page of shops from database
+        shops = paginate(
+            "shops_map_page",
+            lambda after: self.db.get_pesticide_shops_page(location, after, PAGE_SIZE),
+            reset_on=location
+        )
+        
+        # Every matching shop goes on the map, clustered server-side for the
+        # view the user last panned/zoomed to, so the page stays small
+        index = self.db.get_shop_cluster_index(location)
+        if len(index):
+            # Centered on India until the map reports its view
+            center, zoom, view = [20.5937, 78.9629], 5, None
+            map_state = st.session_state.get("shops_cluster_map")
+            if st.session_state.get("shops_cluster_map_search") == location and map_state and map_state.get('zoom'):
+                view = map_clustering.parse_leaflet_bounds(map_state.get('bounds'))
+                if view and map_state.get('center'):
+                    center = [map_state['center']['lat'], map_state['center']['lng']]
+                    zoom = map_state['zoom']
+            st.session_state.shops_cluster_map_search = location
             
-            # Display map
-            st_data = st_folium(m, width=700, height=500)
+            # The map stays an st_folium widget (its view drives re-clustering),
+            # so the cluster GeoJSON is what gets cached across reruns
+            # (view widened to 0.01 degrees so nearby views share an entry)
+            if view:
+                view = (np.floor(view[0] * 100) / 100, np.floor(view[1] * 100) / 100,
+                        np.ceil(view[2] * 100) / 100, np.ceil(view[3] * 100) / 100)
+            key = map_render_cache.map_key('shops_overview', center[0], center[1], None,
+                                           self.db.get_shops_version(), zoom, location, view)
+            clusters = map_render_cache.get_cache().get_or_render(key, lambda: index.to_geojson(zoom, view))
             
+            m = folium.Map(location=center, zoom_start=zoom)
+            map_clustering.add_cluster_layer(m, clusters)
+            st_data = st_folium(m, width=700, height=500, key="shops_cluster_map")
+            st.caption(f"{len(index):,} shops - zoom in to split clusters")
+        
+        if shops:
             # Shop list
             st.markdown("### Shop List")
             
-            for i, shop in enumerate(shops):
-                with st.expander(f"{shop[0]}"):
+            for shop in shops:
+                with st.expander(f"{shop[1]}"):
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        st.markdown(f"**Address:** {shop[1]}")
-                        st.markdown(f"**Contact:** {shop[4]}")
+                        st.markdown(f"**Address:** {shop[3]}")
+                        st.markdown(f"**Contact:** {shop[9]}")
                     
                     with col2:
-                        if st.button(f"Call - {shop[0]}", key=f"call_{i}"):
-                            st.info(f"Calling {shop[4]}...")
-                        if st.button(f"Directions - {shop[0]}", key=f"dir_{i}"):
+                        if st.button(f"Call - {shop[1]}", key=f"call_{shop[0]}"):
+                            st.info(f"Calling {shop[9]}...")
+                        if st.button(f"Directions - {shop[1]}", key=f"dir_{shop[0]}"):
                             st.info("Opening maps for directions...")
-                        if st.button(f"Rate - {shop[0]}", key=f"rate_{i}"):
+                        if st.button(f"Rate - {shop[1]}", key=f"rate_{shop[0]}"):
                             st.info("Rate this shop")
         else:
             st.warning("No shops available in database. Please check back later.")
@@ -628,7 +645,18 @@ class AdditionalFeatures:
         # Prediction History
         st.markdown("### Your Prediction History")
         
-        history = self.db.get_prediction_history(user['id'], 10)
+        summary = self.db.get_user_prediction_summary(user['id'])
+        if summary:
+            cols = st.columns(len(summary))
+            for col, (prediction_type, count, last_at, last_result) in zip(cols, summary):
+                with col:
+                    st.metric(f"{prediction_type.title()} Predictions", count, help=f"Last: {last_result} ({last_at})")
+        
+        history = paginate(
+            "profile_history_page",
+            lambda before: self.db.get_prediction_history_page(user['id'], before, 10),
+            reset_on=user['id']
+        )
         
         if history:
             # Create DataFrame for better display
@@ -646,6 +674,9 @@ class AdditionalFeatures:
         else:
             st.info("📝 No predictions yet. Try our AI models!")
         
+        # Harvest feedback for the online models
+        self.show_prediction_feedback(user)
+        
         # AI Chatbot Section
         self.show_ai_chatbot()
         
@@ -658,6 +689,52 @@ class AdditionalFeatures:
                 auth_manager = AuthManager()
                 auth_manager.logout()
     
+    def show_prediction_feedback(self, user):
+        """Let farmers confirm or correct past crop and yield predictions"""
+        predictions = self.db.get_predictions_for_feedback(user['id'])
+        if not predictions:
+            return
+        
+        st.markdown("### Confirm or Correct After Harvest")
+        st.caption("Your feedback helps our models learn from real harvests.")
+        
+        options = {
+            f"{p[4]} - {p[1].title()}: {p[3]}" + (" (feedback given)" if p[5] is not None else ""): p
+            for p in predictions
+        }
+        selected = st.selectbox("Select a prediction", list(options.keys()), key="feedback_prediction")
+        prediction_id, prediction_type, _, result, _, actual_result, _ = options[selected]
+        
+        with st.form("prediction_feedback"):
+            outcome = st.radio("Was this prediction right?", ["Yes, it was correct", "No, let me correct it"], horizontal=True)
+            
+            if prediction_type == 'crop':
+                from crop_fallback import CropFallbackRecommender
+                crops = list(CropFallbackRecommender().crops)
+                default_crop = actual_result if actual_result in crops else result
+                corrected = st.selectbox("Crop that actually did best", crops,
+                                         index=crops.index(default_crop) if default_crop in crops else 0)
+            else:
+                from online_learning import parse_yield
+                try:
+                    default_yield = parse_yield(actual_result if actual_result is not None else result)
+                except ValueError:
+                    default_yield = 0.0
+                corrected = st.number_input("Actual yield (tons/ha)", min_value=0.0, value=default_yield, step=0.1)
+            
+            if st.form_submit_button("Submit Feedback"):
+                if outcome.startswith("Yes"):
+                    actual = result
+                elif prediction_type == 'yield':
+                    actual = f"{corrected:.2f} tons/ha"
+                else:
+                    actual = corrected
+                
+                if self.db.save_feedback(user['id'], prediction_id, actual):
+                    st.success("Thank you! Your feedback will be used in the next model update.")
+                else:
+                    st.error("Could not save feedback for this prediction.")
+    
     def show_ai_chatbot(self):
         """Display AI chatbot for farmer support"""
         st.markdown("""
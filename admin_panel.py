@@ -2,7 +2,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from database import Database
+import model_registry
+import model_evaluation
+import query_monitor
+import shop_import
+import history_archive
+import db_backup
+import db_maintenance
+from pagination import paginate, PAGE_SIZE
 import hashlib
+import io
 from datetime import datetime
 
 class AdminPanel:
@@ -96,7 +105,7 @@ class AdminPanel:
         menu = st.sidebar.selectbox(
             "Admin Menu",
             ["Dashboard", "Farmers Management", "Model Management", "Schemes Management", 
-             "Pesticide Management", "Shop Management", "Analytics", "Settings"]
+             "Pesticide Management", "Shop Management", "Analytics", "Query Performance", "Settings"]
         )
         
         if menu == "Dashboard":
@@ -113,6 +122,8 @@ class AdminPanel:
             self.show_shop_management()
         elif menu == "Analytics":
             self.show_analytics()
+        elif menu == "Query Performance":
+            self.show_query_performance()
         elif menu == "Settings":
             self.show_settings()
     
@@ -126,7 +137,8 @@ class AdminPanel:
         with col1:
             st.metric("Total Farmers", "1,247", "+12%")
         with col2:
-            st.metric("Predictions Today", "89", "+5%")
+            today_counts = self.db.get_prediction_type_counts(days=0)
+            st.metric("Predictions Today", f"{sum(count for _, count in today_counts):,}")
         with col3:
             st.metric("Active Schemes", "18", "+2")
         with col4:
@@ -164,7 +176,12 @@ class AdminPanel:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.success("All Models Operational")
+            if not model_registry.is_ready():
+                st.info("Models warming up...")
+            elif model_registry.get_load_errors():
+                st.warning(f"Models unavailable: {', '.join(model_registry.get_load_errors())}")
+            else:
+                st.success("All Models Operational")
             st.info("Database: Connected")
         
         with col2:
@@ -173,7 +190,11 @@ class AdminPanel:
         
         with col3:
             st.warning("High Traffic Alert")
-            st.info("Last Backup: 2 hours ago")
+            backups = db_backup.get_backup_history(limit=1)
+            if backups:
+                st.info(f"Last Backup: {backups[0][0]} ({backups[0][2]})")
+            else:
+                st.info("Last Backup: never")
     
     def show_farmers_management(self):
         """Show farmers management interface"""
@@ -228,30 +249,60 @@ class AdminPanel:
         """Show ML model management interface"""
         st.markdown("### Model Management")
         
-        # Model Status
-        models = [
-            {"Name": "Crop Recommendation", "Version": "2.1.0", "Accuracy": "92%", "Status": "Active", "Last Updated": "2024-01-10"},
-            {"Name": "Irrigation Recommendation", "Version": "1.8.0", "Accuracy": "88%", "Status": "Active", "Last Updated": "2024-01-08"},
-            {"Name": "Yield Prediction", "Version": "3.2.0", "Accuracy": "85%", "Status": "Active", "Last Updated": "2024-01-12"},
-        ]
+        # Model Status (metrics come from model_evaluation.py, persisted on disk)
+        metrics = model_evaluation.load_metrics()
+        load_errors = model_registry.get_load_errors()
+        versions = {'crop': "2.1.0", 'irrigation': "1.8.0", 'yield': "3.2.0"}
+        
+        if model_evaluation.is_evaluation_running():
+            st.info("Cross-validation running in the background. Refresh to see updated metrics.")
         
-        for model in models:
-            with st.expander(f"{model['Name']}"):
+        for key, spec in model_evaluation.MODEL_SPECS.items():
+            model_metrics = metrics.get(key, {})
+            
+            if model_metrics.get('status') == 'evaluated':
+                if model_metrics['task'] == 'classification':
+                    score = f"{model_metrics['accuracy']:.1%} ± {model_metrics['accuracy_std']:.1%}"
+                else:
+                    score = f"R² {model_metrics['r2']:.3f}"
+            else:
+                score = model_metrics.get('status', 'Not evaluated').capitalize()
+            
+            if not model_registry.is_ready():
+                status = "Warming up"
+            elif f"{key}_model" in load_errors:
+                status = "Unavailable"
+            else:
+                status = "Active"
+            
+            with st.expander(f"{spec['name']}"):
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Version", model['Version'])
-                    st.metric("Accuracy", model['Accuracy'])
+                    st.metric("Version", versions.get(key, "-"))
+                    st.metric("CV Accuracy" if spec['task'] == 'classification' else "CV Score", score)
                 
                 with col2:
-                    st.metric("Last Updated", model['Last Updated'])
-                    st.metric("Status", model['Status'])
+                    st.metric("Last Updated", model_metrics.get('model_updated', "-"))
+                    st.metric("Status", status)
                 
                 with col3:
-                    if st.button(f"Retrain", key=f"retrain_{model['Name']}"):
+                    if st.button(f"Retrain", key=f"retrain_{spec['name']}"):
                         st.info("Model retraining initiated...")
-                    if st.button(f"Analytics", key=f"analytics_{model['Name']}"):
-                        st.info("Model analytics would be displayed")
+                    if st.button(f"Evaluate", key=f"evaluate_{spec['name']}"):
+                        if model_evaluation.start_evaluation([key]):
+                            st.info("Cross-validation started in the background")
+                        else:
+                            st.warning("An evaluation is already running")
+                    if model_metrics.get('evaluated_at'):
+                        st.caption(f"Evaluated {model_metrics['evaluated_at']} "
+                                   f"({model_metrics.get('folds', '-')} folds, {model_metrics.get('samples', '-')} samples)")
+        
+        if st.button("Evaluate All Models"):
+            if model_evaluation.start_evaluation():
+                st.info("Cross-validation started in the background")
+            else:
+                st.warning("An evaluation is already running")
         
         # Model Performance Charts
         st.markdown("#### Model Performance Trends")
@@ -259,29 +310,40 @@ class AdminPanel:
         col1, col2 = st.columns(2)
         
         with col1:
-            # Accuracy trend
-            dates = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
-            accuracy = [85, 87, 88, 90, 91, 92]
+            # Accuracy trend across evaluated model/data versions
+            history = [
+                {'Model': spec['name'], 'Evaluated': point['evaluated_at'], 'Score': point['score'] * 100}
+                for key, spec in model_evaluation.MODEL_SPECS.items()
+                for point in metrics.get(key, {}).get('history', [])
+            ]
             
-            fig = px.line(
-                x=dates,
-                y=accuracy,
-                title="Model Accuracy Trend",
-                labels={'x': 'Month', 'y': 'Accuracy (%)'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            if history:
+                fig = px.line(
+                    pd.DataFrame(history),
+                    x='Evaluated',
+                    y='Score',
+                    color='Model',
+                    markers=True,
+                    title="Model Accuracy Trend",
+                    labels={'Score': 'Accuracy (%)'}
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No evaluations yet. Run an evaluation to see accuracy trends.")
         
         with col2:
             # Prediction volume
-            prediction_types = ['Crop', 'Irrigation', 'Yield']
-            volumes = [450, 320, 280]
+            type_counts = self.db.get_prediction_type_counts()
             
-            fig = px.pie(
-                values=volumes,
-                names=prediction_types,
-                title="Prediction Volume Distribution"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            if type_counts:
+                fig = px.pie(
+                    values=[count for _, count in type_counts],
+                    names=[prediction_type.title() for prediction_type, _ in type_counts],
+                    title="Prediction Volume Distribution"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No predictions recorded yet.")
     
     def show_schemes_management(self):
         """Show government schemes management"""
@@ -300,7 +362,16 @@ class AdminPanel:
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.form_submit_button("Add Scheme"):
-                        st.success("Scheme added successfully!")
+                        if title and description:
+                            try:
+                                self.db.add_scheme(title, description, eligibility, benefits,
+                                                   application_process, deadline)
+                                st.success("Scheme added successfully!")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Error adding scheme: {str(e)}")
+                        else:
+                            st.error("Please fill in all required fields (Scheme Title, Description)")
                 with col2:
                     if st.form_submit_button("Clear"):
                         st.rerun()
@@ -377,10 +448,11 @@ class AdminPanel:
         # Existing pesticides
         search_pesticide = st.text_input("Search pesticides", placeholder="Search by name or company...")
         
-        if search_pesticide:
-            pesticides = self.db.search_pesticides(search_pesticide)
-        else:
-            pesticides = self.db.search_pesticides("")  # Get all
+        pesticides = paginate(
+            "admin_pesticides_page",
+            lambda after: self.db.get_pesticides_page(search_pesticide, after, PAGE_SIZE),
+            reset_on=search_pesticide
+        )
         
         if pesticides:
             st.markdown("#### Existing Pesticides")
@@ -444,17 +516,16 @@ class AdminPanel:
                             try:
                                 # Add shop to database
                                 shop_data = {
-                                    'name': shop_name,
+                                    'shop_name': shop_name,
                                     'owner_name': owner_name,
                                     'address': address,
-                                    'contact': contact_number,
+                                    'phone': contact_number,
                                     'email': email,
                                     'latitude': latitude,
                                     'longitude': longitude,
                                     'opening_time': str(opening_time),
                                     'closing_time': str(closing_time),
-                                    'services_offered': services_offered,
-                                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                                    'products_available': services_offered
                                 }
                                 
                                 # Save to database
@@ -469,13 +540,34 @@ class AdminPanel:
                     if st.form_submit_button("Clear"):
                         st.rerun()
         
+        # Bulk import from a shop directory file
+        with st.expander("Bulk Import Shops"):
+            st.caption("CSV, JSON, JSON Lines or GeoJSON. Required fields: shop_name, address, latitude, longitude. "
+                       "Shops already listed (same licence number or location) are skipped.")
+            uploaded = st.file_uploader("Shop directory file", type=['csv', 'json', 'jsonl', 'ndjson', 'geojson'],
+                                        key="bulk_shop_file")
+            if uploaded is not None and st.button("Import Shops", key="bulk_shop_import"):
+                with st.spinner("Importing shops..."):
+                    try:
+                        f = io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline='')
+                        report = self.db.import_shops(f, shop_import.detect_format(uploaded.name))
+                        st.success(f"Imported {report['inserted']:,} of {report['read']:,} shops in "
+                                   f"{report['elapsed_seconds']}s ({report['rows_per_second']:,.0f} rows/s)")
+                        if report['duplicates'] or report['invalid']:
+                            st.warning(f"Skipped {report['duplicates']:,} duplicates and {report['invalid']:,} invalid rows")
+                        for error in report['errors']:
+                            st.caption(error)
+                    except Exception as e:
+                        st.error(f"Import failed: {str(e)}")
+        
         # Existing shops
         search_shop = st.text_input("Search shops", placeholder="Search by name or location...")
         
-        if search_shop:
-            shops = self.db.search_pesticide_shops(search_shop)
-        else:
-            shops = self.db.get_pesticide_shops()
+        shops = paginate(
+            "admin_shops_page",
+            lambda after: self.db.get_pesticide_shops_page(search_shop, after, PAGE_SIZE),
+            reset_on=search_shop
+        )
         
         if shops:
             st.markdown("#### Existing Shops")
@@ -485,21 +577,21 @@ class AdminPanel:
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
-                        st.markdown(f"**Owner:** {shop[2] if len(shop) > 2 else 'N/A'}")
-                        st.markdown(f"**Address:** {shop[3] if len(shop) > 3 else 'N/A'}")
-                        st.markdown(f"**Contact:** {shop[4] if len(shop) > 4 else 'N/A'}")
+                        st.markdown(f"**Owner:** {shop[2] or 'N/A'}")
+                        st.markdown(f"**Address:** {shop[3] or 'N/A'}")
+                        st.markdown(f"**Contact:** {shop[9] or 'N/A'}")
                     
                     with col2:
-                        st.markdown(f"**Email:** {shop[5] if len(shop) > 5 else 'N/A'}")
-                        if len(shop) > 6 and shop[6]:
-                            st.markdown(f"**Location:** {shop[6]:.4f}, {shop[7]:.4f}")
-                        st.markdown(f"**Hours:** {shop[8] if len(shop) > 8 else 'N/A'} - {shop[9] if len(shop) > 9 else 'N/A'}")
+                        st.markdown(f"**Email:** {shop[10] or 'N/A'}")
+                        if shop[7] and shop[8]:
+                            st.markdown(f"**Location:** {shop[7]:.4f}, {shop[8]:.4f}")
+                        st.markdown(f"**Hours:** {shop[13] or 'N/A'} - {shop[14] or 'N/A'}")
                     
                     with col3:
                         if st.button(f"View on Map", key=f"map_{shop[0]}"):
-                            if len(shop) > 6 and shop[6]:
+                            if shop[7] and shop[8]:
                                 # Show map (simplified - in real app would use map library)
-                                st.info(f"Location: {shop[6]:.4f}, {shop[7]:.4f}")
+                                st.info(f"Location: {shop[7]:.4f}, {shop[8]:.4f}")
                             else:
                                 st.warning("Location coordinates not available")
                         
@@ -537,18 +629,51 @@ class AdminPanel:
             st.markdown("#### 🔮 Prediction Analytics")
             
             # Prediction types distribution
-            pred_types = ['Crop', 'Irrigation', 'Yield']
-            pred_counts = [450, 320, 280]
+            type_counts = self.db.get_prediction_type_counts()
             
-            fig = px.bar(
-                x=pred_types,
-                y=pred_counts,
-                title="Prediction Types Distribution",
-                labels={'x': 'Prediction Type', 'y': 'Count'},
-                color=pred_counts,
-                color_continuous_scale='Viridis'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            if type_counts:
+                pred_types = [prediction_type.title() for prediction_type, _ in type_counts]
+                pred_counts = [count for _, count in type_counts]
+                
+                fig = px.bar(
+                    x=pred_types,
+                    y=pred_counts,
+                    title="Prediction Types Distribution",
+                    labels={'x': 'Prediction Type', 'y': 'Count'},
+                    color=pred_counts,
+                    color_continuous_scale='Viridis'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No predictions recorded yet.")
+            
+            # Daily prediction volume for the last 30 days
+            daily_counts = self.db.get_daily_prediction_counts(30)
+            if daily_counts:
+                fig = px.bar(
+                    pd.DataFrame(daily_counts, columns=['Day', 'Type', 'Count']),
+                    x='Day',
+                    y='Count',
+                    color='Type',
+                    title="Daily Predictions (Last 30 Days)"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+        
+        # Input drift, computed in SQLite from the typed input tables
+        st.markdown("#### 📉 Prediction Input Drift")
+        drift_type = st.selectbox("Prediction type", ["crop", "irrigation", "yield"], key="drift_type",
+                                  format_func=str.title)
+        drift = self.db.get_input_drift(drift_type)
+        if drift and drift[0]['recent_count']:
+            drift_df = pd.DataFrame(drift)[['feature', 'baseline_mean', 'recent_mean', 'baseline_std',
+                                            'recent_std', 'shift_std']]
+            drift_df.columns = ['Feature', 'Baseline Mean', 'Last 30 Days Mean', 'Baseline Std',
+                                'Last 30 Days Std', 'Shift (std)']
+            st.dataframe(drift_df, use_container_width=True, hide_index=True)
+            st.caption(f"Last 30 days ({drift[0]['recent_count']} predictions) against the year before "
+                       f"({drift[0]['baseline_count']} predictions). Shifts beyond ±0.5 std deserve a look.")
+        else:
+            st.info("No predictions of this type in the last 30 days.")
         
         # Geographic Distribution
         st.markdown("#### Geographic Distribution")
@@ -568,15 +693,77 @@ class AdminPanel:
         
         col1, col2, col3, col4 = st.columns(4)
         
+        metrics = model_evaluation.load_metrics()
+        
+        def score_metric(key):
+            model_metrics = metrics.get(key, {})
+            history = model_metrics.get('history', [])
+            if model_metrics.get('status') != 'evaluated':
+                return "N/A", None
+            score = model_metrics.get('accuracy', model_metrics.get('r2'))
+            delta = f"{(history[-1]['score'] - history[-2]['score']) * 100:+.1f}%" if len(history) > 1 else None
+            return f"{score:.1%}", delta
+        
         with col1:
-            st.metric("🎯 Crop Model Accuracy", "92%", "+2%")
+            st.metric("🎯 Crop Model Accuracy", *score_metric('crop'))
         with col2:
-            st.metric("💧 Irrigation Model Accuracy", "88%", "+1%")
+            st.metric("💧 Irrigation Model Accuracy", *score_metric('irrigation'))
         with col3:
-            st.metric("📈 Yield Model Accuracy", "85%", "+3%")
+            st.metric("📈 Yield Model Accuracy", *score_metric('yield'))
         with col4:
             st.metric("⚡ Avg Response Time", "1.2s", "-0.3s")
     
+    def show_query_performance(self):
+        """Show the slowest Database queries from the ring buffer and slow-query log"""
+        st.markdown("### Query Performance")
+        
+        settings = query_monitor.get_settings()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            threshold = st.number_input("Slow query threshold (ms)", min_value=1.0,
+                                        value=settings['slow_query_ms'], step=10.0)
+        with col2:
+            sample_rate = st.slider("Ring buffer sample rate", 0.0, 1.0, settings['sample_rate'], 0.05)
+        with col3:
+            capture_plans = st.checkbox("Capture EXPLAIN QUERY PLAN for slow queries",
+                                        value=settings['capture_plans'])
+        query_monitor.configure(slow_query_ms=threshold, sample_rate=sample_rate, capture_plans=capture_plans)
+        
+        # Recent queries in this server process
+        st.markdown("#### Recent Queries (this server process)")
+        stats = query_monitor.get_query_stats()
+        if stats:
+            df_stats = pd.DataFrame(stats)[['method', 'calls', 'total_ms', 'avg_ms', 'p95_ms', 'max_ms',
+                                            'avg_rows', 'pages', 'sql']]
+            st.dataframe(df_stats, use_container_width=True)
+        else:
+            st.info("No queries recorded yet.")
+        
+        # Persistent slow-query log, worst total time first
+        st.markdown("#### Slow Query Log")
+        slow_queries = query_monitor.get_slow_queries(self.db.db_name)
+        if slow_queries:
+            df_slow = pd.DataFrame(slow_queries, columns=['Method', 'SQL', 'Pages', 'Occurrences', 'Avg ms',
+                                                          'Max ms', 'Last Seen', 'Query Plan'])
+            st.dataframe(df_slow.drop(columns=['Query Plan']), use_container_width=True)
+            
+            selected = st.selectbox("Statement", range(len(slow_queries)),
+                                    format_func=lambda i: f"{slow_queries[i][0]}: {slow_queries[i][1][:80]}")
+            plan = slow_queries[selected][7]
+            if st.button("Explain Query Plan"):
+                try:
+                    plan = "\n".join(query_monitor.explain(self.db.db_name, slow_queries[selected][1]))
+                except Exception as e:
+                    st.error(f"Could not explain statement: {str(e)}")
+            if plan:
+                st.code(plan)
+            
+            if st.button("Clear Slow Query Log"):
+                query_monitor.clear_slow_queries(self.db.db_name)
+                st.rerun()
+        else:
+            st.info(f"No queries slower than {threshold:.0f} ms have been logged.")
+    
     def show_settings(self):
         """Show admin settings"""
         st.markdown("### ⚙️ System Settings")
@@ -598,10 +785,17 @@ class AdminPanel:
         with col2:
             st.markdown("**🔧 Model Settings**")
             auto_retrain = st.checkbox("Auto Retrain Models", value=True)
-            backup_frequency = st.selectbox("Backup Frequency", ["Daily", "Weekly", "Monthly"])
+            frequencies = list(db_backup.FREQUENCIES)
+            saved_frequency = self.db.get_setting('backup_frequency', 'Daily')
+            backup_frequency = st.selectbox("Backup Frequency", frequencies,
+                                            index=frequencies.index(saved_frequency) if saved_frequency in frequencies else 0)
+            backup_retention = st.number_input("Backups to Keep", min_value=1, max_value=90,
+                                               value=int(self.db.get_setting('backup_retention', db_backup.RETENTION)))
             log_level = st.selectbox("Log Level", ["INFO", "DEBUG", "WARNING", "ERROR"])
             
             if st.button("💾 Save Model Settings"):
+                self.db.set_setting('backup_frequency', backup_frequency)
+                self.db.set_setting('backup_retention', int(backup_retention))
                 st.success("✅ Model settings saved!")
         
         # Notification Settings
@@ -629,15 +823,90 @@ class AdminPanel:
         
         with col1:
             if st.button("🔄 Backup Database"):
-                st.success("✅ Database backup completed!")
+                keep = int(self.db.get_setting('backup_retention', db_backup.RETENTION))
+                if db_backup.start_backup(self.db.db_name, keep=keep):
+                    st.info("Backup started in the background")
+                else:
+                    st.warning("A backup is already running")
         
         with col2:
             if st.button("🧹 Clean Database"):
-                st.warning("⚠️ Database cleanup initiated")
+                if db_maintenance.start_run(self.db.db_name):
+                    st.info("Maintenance started in the background (analyze, vacuum, checkpoint)")
+                else:
+                    st.warning("Maintenance is already running")
         
         with col3:
-            if st.button("📊 Database Stats"):
-                st.info("📊 Database statistics would be displayed")
+            show_stats = st.button("📊 Database Stats")
+        
+        maintenance = db_maintenance.get_status()
+        if maintenance['state'] == 'running':
+            st.info("🧹 Database maintenance in progress...")
+        elif maintenance['last_run']:
+            last_run = maintenance['last_run']
+            vacuum = last_run['vacuum']
+            st.caption(f"Last maintenance {last_run['at']} ({last_run['seconds']}s): "
+                       f"analyzed {', '.join(last_run['analyzed']) or 'nothing stale'}; "
+                       f"{vacuum.get('skipped') or str(vacuum['freed']) + ' pages freed'}")
+        
+        if show_stats:
+            summary = db_maintenance.file_stats(self.db.db_name)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("File Size", f"{summary['file_bytes'] / 1e6:.1f} MB")
+            with col2:
+                st.metric("Free Pages", f"{summary['freelist_count']:,}", f"{summary['free_pct']}%", delta_color="off")
+            with col3:
+                st.metric("WAL Size", f"{summary['wal_bytes'] / 1e6:.1f} MB")
+            with col4:
+                st.metric("Auto Vacuum", summary['auto_vacuum'])
+            
+            stats_df = pd.DataFrame(db_maintenance.table_stats(self.db.db_name))
+            stats_df['bytes'] = (stats_df['bytes'] / 1e6).round(2)
+            stats_df.columns = ['Table', 'Rows', 'Table Pages', 'Indexes', 'Index Pages', 'MB', 'Unused %', 'Fragmentation %']
+            st.dataframe(stats_df, use_container_width=True, hide_index=True)
+            
+            if summary['auto_vacuum'] != 'INCREMENTAL':
+                st.caption("Free pages can only be returned in slices once the file uses auto_vacuum=INCREMENTAL. "
+                           "Switching needs one full VACUUM that locks the database: "
+                           "python db_maintenance.py --enable-incremental-vacuum")
+        
+        # Backup progress and recent runs
+        status = db_backup.get_status()
+        if status['state'] in ('copying', 'compressing'):
+            total = status.get('pages_total') or 0
+            done = status.get('pages_done') or 0
+            st.progress(done / total if total else 0.0,
+                        text=f"Backup {status['state']}: {done}/{total or '?'} pages, "
+                             f"{status.get('mb_per_second') or 0} MB/s")
+        elif status['state'] == 'done':
+            st.success(f"✅ Last backup: {status['path']} ({status['mb_per_second']} MB/s, {status['seconds']}s)")
+        elif status['state'] == 'failed':
+            st.error(f"Backup failed: {status['error']}")
+        
+        backups = db_backup.get_backup_history(limit=10)
+        if backups:
+            with st.expander("Backup History"):
+                backups_df = pd.DataFrame(backups, columns=['Finished', 'Trigger', 'Status', 'File', 'DB Bytes',
+                                                            'Stored Bytes', 'Seconds', 'MB/s', 'Error'])
+                st.dataframe(backups_df, use_container_width=True, hide_index=True)
+        
+        # Prediction history partitions
+        st.markdown("#### 📦 Prediction History Archive")
+        st.caption(f"Predictions older than {history_archive.HOT_MONTHS} months are moved to compressed "
+                   "monthly archive tables by a background job.")
+        
+        partitions = self.db.get_history_partitions()
+        partitions_df = pd.DataFrame(partitions, columns=['Partition', 'Month', 'Rows', 'Raw Bytes', 'Stored Bytes'])
+        st.dataframe(partitions_df, use_container_width=True, hide_index=True)
+        
+        if st.button("📦 Archive Now"):
+            with st.spinner("Archiving old predictions..."):
+                archived = self.db.archive_prediction_history()
+            if archived:
+                st.success(f"✅ Archived {sum(archived.values())} predictions from {len(archived)} month(s)")
+            else:
+                st.info("Nothing to archive")
         
         # System Maintenance
         st.markdown("#### 🔧 System Maintenance")
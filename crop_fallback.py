@@ -0,0 +1,172 @@
+"""
+Fallback Crop Recommender for AgriVision
+Nearest-centroid engine built from the crop recommendation training data.
+Used when the trained crop model is missing or still loading.
+"""
+
+import os
+import numpy as np
+
+from dataset_cache import load_dataset, source_checksum
+
+DATA_PATH = "data/Crop_Recommendation.csv"
+CENTROIDS_PATH = "models/crop_centroids.npz"
+
+FEATURE_COLUMNS = ['Nitrogen', 'Phosphorus', 'Potassium', 'Temperature', 'Humidity', 'pH_Value', 'Rainfall']
+LABEL_COLUMN = 'Crop'
+
+# Small ridge added to every covariance so crops with near-constant
+# features (e.g. irrigated fruit with fixed rainfall) stay invertible
+COVARIANCE_RIDGE = 1e-3
+
+
+def build_centroids(data_path=DATA_PATH, output_path=CENTROIDS_PATH):
+    """
+    Precompute per-crop centroids, inverse covariances and feasible ranges
+
+    Args:
+        data_path: Training CSV with feature columns and a Crop label
+        output_path: Where to write the .npz array file
+
+    Returns:
+        str: Path of the written array file
+    """
+    dataset = load_dataset(data_path)
+    X = dataset.matrix(FEATURE_COLUMNS)
+    labels = dataset.codes(LABEL_COLUMN)
+    crops = np.array(dataset.categories(LABEL_COLUMN))
+
+    n_features = len(FEATURE_COLUMNS)
+    centroids = np.zeros((len(crops), n_features))
+    inv_covariances = np.zeros((len(crops), n_features, n_features))
+    mins = np.zeros((len(crops), n_features))
+    maxs = np.zeros((len(crops), n_features))
+
+    # Scale the ridge by the global variance so it is unit-independent
+    ridge = np.diag(X.var(axis=0) * COVARIANCE_RIDGE)
+
+    for i in range(len(crops)):
+        samples = X[labels == i]
+        centroids[i] = samples.mean(axis=0)
+        covariance = np.cov(samples, rowvar=False) + ridge
+        inv_covariances[i] = np.linalg.inv(covariance)
+        mins[i] = samples.min(axis=0)
+        maxs[i] = samples.max(axis=0)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    np.savez(
+        output_path,
+        crops=crops,
+        centroids=centroids,
+        inv_covariances=inv_covariances,
+        mins=mins,
+        maxs=maxs,
+        source_checksum=np.array(source_checksum(data_path))
+    )
+    return output_path
+
+
+class CropFallbackRecommender:
+    """Answer top-k crop queries with a vectorized Mahalanobis-distance pass"""
+
+    def __init__(self, centroids_path=CENTROIDS_PATH, data_path=DATA_PATH):
+        self.centroids_path = centroids_path
+        self.data_path = data_path
+        self.load()
+
+    def load(self):
+        """Load the array file, rebuilding it if missing or stale"""
+        if self.needs_rebuild():
+            build_centroids(self.data_path, self.centroids_path)
+
+        with np.load(self.centroids_path) as arrays:
+            self.crops = arrays['crops']
+            self.centroids = arrays['centroids']
+            self.inv_covariances = arrays['inv_covariances']
+            self.mins = arrays['mins']
+            self.maxs = arrays['maxs']
+
+    def needs_rebuild(self):
+        """Check whether the array file is missing or built from older data"""
+        if not os.path.exists(self.centroids_path):
+            return True
+        if not os.path.exists(self.data_path):
+            return False
+
+        with np.load(self.centroids_path) as arrays:
+            built_from = str(arrays['source_checksum'])
+        return built_from != source_checksum(self.data_path)
+
+    def distances(self, features):
+        """
+        Squared Mahalanobis distance from each sample to every crop centroid
+
+        Args:
+            features: Array-like of shape (n_features,) or (n_samples, n_features)
+
+        Returns:
+            tuple: (distances of shape (n_samples, n_crops),
+                    out-of-range feature counts of the same shape)
+        """
+        x = np.asarray(features, dtype=float).reshape(-1, len(FEATURE_COLUMNS))
+        diff = x[:, None, :] - self.centroids[None, :, :]
+        distances = np.einsum('ncf,cfg,ncg->nc', diff, self.inv_covariances, diff)
+
+        outside = (x[:, None, :] < self.mins[None]) | (x[:, None, :] > self.maxs[None])
+        return distances, outside.sum(axis=2)
+
+    def recommend(self, features, top_k=3):
+        """
+        Recommend the closest crops for a single set of conditions
+
+        Args:
+            features: [N, P, K, temperature, humidity, ph, rainfall]
+            top_k: Number of crops to return
+
+        Returns:
+            list: Dictionaries with crop, confidence, distance and in_range
+        """
+        distances, outside = self.distances(features)
+        distances, infeasible = distances[0], outside[0] > 0
+
+        # Crops whose observed ranges contain the query rank first,
+        # then by Mahalanobis distance
+        order = np.lexsort((distances, infeasible))[:top_k]
+
+        # Relative likelihood under each crop's Gaussian, normalized over the
+        # feasible crops (or all crops when none of them is feasible)
+        pool = ~infeasible if (~infeasible).any() else np.ones_like(infeasible)
+        log_likelihood = -0.5 * (distances - distances[pool].min())
+        confidence = np.where(pool, np.exp(log_likelihood), 0.0)
+        confidence /= confidence.sum()
+
+        return [
+            {
+                'crop': str(self.crops[i]),
+                'confidence': float(confidence[i]),
+                'distance': float(np.sqrt(distances[i])),
+                'in_range': bool(not infeasible[i])
+            }
+            for i in order
+        ]
+
+    def predict(self, features):
+        """
+        Predict the best crop for one or more samples
+
+        Args:
+            features: Array-like of shape (n_samples, n_features)
+
+        Returns:
+            numpy.ndarray: Crop names
+        """
+        distances, outside = self.distances(features)
+        # Same ordering as recommend(): feasibility first, then distance
+        scores = (outside > 0) * (distances.max() + 1) + distances
+        return self.crops[scores.argmin(axis=1)]
+
+
+if __name__ == "__main__":
+    # Run this to rebuild the fallback array file after updating the dataset
+    path = build_centroids()
+    print(f"Fallback centroids written to {path}")
@@ -5,24 +5,25 @@ from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 from database import Database
-import joblib
 from language_utils import get_text, get_current_language
+from crop_fallback import CropFallbackRecommender
+from model_registry import start_warmup, get_model
 
 class Dashboard:
     def __init__(self):
         self.db = Database()
         
-        # Load models for preview
+        # Models for preview come from the process-wide warm-up
+        start_warmup()
+        self.crop_model = get_model('crop_model')
+        self.crop_encoder = get_model('crop_encoder')
+        self.irrigation_model = get_model('irrigation_model')
+        self.yield_model = get_model('yield_model')
+        
         try:
-            self.crop_model = joblib.load("models/crop_recommendation_model.pkl")
-            self.crop_encoder = joblib.load("models/crop_encoder.pkl")
-            self.irrigation_model = joblib.load("models/irrigation_model.pkl")
-            self.yield_model = joblib.load("models/yield_prediction_model.pkl")
-        except:
-            self.crop_model = None
-            self.crop_encoder = None
-            self.irrigation_model = None
-            self.yield_model = None
+            self.crop_fallback = CropFallbackRecommender()
+        except Exception:
+            self.crop_fallback = None
     
     def show_dashboard(self):
         """Display main dashboard"""
@@ -142,9 +143,9 @@ class Dashboard:
         # Get recent prediction or show demo
         user = st.session_state.get('user')
         if user:
-            history = self.db.get_prediction_history(user['id'], 1)
-            if history and history[0][0] == 'crop':
-                st.success(f"Last Recommended: **{history[0][2]}**")
+            summary = {row[0]: row for row in self.db.get_user_prediction_summary(user['id'])}
+            if 'crop' in summary:
+                st.success(f"Last Recommended: **{summary['crop'][3]}**")
             else:
                 st.info("No recent predictions")
         
@@ -163,6 +164,9 @@ class Dashboard:
                         st.success(f"Recommended: **{crop_name}**")
                     except:
                         st.error("Model not available")
+                elif self.crop_fallback:
+                    recommendation = self.crop_fallback.recommend([N, P, K, 25, 65, 6.5, 100], top_k=1)[0]
+                    st.success(f"Recommended: **{recommendation['crop']}**")
                 else:
                     st.info("Model loading...")
     
@@ -284,13 +288,13 @@ class Dashboard:
         
         with col2:
             st.markdown("### Nearby Pesticide Shops")
-            shops = self.db.get_pesticide_shops()
+            shops, _ = self.db.get_pesticide_shops_page(limit=3)  # Show first 3 shops
             
             if shops:
-                for shop in shops[:3]:  # Show first 3 shops
-                    st.markdown(f"**{shop[0]}**")
-                    st.markdown(f"{shop[1]}")
-                    st.markdown(f"{shop[4]}")
+                for shop in shops:
+                    st.markdown(f"**{shop[1]}**")
+                    st.markdown(f"{shop[3]}")
+                    st.markdown(f"{shop[9]}")
                     st.markdown("---")
             else:
                 st.info("No shops available in database")
@@ -303,16 +307,27 @@ class Dashboard:
         col1, col2 = st.columns(2)
         
         with col1:
-            # Crop distribution chart
-            crops = ['Rice', 'Wheat', 'Maize', 'Cotton', 'Pulses']
-            production = [120, 100, 80, 60, 40]
+            # Most recommended crops over the last 90 days, from the rollup table
+            crop_counts = self.db.get_prediction_result_counts('crop', days=90, limit=5)
             
-            fig = px.pie(
-                values=production,
-                names=crops,
-                title="Crop Production Distribution",
-                color_discrete_sequence=px.colors.sequential.Aggrnyl
-            )
+            if crop_counts:
+                fig = px.pie(
+                    values=[count for _, count in crop_counts],
+                    names=[crop for crop, _ in crop_counts],
+                    title="Most Recommended Crops (90 Days)",
+                    color_discrete_sequence=px.colors.sequential.Aggrnyl
+                )
+            else:
+                # Sample distribution until predictions are recorded
+                crops = ['Rice', 'Wheat', 'Maize', 'Cotton', 'Pulses']
+                production = [120, 100, 80, 60, 40]
+                
+                fig = px.pie(
+                    values=production,
+                    names=crops,
+                    title="Crop Production Distribution",
+                    color_discrete_sequence=px.colors.sequential.Aggrnyl
+                )
             st.plotly_chart(fig, width='stretch')
         
         with col2:
@@ -1,19 +1,119 @@
+import os
 import sqlite3
 import hashlib
 import json
+import threading
 from datetime import datetime
 import pandas as pd
+import query_monitor
+import db_maintenance
+import db_writer
+import geocode_cache
+import reference_cache
+import history_archive
+import map_clustering
+import prediction_inputs
+import shop_index
+
+# Rollup key for a prediction result. Yield results ("3.25 tons/ha") are
+# bucketed to whole tons so the rollup stays O(days x types x buckets).
+ROLLUP_RESULT_SQL = """
+    CASE WHEN {row}prediction_type = 'yield'
+         THEN CAST(CAST({row}result AS REAL) AS INTEGER) || '-' ||
+              (CAST(CAST({row}result AS REAL) AS INTEGER) + 1) || ' tons/ha'
+         ELSE COALESCE({row}result, '') END
+"""
+
+# Stored in PRAGMA user_version once init_database has run; bump it whenever
+# init_database changes, so existing files are migrated on next start
+SCHEMA_VERSION = 1
+
+# Database files whose schema this process has already checked, by path and
+# file identity (a deleted and recreated file is checked again)
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
 
 class Database:
     def __init__(self, db_name="agrivision.db"):
         self.db_name = db_name
-        self.init_database()
+        self.cache = reference_cache.get_cache(db_name)
+        self.ensure_schema()
+        # Set when a db_writer process serves this database (multi-process deployments)
+        self.writer = db_writer.get_client(db_name)
+    
+    def get_connection(self):
+        """Open a connection whose queries are timed by query_monitor"""
+        return query_monitor.connect(self.db_name)
+    
+    def get_read_connection(self):
+        """Open a read-only connection; under WAL it never waits on the writer"""
+        return query_monitor.connect(self.db_name, read_only=True)
+    
+    def _write(self, operation, *args):
+        """Run a db_writer operation in the writer process if one is up, else on a local connection"""
+        if self.writer is not None:
+            try:
+                return self.writer.call(operation, *args)
+            except db_writer.WriterUnavailable:
+                self.writer = None
+        
+        conn = self.get_connection()
+        try:
+            result = getattr(self, db_writer.OPERATIONS[operation])(conn.cursor(), *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _schema_key(self):
+        try:
+            stat = os.stat(self.db_name)
+        except OSError:
+            return None
+        return (os.path.abspath(self.db_name), stat.st_dev, stat.st_ino)
+    
+    def ensure_schema(self):
+        """
+        Run init_database once per process and file, and only if the schema is out of date
+        
+        Several Database objects are built on every Streamlit rerun; after the
+        first check they skip this entirely, and a current file is only read
+        (PRAGMA user_version), so construction never waits on a writer.
+        """
+        key = self._schema_key()
+        if key in _schema_ready:
+            return
+        
+        with _schema_lock:
+            key = self._schema_key()
+            if key in _schema_ready:
+                return
+            
+            version = 0
+            if key is not None:
+                conn = self.get_read_connection()
+                try:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                finally:
+                    conn.close()
+            if version != SCHEMA_VERSION:
+                self.init_database()
+            _schema_ready.add(self._schema_key())
     
     def init_database(self):
         """Initialize database with all required tables"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Must precede the first table; lets db_maintenance return free pages in slices
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Readers (and online backups) then never block writers; persists in the file
+        cursor.execute("PRAGMA journal_mode = WAL")
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -91,6 +191,18 @@ class Database:
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_shops_city ON pesticide_shops(city)
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_shops_license ON pesticide_shops(license_number)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_shops_verified_name ON pesticide_shops(verified, shop_name)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_pesticides_active_name ON pesticides(is_active, name)
+        ''')
+        
+        # One row per shop and product, kept in sync with products_available by triggers
+        shop_index.init_shop_products(cursor)
         
         # User predictions history
         cursor.execute('''
@@ -105,13 +217,97 @@ class Database:
             )
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_user_created ON prediction_history(user_id, created_at)
+        ''')
+        
+        # Monthly archive partitions and per-user summary rollups
+        history_archive.init_partitioning(cursor)
+        
+        # Typed, indexed copies of prediction inputs (crop_inputs, irrigation_inputs, yield_inputs)
+        prediction_inputs.init_input_tables(cursor)
+        
+        # Daily prediction counts per type and result, kept current by a trigger
+        # so analytics never scan prediction_history
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'prediction_rollups'")
+        rollups_exist = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_rollups (
+                day TEXT NOT NULL,
+                prediction_type TEXT NOT NULL,
+                result TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, prediction_type, result)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_prediction_rollup AFTER INSERT ON prediction_history
+            BEGIN
+                INSERT INTO prediction_rollups (day, prediction_type, result, count)
+                VALUES (date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), COALESCE(NEW.prediction_type, ''),
+                        {ROLLUP_RESULT_SQL.format(row='NEW.')}, 1)
+                ON CONFLICT (day, prediction_type, result) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        if not rollups_exist:
+            self._backfill_prediction_rollups(cursor)
+        
+        # Admin settings that background jobs read (e.g. backup frequency)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Generation counters that invalidate the reference data cache
+        reference_cache.init_generations(cursor)
+        
+        # Statements slower than the query_monitor threshold
+        cursor.execute(query_monitor.CREATE_SLOW_QUERIES_SQL)
+        
+        # Row-count snapshots db_maintenance uses to spot stale planner statistics
+        cursor.execute(db_maintenance.CREATE_MAINTENANCE_STATE_SQL)
+        
+        # Nominatim results (and misses) cached by geocode_cache
+        cursor.execute(geocode_cache.CREATE_GEOCODE_CACHE_SQL)
+        
+        # Farmer feedback on past predictions (confirmed or corrected after harvest)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prediction_id INTEGER NOT NULL,
+                user_id INTEGER,
+                prediction_type TEXT,
+                input_data TEXT,
+                predicted_result TEXT,
+                actual_result TEXT,
+                confirmed BOOLEAN DEFAULT 0,
+                applied BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (prediction_id) REFERENCES prediction_history (id),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_feedback_prediction ON prediction_feedback(prediction_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_feedback_pending ON prediction_feedback(applied, prediction_type)
+        ''')
+        
         conn.commit()
         conn.close()
         self.seed_default_data()
+        
+        conn = self.get_connection()
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.close()
     
     def seed_default_data(self):
         """Seed default data for government schemes and pesticides"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Check if data already exists
@@ -304,6 +500,7 @@ class Database:
                     pesticide['safety_instructions'],
                     pesticide['dosage']
                 ))
+            reference_cache.bump_generation(cursor, 'pesticides')
         
         # Government schemes data (existing)
         cursor.execute("SELECT COUNT(*) FROM government_schemes")
@@ -344,6 +541,7 @@ class Database:
                     VALUES (?, ?, ?, ?, ?, ?)
                 ''', (scheme['title'], scheme['description'], scheme['eligibility'], 
                      scheme['benefits'], scheme['application_process'], scheme['deadline']))
+            reference_cache.bump_generation(cursor, 'schemes')
         
         # Add sample pesticides
         cursor.execute("SELECT COUNT(*) FROM pesticides")
@@ -381,6 +579,7 @@ class Database:
                     VALUES (?, ?, ?, ?, ?, ?)
                 ''', (pesticide['name'], pesticide['company'], pesticide['usage_info'],
                      pesticide['crop_applicable'], pesticide['safety_instructions'], pesticide['dosage']))
+            reference_cache.bump_generation(cursor, 'pesticides')
         
         conn.commit()
         conn.close()
@@ -391,25 +590,23 @@ class Database:
     
     def create_user(self, name, email, mobile, password):
         """Create new user"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
         try:
-            hashed_password = self.hash_password(password)
-            cursor.execute('''
-                INSERT INTO users (name, email, mobile, password)
-                VALUES (?, ?, ?, ?)
-            ''', (name, email, mobile, hashed_password))
-            conn.commit()
+            self._write('create_user', name, email, mobile, self.hash_password(password))
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
+    
+    @staticmethod
+    def _insert_user(cursor, name, email, mobile, hashed_password):
+        cursor.execute('''
+            INSERT INTO users (name, email, mobile, password)
+            VALUES (?, ?, ?, ?)
+        ''', (name, email, mobile, hashed_password))
+        return cursor.lastrowid
     
     def authenticate_user(self, email, password):
         """Authenticate user login"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         hashed_password = self.hash_password(password)
@@ -419,19 +616,42 @@ class Database:
         ''', (email, email, hashed_password))
         
         user = cursor.fetchone()
+        conn.close()
+        
         if user:
-            # Update last login
-            cursor.execute('''
-                UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-            ''', (user[0],))
-            conn.commit()
+            self._write('record_login', user[0])
+        return user
+    
+    @staticmethod
+    def _update_last_login(cursor, user_id):
+        cursor.execute('''
+            UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (user_id,))
+    
+    def get_setting(self, key, default=None):
+        """Get an admin setting (stored as text)"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
         
+        cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
+        row = cursor.fetchone()
         conn.close()
-        return user
+        return row[0] if row else default
+    
+    def set_setting(self, key, value):
+        """Save an admin setting"""
+        self._write('set_setting', key, str(value))
+    
+    @staticmethod
+    def _upsert_setting(cursor, key, value):
+        cursor.execute('''
+            INSERT INTO app_settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        ''', (key, value))
     
     def get_user(self, user_id):
         """Get user details"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -445,20 +665,22 @@ class Database:
     
     def update_user_language(self, user_id, language):
         """Update user language preference"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
+        self._write('update_user_language', user_id, language)
+        return True
+    
+    @staticmethod
+    def _update_user_language(cursor, user_id, language):
         cursor.execute('''
             UPDATE users SET language = ? WHERE id = ?
         ''', (language, user_id))
-        
-        conn.commit()
-        conn.close()
-        return True
     
     def get_schemes(self, limit=10):
+        """Get government schemes (cached until schemes change)"""
+        return self.cache.get('schemes', ('get_schemes', limit), lambda: self._query_get_schemes(limit))
+    
+    def _query_get_schemes(self, limit=10):
         """Get government schemes"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -473,36 +695,51 @@ class Database:
         conn.close()
         return schemes
     
+    def add_scheme(self, title, description, eligibility, benefits, application_process, deadline):
+        """Add a new government scheme"""
+        return self._write('add_scheme', title, description, eligibility, benefits, application_process, deadline)
+    
+    @staticmethod
+    def _insert_scheme(cursor, title, description, eligibility, benefits, application_process, deadline):
+        cursor.execute('''
+            INSERT INTO government_schemes (title, description, eligibility, benefits,
+                                            application_process, deadline, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, 1)
+        ''', (title, description, eligibility, benefits, application_process, deadline))
+        scheme_id = cursor.lastrowid
+        reference_cache.bump_generation(cursor, 'schemes')
+        return scheme_id
+    
     def add_pesticide(self, pesticide_data):
         """Add a new pesticide to the database"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO pesticides (name, company, usage_info, crop_applicable, 
-                                      safety_instructions, dosage, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, 1)
-            ''', (
-                pesticide_data['name'],
-                pesticide_data.get('company', ''),
-                pesticide_data.get('usage_info', ''),
-                pesticide_data.get('crop_applicable', ''),
-                pesticide_data.get('safety_instructions', ''),
-                pesticide_data.get('dosage', '')
-            ))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        self._write('add_pesticide', pesticide_data)
+        return True
+    
+    @staticmethod
+    def _insert_pesticide(cursor, pesticide_data):
+        cursor.execute('''
+            INSERT INTO pesticides (name, company, usage_info, crop_applicable, 
+                                  safety_instructions, dosage, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, 1)
+        ''', (
+            pesticide_data['name'],
+            pesticide_data.get('company', ''),
+            pesticide_data.get('usage_info', ''),
+            pesticide_data.get('crop_applicable', ''),
+            pesticide_data.get('safety_instructions', ''),
+            pesticide_data.get('dosage', '')
+        ))
+        pesticide_id = cursor.lastrowid
+        reference_cache.bump_generation(cursor, 'pesticides')
+        return pesticide_id
     
     def search_pesticides(self, search_term):
+        """Search pesticides by name (cached until pesticides change)"""
+        return self.cache.get('pesticides', ('search_pesticides', search_term), lambda: self._query_search_pesticides(search_term))
+    
+    def _query_search_pesticides(self, search_term):
         """Search pesticides by name"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -516,47 +753,86 @@ class Database:
         conn.close()
         return pesticides
     
-    def add_pesticide_shop(self, shop_data):
-        """Add a new pesticide shop to the database (Enhanced version)"""
-        conn = sqlite3.connect(self.db_name)
+    def get_pesticides_page(self, search_term="", after=None, limit=20):
+        """
+        Get one page of pesticides ordered by name, using a keyset cursor
+        
+        Args:
+            search_term: Name filter (empty for all)
+            after: Cursor returned with the previous page, or None for the first page
+            limit: Page size
+        
+        Returns:
+            tuple: (rows shaped like search_pesticides, cursor for the next page or None)
+        """
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
-        try:
-            cursor.execute('''
-                INSERT INTO pesticide_shops (shop_name, owner_name, address, city, state, pincode,
-                                             latitude, longitude, phone, email, rating, is_open,
-                                             opening_time, closing_time, products_available, license_number, verified)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-            ''', (
-                shop_data['shop_name'],
-                shop_data.get('owner_name', ''),
-                shop_data['address'],
-                shop_data.get('city', ''),
-                shop_data.get('state', ''),
-                shop_data.get('pincode', ''),
-                shop_data.get('latitude', 0.0),
-                shop_data.get('longitude', 0.0),
-                shop_data.get('phone', ''),
-                shop_data.get('email', ''),
-                shop_data.get('rating', 0.0),
-                shop_data.get('is_open', 1),
-                shop_data.get('opening_time', ''),
-                shop_data.get('closing_time', ''),
-                shop_data.get('products_available', ''),
-                shop_data.get('license_number', '')
-            ))
-            
-            conn.commit()
-            return cursor.lastrowid
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        last_name, last_id = after if after else ('', 0)
+        cursor.execute('''
+            SELECT id, name, company, usage_info, crop_applicable, safety_instructions, dosage
+            FROM pesticides
+            WHERE is_active = 1 AND name LIKE ? AND (name, id) > (?, ?)
+            ORDER BY name, id
+            LIMIT ?
+        ''', (f'%{search_term}%', last_name, last_id, limit + 1))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        # One extra row tells whether another page exists
+        next_cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [row[1:] for row in rows[:limit]], next_cursor
+    
+    def iter_pesticides(self, search_term="", page_size=500):
+        """Stream all matching pesticides page by page"""
+        after = None
+        while True:
+            rows, after = self.get_pesticides_page(search_term, after, page_size)
+            yield from rows
+            if after is None:
+                break
+    
+    def add_pesticide_shop(self, shop_data):
+        """Add a new pesticide shop to the database (Enhanced version)"""
+        return self._write('add_pesticide_shop', shop_data)
+    
+    @staticmethod
+    def _insert_pesticide_shop(cursor, shop_data):
+        cursor.execute('''
+            INSERT INTO pesticide_shops (shop_name, owner_name, address, city, state, pincode,
+                                         latitude, longitude, phone, email, rating, is_open,
+                                         opening_time, closing_time, products_available, license_number, verified)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ''', (
+            shop_data['shop_name'],
+            shop_data.get('owner_name', ''),
+            shop_data['address'],
+            shop_data.get('city', ''),
+            shop_data.get('state', ''),
+            shop_data.get('pincode', ''),
+            shop_data.get('latitude', 0.0),
+            shop_data.get('longitude', 0.0),
+            shop_data.get('phone', ''),
+            shop_data.get('email', ''),
+            shop_data.get('rating', 0.0),
+            shop_data.get('is_open', 1),
+            shop_data.get('opening_time', ''),
+            shop_data.get('closing_time', ''),
+            shop_data.get('products_available', ''),
+            shop_data.get('license_number', '')
+        ))
+        shop_id = cursor.lastrowid
+        reference_cache.bump_generation(cursor, 'shops')
+        return shop_id
     
     def search_pesticide_shops(self, search_term):
+        """Search pesticide shops by name or address (cached until shops change)"""
+        return self.cache.get('shops', ('search_pesticide_shops', search_term), lambda: self._query_search_pesticide_shops(search_term))
+    
+    def _query_search_pesticide_shops(self, search_term):
         """Search pesticide shops by name or address (Enhanced version)"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -572,56 +848,90 @@ class Database:
         conn.close()
         return shops
     
-    def get_nearby_shops(self, user_lat, user_lng, radius_km=5):
-        """Get nearby shops using simplified distance calculation"""
-        conn = sqlite3.connect(self.db_name)
+    def get_shop_index(self):
+        """Shop coordinates and product inverted index (cached until shops change)"""
+        return self.cache.get('shops', ('get_shop_index',), self._query_shop_index)
+    
+    def _query_shop_index(self):
+        conn = self.get_read_connection()
+        try:
+            return shop_index.ShopIndex.load(conn)
+        finally:
+            conn.close()
+    
+    def get_shop_products(self):
+        """Products stocked by verified shops as (name, shop count), most common first"""
+        return self.get_shop_index().products()
+    
+    def get_nearby_shops(self, user_lat, user_lng, radius_km=5, products=None, limit=50, open_only=False, when=None):
+        """
+        Get the nearest verified shops within a radius
+        
+        The radius, product and opening-hours filters run on the in-memory
+        shop index; only the returned shops are read from the table.
+        
+        Args:
+            user_lat: Latitude
+            user_lng: Longitude
+            radius_km: Search radius in kilometers
+            products: Product names every returned shop must stock (e.g. ['Mancozeb'])
+            limit: Most shops returned
+            open_only: Only shops open at `when`
+            when: datetime for 'open_now' (default now, Indian time)
+        
+        Returns:
+            list: Shop dictionaries with 'distance' in km, nearest first
+        """
+        nearest = self.get_shop_index().nearby(user_lat, user_lng, radius_km, products, limit, open_only, when)
+        if not nearest:
+            return []
+        
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
-        # Get all verified shops first
-        cursor.execute('''
+        placeholders = ", ".join("?" * len(nearest))
+        cursor.execute(f'''
             SELECT id, shop_name, address, city, latitude, longitude, 
                    phone, email, rating, is_open, products_available,
                    opening_time, closing_time
             FROM pesticide_shops
-            WHERE verified = 1
-        ''')
+            WHERE id IN ({placeholders})
+        ''', [shop_id for shop_id, _, _ in nearest])
+        rows = {row[0]: row for row in cursor.fetchall()}
+        conn.close()
         
         shops = []
-        for row in cursor.fetchall():
-            # Calculate distance using Python
-            shop_lat = row[4]
-            shop_lng = row[5]
-            
-            # Simple distance calculation (Haversine approximation)
-            distance = ((shop_lat - user_lat) ** 2 + (shop_lng - user_lng) ** 2) ** 0.5 * 111  # Rough km conversion
-            
-            if distance <= radius_km:
-                shops.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'address': row[2],
-                    'city': row[3],
-                    'lat': shop_lat,
-                    'lng': shop_lng,
-                    'phone': row[6],
-                    'email': row[7],
-                    'rating': row[8],
-                    'open_now': bool(row[9]),
-                    'products': row[10].split(',') if row[10] else [],
-                    'opening_time': row[11],
-                    'closing_time': row[12],
-                    'distance': round(distance, 2)
-                })
-        
-        # Sort by distance
-        shops.sort(key=lambda x: x['distance'])
+        for shop_id, distance, is_open in nearest:
+            row = rows.get(shop_id)
+            if row is None:
+                # Deleted since the index was built
+                continue
+            shops.append({
+                'id': row[0],
+                'name': row[1],
+                'address': row[2],
+                'city': row[3],
+                'lat': row[4],
+                'lng': row[5],
+                'phone': row[6],
+                'email': row[7],
+                'rating': row[8],
+                'open_now': is_open,
+                'products': [product.strip() for product in row[10].split(',') if product.strip()] if row[10] else [],
+                'opening_time': row[11],
+                'closing_time': row[12],
+                'distance': round(distance, 2)
+            })
         
-        conn.close()
-        return shops[:50]  # Limit to 50 results
+        return shops
     
     def get_pesticide_shops(self):
+        """Get all pesticide shops (cached until shops change)"""
+        return self.cache.get('shops', ('get_pesticide_shops',), self._query_get_pesticide_shops)
+    
+    def _query_get_pesticide_shops(self):
         """Get all pesticide shops (Enhanced version)"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -637,69 +947,349 @@ class Database:
         conn.close()
         return shops
     
+    def get_shops_version(self):
+        """Generation of the shop data; changes whenever a shop is added or edited"""
+        return self.cache.generation('shops')
+    
+    def get_shop_cluster_index(self, search_term=""):
+        """
+        Map clusters of verified shops (cached until shops change)
+        
+        Args:
+            search_term: Name, address or city filter (empty for all)
+        
+        Returns:
+            map_clustering.ClusterIndex: Shared index; zoom levels are aggregated on first use
+        """
+        return self.cache.get('shops', ('get_shop_cluster_index', search_term),
+                              lambda: self._query_shop_cluster_index(search_term))
+    
+    def _query_shop_cluster_index(self, search_term):
+        """Build the cluster index from shop ids, names and coordinates only"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        if search_term:
+            pattern = f'%{search_term}%'
+            cursor.execute('''
+                SELECT id, shop_name, latitude, longitude
+                FROM pesticide_shops
+                WHERE verified = 1 AND (shop_name LIKE ? OR address LIKE ? OR city LIKE ?)
+            ''', (pattern, pattern, pattern))
+        else:
+            cursor.execute('''
+                SELECT id, shop_name, latitude, longitude
+                FROM pesticide_shops
+                WHERE verified = 1
+            ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        return map_clustering.ClusterIndex.from_rows(rows)
+    
+    def get_pesticide_shops_page(self, search_term="", after=None, limit=20):
+        """
+        Get one page of verified shops ordered by name, using a keyset cursor
+        
+        Memory and query time depend only on the page size, not on the table size.
+        
+        Args:
+            search_term: Name, address or city filter (empty for all)
+            after: Cursor returned with the previous page, or None for the first page
+            limit: Page size
+        
+        Returns:
+            tuple: (rows shaped like get_pesticide_shops, cursor for the next page or None)
+        """
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        last_name, last_id = after if after else ('', 0)
+        if search_term:
+            pattern = f'%{search_term}%'
+            search_sql = "AND (shop_name LIKE ? OR address LIKE ? OR city LIKE ?)"
+            search_params = (pattern, pattern, pattern)
+        else:
+            search_sql = ""
+            search_params = ()
+        
+        cursor.execute(f'''
+            SELECT id, shop_name, owner_name, address, city, state, pincode,
+                   latitude, longitude, phone, email, rating, is_open,
+                   opening_time, closing_time, products_available, license_number
+            FROM pesticide_shops
+            WHERE verified = 1 {search_sql} AND (shop_name, id) > (?, ?)
+            ORDER BY shop_name, id
+            LIMIT ?
+        ''', search_params + (last_name, last_id, limit + 1))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        next_cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+    
+    def iter_pesticide_shops(self, search_term="", page_size=500):
+        """Stream all matching verified shops page by page"""
+        after = None
+        while True:
+            rows, after = self.get_pesticide_shops_page(search_term, after, page_size)
+            yield from rows
+            if after is None:
+                break
+    
     def populate_sample_shops(self):
         """Populate database with sample shop data"""
         from pesticide_shops_db import SAMPLE_SHOPS_PUNE
+        from shop_import import import_records
         
-        conn = sqlite3.connect(self.db_name)
+        conn = self.get_connection()
+        try:
+            report = import_records(conn, SAMPLE_SHOPS_PUNE)
+        finally:
+            conn.close()
         
-        for shop in SAMPLE_SHOPS_PUNE:
-            try:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO pesticide_shops (shop_name, owner_name, address, city, state, pincode,
-                                         latitude, longitude, phone, email, products_available,
-                                         opening_time, closing_time, license_number, verified)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-                ''', (
-                    shop['shop_name'],
-                    shop.get('owner_name', ''),
-                    shop['address'],
-                    shop['city'],
-                    shop['state'],
-                    shop.get('pincode', ''),
-                    shop['latitude'],
-                    shop['longitude'],
-                    shop.get('phone', ''),
-                    shop.get('email', ''),
-                    shop.get('products_available', ''),
-                    shop.get('opening_time', ''),
-                    shop.get('closing_time', ''),
-                    shop.get('license_number', '')
-                ))
-                conn.commit()
-                print(f"Added: {shop['shop_name']}")
-            except Exception as e:
-                print(f"Error adding {shop['shop_name']}: {e}")
+        print(f"Added {report['inserted']} sample shops ({report['duplicates']} already present)")
+        return report
+    
+    def import_shops(self, f, file_format, batch_size=50000):
+        """Bulk import shops from an open CSV/JSON/JSON Lines/GeoJSON file"""
+        from shop_import import import_file
+        return import_file(self.db_name, f, file_format, batch_size=batch_size)
+    
+    def _backfill_prediction_rollups(self, cursor):
+        """Rebuild prediction_rollups from every history partition in one grouped pass"""
+        source = history_archive.history_source_sql(cursor, 'prediction_type, result, created_at')
+        cursor.execute("DELETE FROM prediction_rollups")
+        cursor.execute(f'''
+            INSERT INTO prediction_rollups (day, prediction_type, result, count)
+            SELECT date(created_at), COALESCE(prediction_type, ''), {ROLLUP_RESULT_SQL.format(row='')}, COUNT(*)
+            FROM {source}
+            GROUP BY 1, 2, 3
+        ''')
+    
+    def rebuild_prediction_rollups(self):
+        """Recompute all rollups from prediction history (e.g. after manual edits)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            self._backfill_prediction_rollups(cursor)
+            history_archive.rebuild_summary(cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    def get_prediction_type_counts(self, days=None):
+        """Get total predictions per type, optionally limited to the last `days` days"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT prediction_type, SUM(count)
+            FROM prediction_rollups
+            WHERE ? IS NULL OR day >= date('now', '-' || ? || ' days')
+            GROUP BY prediction_type
+            ORDER BY SUM(count) DESC
+        ''', (days, days))
         
+        counts = cursor.fetchall()
         conn.close()
+        return counts
     
-    def save_prediction(self, user_id, prediction_type, input_data, result):
-        """Save prediction history"""
-        conn = sqlite3.connect(self.db_name)
+    def get_daily_prediction_counts(self, days=30):
+        """Get (day, prediction_type, count) rows for the last `days` days"""
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO prediction_history (user_id, prediction_type, input_data, result)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, prediction_type, json.dumps(input_data), result))
+            SELECT day, prediction_type, SUM(count)
+            FROM prediction_rollups
+            WHERE day >= date('now', '-' || ? || ' days')
+            GROUP BY day, prediction_type
+            ORDER BY day
+        ''', (days,))
         
-        conn.commit()
+        counts = cursor.fetchall()
+        conn.close()
+        return counts
+    
+    def get_prediction_result_counts(self, prediction_type, days=None, limit=10):
+        """Get the most frequent results for one prediction type"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT result, SUM(count)
+            FROM prediction_rollups
+            WHERE prediction_type = ? AND (? IS NULL OR day >= date('now', '-' || ? || ' days'))
+            GROUP BY result
+            ORDER BY SUM(count) DESC
+            LIMIT ?
+        ''', (prediction_type, days, days, limit))
+        
+        counts = cursor.fetchall()
         conn.close()
+        return counts
+    
+    def save_prediction(self, user_id, prediction_type, input_data, result):
+        """Save prediction history"""
+        self._write('save_prediction', user_id, prediction_type, json.dumps(input_data), result)
+    
+    @staticmethod
+    def _insert_prediction(cursor, user_id, prediction_type, input_json, result):
+        cursor.execute('''
+            INSERT INTO prediction_history (user_id, prediction_type, input_data, result)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, prediction_type, input_json, result))
+        return cursor.lastrowid
     
     def get_prediction_history(self, user_id, limit=10):
-        """Get user prediction history"""
-        conn = sqlite3.connect(self.db_name)
+        """Get user prediction history (newest first, across archive partitions)"""
+        history, _ = self.get_prediction_history_page(user_id, None, limit)
+        return history
+    
+    def get_prediction_history_page(self, user_id, before=None, limit=10):
+        """
+        Get one page of a user's predictions, newest first, using a keyset cursor
+        
+        Args:
+            user_id: User whose history to read
+            before: Cursor returned with the previous page, or None for the newest page
+            limit: Page size
+        
+        Returns:
+            tuple: (rows shaped like get_prediction_history, cursor for the next page or None)
+        """
+        conn = self.get_read_connection()
+        
+        try:
+            rows, next_cursor = history_archive.get_user_history_page(conn, user_id, before, limit)
+        finally:
+            conn.close()
+        
+        return [row[1:] for row in rows], next_cursor
+    
+    def iter_prediction_history(self, user_id, page_size=500):
+        """Stream a user's whole prediction history, newest first"""
+        before = None
+        while True:
+            rows, before = self.get_prediction_history_page(user_id, before, page_size)
+            yield from rows
+            if before is None:
+                break
+    
+    def get_user_prediction_summary(self, user_id):
+        """Get (prediction_type, count, last_at, last_result) per type for a user"""
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT prediction_type, input_data, result, created_at
-            FROM prediction_history 
+            SELECT prediction_type, count, last_at, last_result
+            FROM user_prediction_summary
             WHERE user_id = ?
-            ORDER BY created_at DESC
+            ORDER BY count DESC
+        ''', (user_id,))
+        
+        summary = cursor.fetchall()
+        conn.close()
+        return summary
+    
+    def archive_prediction_history(self, hot_months=history_archive.HOT_MONTHS):
+        """Move predictions older than the hot window into monthly archive tables"""
+        return history_archive.archive_predictions(self.db_name, hot_months)
+    
+    def get_history_partitions(self):
+        """Get (partition, month, rows, raw bytes, stored bytes) for the hot table and each archive"""
+        conn = self.get_read_connection()
+        try:
+            return history_archive.get_partition_stats(conn)
+        finally:
+            conn.close()
+    
+    def find_predictions(self, prediction_type, result=None, since=None, ranges=None, limit=100):
+        """Filter predictions by typed inputs, e.g. crop 'rice' with ranges={'rainfall': (200, None)}"""
+        conn = self.get_read_connection()
+        try:
+            return prediction_inputs.find_predictions(conn.cursor(), prediction_type, result, since, ranges, limit)
+        finally:
+            conn.close()
+    
+    def get_input_drift(self, prediction_type, recent_days=30, baseline_days=365):
+        """Compare recent prediction inputs with the preceding baseline window"""
+        conn = self.get_read_connection()
+        try:
+            return prediction_inputs.feature_drift(conn.cursor(), prediction_type, recent_days, baseline_days)
+        finally:
+            conn.close()
+    
+    def get_predictions_for_feedback(self, user_id, limit=20):
+        """Get recent crop and yield predictions with any feedback already given"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT h.id, h.prediction_type, h.input_data, h.result, h.created_at,
+                   f.actual_result, f.confirmed
+            FROM prediction_history h
+            LEFT JOIN prediction_feedback f ON f.prediction_id = h.id
+            WHERE h.user_id = ? AND h.prediction_type IN ('crop', 'yield')
+            ORDER BY h.created_at DESC
             LIMIT ?
         ''', (user_id, limit))
         
-        history = cursor.fetchall()
+        predictions = cursor.fetchall()
         conn.close()
-        return history
+        return predictions
+    
+    def save_feedback(self, user_id, prediction_id, actual_result):
+        """Record the farmer's confirmed or corrected outcome for a prediction"""
+        return self._write('save_feedback', user_id, prediction_id, str(actual_result))
+    
+    @staticmethod
+    def _insert_feedback(cursor, user_id, prediction_id, actual_result):
+        prediction = history_archive.get_prediction(cursor.connection, prediction_id, user_id)
+        if not prediction:
+            return False
+        
+        prediction_type, input_data, predicted_result, _ = prediction
+        confirmed = actual_result == str(predicted_result)
+        
+        # Re-submitting feedback replaces the earlier answer and queues it again
+        cursor.execute('''
+            INSERT OR REPLACE INTO prediction_feedback (prediction_id, user_id, prediction_type, input_data,
+                                                        predicted_result, actual_result, confirmed, applied)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+        ''', (prediction_id, user_id, prediction_type, input_data,
+             predicted_result, actual_result, int(confirmed)))
+        return True
+    
+    def get_pending_feedback(self, prediction_type, limit=64):
+        """Get feedback not yet used to update the online models"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, input_data, actual_result
+            FROM prediction_feedback
+            WHERE applied = 0 AND prediction_type = ?
+            ORDER BY id
+            LIMIT ?
+        ''', (prediction_type, limit))
+        
+        feedback = cursor.fetchall()
+        conn.close()
+        return feedback
+    
+    def mark_feedback_applied(self, feedback_ids):
+        """Mark feedback rows as consumed by the online models"""
+        self._write('mark_feedback_applied', list(feedback_ids))
+    
+    @staticmethod
+    def _mark_feedback_applied(cursor, feedback_ids):
+        cursor.executemany('''
+            UPDATE prediction_feedback SET applied = 1 WHERE id = ?
+        ''', [(feedback_id,) for feedback_id in feedback_ids])
@@ -0,0 +1,225 @@
+"""
+Columnar Dataset Cache for AgriVision
+Converts training CSVs once into one .npy file per column (downcast dtypes,
+text columns stored as integer label codes) keyed by the source checksum.
+Loads go through mmap, so repeated training, evaluation and benchmark runs
+start instantly and share pages through the OS cache.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = "data/.cache"
+
+
+def file_checksum(path):
+    """
+    Compute the SHA-256 checksum of a file
+
+    Args:
+        path: File path
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint_path(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    location = hashlib.sha256(os.path.abspath(csv_path).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{stem}-{location}.fingerprint.json")
+
+
+def source_checksum(csv_path, cache_dir=CACHE_DIR):
+    """
+    Checksum of a CSV, skipping the re-hash when size and mtime are unchanged
+
+    Args:
+        csv_path: Source CSV path
+        cache_dir: Cache directory holding the fingerprint file
+
+    Returns:
+        str: SHA-256 hex digest of the file
+    """
+    stat = os.stat(csv_path)
+    fingerprint_path = _fingerprint_path(csv_path, cache_dir)
+    try:
+        with open(fingerprint_path) as f:
+            fingerprint = json.load(f)
+        if fingerprint['size'] == stat.st_size and fingerprint['mtime_ns'] == stat.st_mtime_ns:
+            return fingerprint['checksum']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    checksum = file_checksum(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(fingerprint_path, 'w') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'checksum': checksum}, f)
+    return checksum
+
+
+def downcast_column(series):
+    """
+    Convert a pandas column to its most compact numpy representation
+
+    Returns:
+        tuple: (numpy array, list of categories or None)
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.bool_), None
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer').to_numpy(), None
+    if pd.api.types.is_float_dtype(series):
+        return pd.to_numeric(series, downcast='float').to_numpy(), None
+
+    # Text columns become label codes into a sorted category list
+    categorical = pd.Categorical(series.astype(str))
+    codes = pd.to_numeric(pd.Series(categorical.codes), downcast='integer').to_numpy()
+    return codes, [str(category) for category in categorical.categories]
+
+
+def build_cache(csv_path, cache_dir=CACHE_DIR):
+    """
+    Convert a CSV into a columnar cache directory
+
+    Args:
+        csv_path: Source CSV path
+        cache_dir: Parent directory for caches
+
+    Returns:
+        str: Path of the cache directory for this CSV version
+    """
+    checksum = source_checksum(csv_path, cache_dir)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    target = os.path.join(cache_dir, f"{stem}-{checksum[:16]}")
+    if os.path.exists(os.path.join(target, 'meta.json')):
+        return target
+
+    df = pd.read_csv(csv_path)
+
+    # Build in a temporary directory and rename, so readers never see a partial cache
+    tmp_dir = f"{target}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        values, categories = downcast_column(df[name])
+        filename = f"col{i:03d}.npy"
+        np.save(os.path.join(tmp_dir, filename), values)
+        columns.append({
+            'name': name,
+            'file': filename,
+            'dtype': str(values.dtype),
+            'categories': categories
+        })
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'source': csv_path,
+            'source_checksum': checksum,
+            'rows': int(len(df)),
+            'columns': columns
+        }, f, indent=2)
+
+    if os.path.isdir(target) and not os.path.exists(os.path.join(target, 'meta.json')):
+        # Left behind by an interrupted conversion
+        shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Another process finished the same conversion first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Drop caches of older versions of this CSV
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if not entry.startswith(f"{stem}-") or path == target or not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                built_from = json.load(f)['source']
+        except (OSError, ValueError, KeyError):
+            continue
+        if os.path.abspath(built_from) == os.path.abspath(csv_path):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return target
+
+
+class ColumnarDataset:
+    """Memory-mapped view of a cached CSV"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        with open(os.path.join(cache_path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self.columns = [column['name'] for column in self.meta['columns']]
+        self._specs = {column['name']: column for column in self.meta['columns']}
+        self._arrays = {}
+
+    def codes(self, name):
+        """Raw (memory-mapped) array for a column; label codes for text columns"""
+        if name not in self._arrays:
+            path = os.path.join(self.cache_path, self._specs[name]['file'])
+            self._arrays[name] = np.load(path, mmap_mode='r')
+        return self._arrays[name]
+
+    def categories(self, name):
+        """Category labels for a text column, or None for numeric columns"""
+        return self._specs[name]['categories']
+
+    def values(self, name):
+        """Decoded values for a column (text columns become label arrays)"""
+        categories = self.categories(name)
+        if categories is None:
+            return self.codes(name)
+        return np.asarray(categories, dtype=object)[self.codes(name)]
+
+    def matrix(self, names, dtype=np.float64):
+        """Stack numeric columns into a (rows, len(names)) array"""
+        return np.column_stack([np.asarray(self.codes(name), dtype=dtype) for name in names])
+
+    def to_frame(self, names=None):
+        """Build a DataFrame; text columns become pandas Categoricals"""
+        data = {}
+        for name in names or self.columns:
+            categories = self.categories(name)
+            if categories is None:
+                data[name] = self.codes(name)
+            else:
+                data[name] = pd.Categorical.from_codes(np.asarray(self.codes(name)), categories)
+        return pd.DataFrame(data)
+
+    def __len__(self):
+        return self.rows
+
+
+def load_dataset(csv_path, cache_dir=CACHE_DIR):
+    """
+    Load a CSV through the columnar cache, converting it on first use
+
+    Args:
+        csv_path: Source CSV path
+        cache_dir: Parent directory for caches
+
+    Returns:
+        ColumnarDataset: Memory-mapped dataset
+    """
+    return ColumnarDataset(build_cache(csv_path, cache_dir))
+
+
+if __name__ == "__main__":
+    # Run this to pre-build the cache for every bundled dataset
+    for entry in sorted(os.listdir("data")):
+        if entry.endswith(".csv"):
+            dataset = load_dataset(os.path.join("data", entry))
+            print(f"{entry}: {dataset.rows} rows -> {dataset.cache_path}")
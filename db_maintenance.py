@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Database Maintenance for AgriVision
+Keeps query plans and file size healthy without stop-the-world pauses:
+- ANALYZE (sampled via analysis_limit) for tables whose size drifted since
+  their last analysis, plus PRAGMA optimize
+- incremental_vacuum in bounded slices, so freed pages go back to the OS a
+  little at a time
+- WAL checkpoints: PASSIVE on every tick, TRUNCATE once the WAL is large and
+  fully checkpointed
+It also reports per-table rows, pages, index sizes and fragmentation from the
+dbstat virtual table.
+
+Usage:
+    python db_maintenance.py                 # one maintenance run
+    python db_maintenance.py --stats         # per-table statistics
+    python db_maintenance.py --enable-incremental-vacuum
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+
+ANALYSIS_LIMIT = 1000
+STALE_RATIO = 0.25
+STALE_MIN_ROWS = 1000
+VACUUM_SLICE_PAGES = 256
+VACUUM_MAX_SLICES = 40
+VACUUM_SLICE_PAUSE_SECONDS = 0.05
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+# TRUNCATE waits on readers and writers; give up quickly rather than stall them
+CHECKPOINT_BUSY_TIMEOUT = 0.2
+CHECKPOINT_INTERVAL_SECONDS = 60
+MAINTENANCE_INTERVAL_SECONDS = 30 * 60
+
+CREATE_MAINTENANCE_STATE_SQL = '''
+    CREATE TABLE IF NOT EXISTS maintenance_state (
+        table_name TEXT PRIMARY KEY,
+        rowid_span INTEGER,
+        analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+_status = {'state': 'idle', 'last_run': None, 'last_checkpoint': None}
+_status_lock = threading.Lock()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_scheduler_stop = threading.Event()
+
+
+def get_status():
+    """Last maintenance run and checkpoint results for the admin panel"""
+    with _status_lock:
+        return dict(_status)
+
+
+def _connect(db_name, timeout=30):
+    return sqlite3.connect(db_name, timeout=timeout)
+
+
+def _user_tables(conn):
+    return [row[0] for row in conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    ''')]
+
+
+def _rowid_span(conn, table):
+    """MAX(rowid) - MIN(rowid) + 1: two b-tree seeks, a cheap proxy for the row count"""
+    try:
+        low, high = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').fetchone()
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID table
+        return None
+    return 0 if low is None else high - low + 1
+
+
+def analyze_tables(conn, tables=None):
+    """
+    ANALYZE the given tables (all by default) with sampling, e.g. after a bulk load
+
+    Records each table's rowid span so the scheduler can tell when it drifts.
+    """
+    conn.execute(CREATE_MAINTENANCE_STATE_SQL)
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    for table in tables if tables is not None else _user_tables(conn):
+        conn.execute(f'ANALYZE "{table}"')
+        conn.execute('''
+            INSERT INTO maintenance_state (table_name, rowid_span, analyzed_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (table_name) DO UPDATE SET rowid_span = excluded.rowid_span, analyzed_at = excluded.analyzed_at
+        ''', (table, _rowid_span(conn, table)))
+    conn.commit()
+
+
+def stale_tables(conn):
+    """Tables never analyzed or whose rowid span moved by more than STALE_RATIO since"""
+    conn.execute(CREATE_MAINTENANCE_STATE_SQL)
+    analyzed = dict(conn.execute("SELECT table_name, rowid_span FROM maintenance_state").fetchall())
+    stale = []
+    for table in _user_tables(conn):
+        if table == 'maintenance_state':
+            continue
+        span = _rowid_span(conn, table)
+        if span is None:
+            if table not in analyzed:
+                stale.append(table)
+            continue
+        previous = analyzed.get(table)
+        if previous is None:
+            if span >= STALE_MIN_ROWS:
+                stale.append(table)
+        elif max(span, previous) >= STALE_MIN_ROWS and abs(span - previous) > STALE_RATIO * max(previous, 1):
+            stale.append(table)
+    return stale
+
+
+def optimize(db_name):
+    """ANALYZE drifted tables, then let SQLite's own PRAGMA optimize run"""
+    conn = _connect(db_name)
+    try:
+        stale = stale_tables(conn)
+        if stale:
+            analyze_tables(conn, stale)
+        conn.execute("PRAGMA optimize")
+        return stale
+    finally:
+        conn.close()
+
+
+def incremental_vacuum(db_name, slice_pages=VACUUM_SLICE_PAGES, max_slices=VACUUM_MAX_SLICES,
+                       pause_seconds=VACUUM_SLICE_PAUSE_SECONDS, stop_event=None):
+    """
+    Return free pages to the OS in short slices
+
+    Each slice is its own short write transaction, with a pause between
+    slices so app writers interleave.
+
+    Returns:
+        dict: Pages freed, slices run and free pages left (or why it was skipped)
+    """
+    conn = _connect(db_name)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return {'freed': 0, 'slices': 0, 'skipped': 'auto_vacuum is not INCREMENTAL'}
+        freed = slices = 0
+        while slices < max_slices and not (stop_event and stop_event.is_set()):
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free == 0:
+                break
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({min(slice_pages, free)})")
+            freed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            slices += 1
+            time.sleep(pause_seconds)
+        return {'freed': freed, 'slices': slices, 'free_left': conn.execute("PRAGMA freelist_count").fetchone()[0]}
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum(db_name):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL
+
+    Needs one full VACUUM, which locks the database while it rebuilds the
+    file; run it in a quiet period. New databases get the mode from
+    Database.init_database without this step.
+    """
+    conn = _connect(db_name)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def checkpoint(db_name, truncate_bytes=WAL_TRUNCATE_BYTES):
+    """
+    Checkpoint the WAL without blocking traffic
+
+    PASSIVE copies what it can without waiting. Only when that caught up
+    completely and the WAL has grown past truncate_bytes is a TRUNCATE tried,
+    with a short busy timeout so it backs off under load.
+
+    Returns:
+        dict: WAL frames, checkpointed frames and WAL size, or None outside WAL mode
+    """
+    conn = _connect(db_name, timeout=CHECKPOINT_BUSY_TIMEOUT)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+            return None
+        busy, frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        wal_path = f"{db_name}-wal"
+        wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        truncated = False
+        if not busy and frames == checkpointed and wal_bytes > truncate_bytes:
+            truncated = not conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+            wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        result = {'busy': bool(busy), 'frames': frames, 'checkpointed': checkpointed,
+                  'wal_bytes': wal_bytes, 'truncated': truncated, 'at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with _status_lock:
+            _status['last_checkpoint'] = result
+        return result
+    finally:
+        conn.close()
+
+
+def run_maintenance(db_name="agrivision.db", stop_event=None):
+    """One full pass: optimize, vacuum slices, checkpoint"""
+    started = time.time()
+    with _status_lock:
+        _status['state'] = 'running'
+    try:
+        result = {
+            'analyzed': optimize(db_name),
+            'vacuum': incremental_vacuum(db_name, stop_event=stop_event),
+            'checkpoint': checkpoint(db_name),
+            'seconds': round(time.time() - started, 2),
+            'at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with _status_lock:
+            _status['last_run'] = result
+        return result
+    finally:
+        with _status_lock:
+            _status['state'] = 'idle'
+
+
+def start_run(db_name="agrivision.db"):
+    """
+    Run maintenance on a background thread (used by the admin panel)
+
+    Returns:
+        bool: False if a run is already in progress
+    """
+    with _status_lock:
+        if _status['state'] == 'running':
+            return False
+        _status['state'] = 'running'
+
+    thread = threading.Thread(target=run_maintenance, args=(db_name,), name="agrivision-maintenance-run")
+    thread.daemon = True
+    thread.start()
+    return True
+
+
+def file_stats(db_name):
+    """Page size, page and free counts, modes and on-disk sizes of the database file"""
+    conn = _connect(db_name)
+    try:
+        wal_path = f"{db_name}-wal"
+        stats = {
+            'page_size': conn.execute("PRAGMA page_size").fetchone()[0],
+            'page_count': conn.execute("PRAGMA page_count").fetchone()[0],
+            'freelist_count': conn.execute("PRAGMA freelist_count").fetchone()[0],
+            'auto_vacuum': {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}[conn.execute("PRAGMA auto_vacuum").fetchone()[0]],
+            'journal_mode': conn.execute("PRAGMA journal_mode").fetchone()[0],
+            'file_bytes': os.path.getsize(db_name),
+            'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        }
+        stats['free_pct'] = round(100.0 * stats['freelist_count'] / max(stats['page_count'], 1), 1)
+        return stats
+    finally:
+        conn.close()
+
+
+def table_stats(db_name):
+    """
+    Per-table size and fragmentation from dbstat
+
+    Fragmentation is the share of consecutive leaf pages (in key order) that
+    are not physically adjacent in the file; unused is the share of page
+    bytes holding no data.
+
+    Returns:
+        list: Dicts per table with rows, pages and bytes for the table and its
+              indexes, unused % and fragmentation %, largest first
+    """
+    conn = _connect(db_name)
+    try:
+        owners = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')"))
+        tables = {}
+        previous = {}
+        for name, pageno, pagetype, unused, pgsize in conn.execute(
+                "SELECT name, pageno, pagetype, unused, pgsize FROM dbstat"):
+            table = owners.get(name, name)
+            stats = tables.setdefault(table, {
+                'table': table, 'rows': None, 'table_pages': 0, 'index_pages': 0, 'indexes': set(),
+                'bytes': 0, 'unused_bytes': 0, 'leaf_pages': 0, 'leaf_jumps': 0
+            })
+            if name == table:
+                stats['table_pages'] += 1
+            else:
+                stats['index_pages'] += 1
+                stats['indexes'].add(name)
+            stats['bytes'] += pgsize
+            stats['unused_bytes'] += unused
+            # dbstat walks each b-tree in key order
+            if pagetype == 'leaf':
+                stats['leaf_pages'] += 1
+                if name in previous and pageno != previous[name] + 1:
+                    stats['leaf_jumps'] += 1
+                previous[name] = pageno
+
+        result = []
+        for table, stats in tables.items():
+            if table in owners and not table.startswith('sqlite_'):
+                stats['rows'] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            result.append({
+                'table': table,
+                'rows': stats['rows'],
+                'table_pages': stats['table_pages'],
+                'indexes': len(stats['indexes']),
+                'index_pages': stats['index_pages'],
+                'bytes': stats['bytes'],
+                'unused_pct': round(100.0 * stats['unused_bytes'] / max(stats['bytes'], 1), 1),
+                'fragmentation_pct': round(100.0 * stats['leaf_jumps'] / max(stats['leaf_pages'] - 1, 1), 1)
+            })
+        result.sort(key=lambda item: item['bytes'], reverse=True)
+        return result
+    finally:
+        conn.close()
+
+
+def start_scheduler(db_name="agrivision.db", interval_seconds=MAINTENANCE_INTERVAL_SECONDS,
+                    checkpoint_seconds=CHECKPOINT_INTERVAL_SECONDS):
+    """
+    Start background maintenance once per process
+
+    Checkpoints every checkpoint_seconds and runs the full pass every
+    interval_seconds. Safe to call on every Streamlit rerun.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return
+        _scheduler = threading.Thread(target=_scheduler_loop, args=(db_name, interval_seconds, checkpoint_seconds),
+                                      name="agrivision-maintenance")
+        _scheduler.daemon = True
+        _scheduler.start()
+
+
+def _scheduler_loop(db_name, interval_seconds, checkpoint_seconds):
+    last_run = time.time()
+    while not _scheduler_stop.wait(checkpoint_seconds):
+        try:
+            if time.time() - last_run >= interval_seconds and get_status()['state'] != 'running':
+                run_maintenance(db_name, stop_event=_scheduler_stop)
+                last_run = time.time()
+            else:
+                checkpoint(db_name)
+        except Exception as e:
+            print(f"Maintenance error: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision database maintenance")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database')
+    parser.add_argument('--stats', action='store_true', help='Print per-table statistics and exit')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='One-time VACUUM switching the file to auto_vacuum=INCREMENTAL')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return False
+
+    if args.stats:
+        summary = file_stats(args.db)
+        print(f"{summary['file_bytes'] / 1e6:.1f} MB, {summary['page_count']} pages of {summary['page_size']} bytes, "
+              f"{summary['free_pct']}% free, auto_vacuum={summary['auto_vacuum']}, journal={summary['journal_mode']}")
+        print(f"{'table':<32}{'rows':>10}{'pages':>8}{'idx':>5}{'idx pages':>10}{'MB':>8}{'unused%':>9}{'frag%':>7}")
+        for row in table_stats(args.db):
+            print(f"{row['table']:<32}{row['rows'] if row['rows'] is not None else '-':>10}{row['table_pages']:>8}"
+                  f"{row['indexes']:>5}{row['index_pages']:>10}{row['bytes'] / 1e6:>8.1f}"
+                  f"{row['unused_pct']:>9}{row['fragmentation_pct']:>7}")
+        return True
+
+    if args.enable_incremental_vacuum:
+        print("Rebuilding the database with auto_vacuum=INCREMENTAL (locks it until done)...")
+        return enable_incremental_vacuum(args.db)
+
+    result = run_maintenance(args.db)
+    print(f"Analyzed: {', '.join(result['analyzed']) or 'nothing stale'}")
+    print(f"Vacuum: {result['vacuum']}")
+    print(f"Checkpoint: {result['checkpoint'] or 'not in WAL mode'}")
+    print(f"Done in {result['seconds']}s")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
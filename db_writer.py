@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Single Writer Process for AgriVision
+When several Streamlit processes share agrivision.db, their commits collide
+and fail with "database is locked". Run one writer per database:
+
+    python db_writer.py --db agrivision.db
+
+It listens on a Unix socket next to the database ("<db>.writer.sock",
+authenticated with the key in "<db>.writer.key") and owns the app's
+writes: everything listed in OPERATIONS (predictions, users and logins,
+settings, schemes, pesticides, shops and feedback). Requests that
+queue up while a transaction commits go into the next one together (group
+commit), each in its own savepoint so one failing insert does not undo the
+others. The database is switched to WAL so the app's read-only connections
+never wait on the writer.
+
+Database picks the writer up automatically when its socket exists and falls
+back to direct writes when none is running.
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import sqlite3
+import argparse
+import threading
+from multiprocessing.connection import Listener, Client
+
+# Writes that can be sent to the writer, mapped to the Database static
+# methods doing the write on a cursor
+OPERATIONS = {
+    'save_prediction': '_insert_prediction',
+    'create_user': '_insert_user',
+    'record_login': '_update_last_login',
+    'update_user_language': '_update_user_language',
+    'set_setting': '_upsert_setting',
+    'add_scheme': '_insert_scheme',
+    'add_pesticide': '_insert_pesticide',
+    'add_pesticide_shop': '_insert_pesticide_shop',
+    'save_feedback': '_insert_feedback',
+    'mark_feedback_applied': '_mark_feedback_applied'
+}
+MAX_BATCH = 500
+BUSY_TIMEOUT_SECONDS = 30
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class WriterUnavailable(Exception):
+    """No writer process is reachable; the caller may write directly"""
+
+
+def socket_path(db_name):
+    return f"{os.path.abspath(db_name)}.writer.sock"
+
+
+def key_path(db_name):
+    return f"{os.path.abspath(db_name)}.writer.key"
+
+
+class WriterClient:
+    """Sends writes to the writer process; one socket per calling thread"""
+
+    def __init__(self, db_name):
+        self.address = socket_path(db_name)
+        self.key_file = key_path(db_name)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                with open(self.key_file, 'rb') as f:
+                    authkey = f.read()
+                conn = Client(self.address, family='AF_UNIX', authkey=authkey)
+            except (OSError, EOFError) as e:
+                raise WriterUnavailable(str(e))
+            self._local.conn = conn
+        return conn
+
+    def call(self, operation, *args):
+        """
+        Run one write in the writer process and wait for its commit
+
+        Raises:
+            WriterUnavailable: The writer could not be reached; nothing was sent
+            Exception: Whatever the insert raised (e.g. sqlite3.IntegrityError)
+        """
+        conn = self._connection()
+        try:
+            conn.send((operation, args))
+        except OSError as e:
+            self._local.conn = None
+            raise WriterUnavailable(str(e))
+        try:
+            ok, value = conn.recv()
+        except (OSError, EOFError):
+            # The request may have been committed; do not retry it elsewhere
+            self._local.conn = None
+            raise ConnectionError("Lost the writer process before it confirmed the write")
+        if not ok:
+            raise value
+        return value
+
+    def stats(self):
+        """Batching counters of the writer process"""
+        return self.call('stats')
+
+
+def get_client(db_name):
+    """
+    Client for the writer serving db_name, or None if no writer socket exists
+
+    Returns:
+        WriterClient or None
+    """
+    if not os.path.exists(socket_path(db_name)):
+        return None
+    with _clients_lock:
+        client = _clients.get(socket_path(db_name))
+        if client is None:
+            client = WriterClient(db_name)
+            _clients[socket_path(db_name)] = client
+        return client
+
+
+class _Request:
+    __slots__ = ('operation', 'args', 'ok', 'value', 'done')
+
+    def __init__(self, operation, args):
+        self.operation = operation
+        self.args = args
+        self.ok = False
+        self.value = None
+        self.done = threading.Event()
+
+
+class WriterServer:
+    """Accepts client connections and commits their writes in batches on one connection"""
+
+    def __init__(self, db_name, max_batch=MAX_BATCH):
+        from database import Database
+
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.operations = {name: getattr(Database, method) for name, method in OPERATIONS.items()}
+        self.requests = queue.Queue()
+        self.stop = threading.Event()
+        self.stats = {'writes': 0, 'batches': 0, 'largest_batch': 0, 'errors': 0, 'clients': 0,
+                      'started_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+        Database(db_name)  # make sure the schema exists
+        self.conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+
+    def serve_forever(self):
+        address = socket_path(self.db_name)
+        if os.path.exists(address):
+            try:
+                WriterClient(self.db_name).stats()
+                raise RuntimeError(f"A writer is already serving {self.db_name}")
+            except (WriterUnavailable, ConnectionError):
+                os.unlink(address)  # left behind by a writer that died
+
+        authkey = os.urandom(32)
+        fd = os.open(key_path(self.db_name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(authkey)
+
+        listener = Listener(address, family='AF_UNIX', authkey=authkey)
+        os.chmod(address, 0o600)
+        writer = threading.Thread(target=self._write_loop, name="agrivision-writer")
+        writer.daemon = True
+        writer.start()
+        try:
+            while not self.stop.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Failed authentication or a client that went away mid-handshake
+                    print(f"Writer accept error: {e}")
+                    continue
+                handler = threading.Thread(target=self._handle_client, args=(conn,), name="agrivision-writer-client")
+                handler.daemon = True
+                handler.start()
+        finally:
+            self.stop.set()
+            listener.close()
+            for path in (address, key_path(self.db_name)):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def _handle_client(self, conn):
+        self.stats['clients'] += 1
+        try:
+            while True:
+                operation, args = conn.recv()
+                if operation == 'stats':
+                    conn.send((True, dict(self.stats)))
+                    continue
+                if operation not in self.operations:
+                    conn.send((False, ValueError(f"Unknown write operation: {operation}")))
+                    continue
+                request = _Request(operation, args)
+                self.requests.put(request)
+                request.done.wait()
+                conn.send((request.ok, request.value))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.stats['clients'] -= 1
+            conn.close()
+
+    def _write_loop(self):
+        while not self.stop.is_set():
+            try:
+                batch = [self.requests.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Everything that queued up during the previous commit shares this one
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                cursor.execute("SAVEPOINT write")
+                try:
+                    request.value = self.operations[request.operation](cursor, *request.args)
+                    request.ok = True
+                    cursor.execute("RELEASE write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    request.value = e
+                    self.stats['errors'] += 1
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            for request in batch:
+                request.ok, request.value = False, e
+            self.stats['errors'] += len(batch)
+            print(f"Writer commit error: {e}")
+        else:
+            self.stats['writes'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        finally:
+            cursor.close()
+            for request in batch:
+                request.done.set()
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision single writer process")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Most writes per transaction')
+    args = parser.parse_args()
+
+    # Clean up the socket and key files on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, _terminate)
+    server = WriterServer(args.db, max_batch=args.max_batch)
+    print(f"Writer serving {args.db} on {socket_path(args.db)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(e)
+        return False
+    print(f"Writer stopped after {server.stats['writes']:,} writes in {server.stats['batches']:,} transactions")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Offline Gazetteer for AgriVision
+Local place lookup for the shop locator, so most location searches never
+touch the network:
+- type-ahead completion by binary search over sorted name keys (every word
+  of a name and every alias is a key, so "chinch" finds Pimpri Chinchwad)
+- exact pincode -> coordinates map
+- geocode() for free-text addresses ("Shop Road, Hadapsar, Pune")
+
+The data is a gzipped TSV in data/gazetteer.tsv.gz with one place per row:
+kind (state, district, town, locality), name, district, state, pincode,
+latitude, longitude and ';'-separated aliases. The bundled file covers
+states/UTs, Maharashtra districts, major towns and Pune/Mumbai localities;
+build a complete one from the India Post pincode directory CSV with:
+
+    python gazetteer.py --build all_india_pincode_directory.csv
+"""
+
+import os
+import re
+import sys
+import csv
+import gzip
+import time
+import argparse
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from geocode_cache import normalize_address
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.tsv.gz')
+COLUMNS = ['kind', 'name', 'district', 'state', 'pincode', 'latitude', 'longitude', 'aliases']
+# Most specific first: a locality match beats a district of the same name
+KIND_RANK = {'locality': 0, 'town': 1, 'district': 2, 'state': 3}
+# Bound the work for one- or two-letter prefixes on a full gazetteer
+MAX_SCAN = 500
+# Rough bounding box of India; directory rows outside it have bad coordinates
+INDIA_BOUNDS = (6.0, 38.0, 68.0, 98.0)
+PINCODE_RE = re.compile(r'(?<!\d)(\d{6})(?!\d)')
+
+
+# Same folding as geocode_cache.normalize_address for a single name (names in
+# the file are already NFKC); a regex per name made loading a full directory slow
+_FOLD = str.maketrans({char: ' ' for char in ".;:/\\#()[]\"'_-,"})
+
+
+def _key(text):
+    return ' '.join(text.casefold().translate(_FOLD).split())
+
+
+class Gazetteer:
+    """Places held in parallel lists, with sorted keys for prefix search"""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.kinds, self.names, self.districts, self.states = [], [], [], []
+        self.pincodes, self.latitudes, self.longitudes = [], [], []
+        by_name = defaultdict(list)
+        keys = []
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                kind, name, district, state, pincode, lat, lng, aliases = line.rstrip('\n').split('\t')
+                row = len(self.names)
+                self.kinds.append(kind)
+                self.names.append(name)
+                self.districts.append(district)
+                self.states.append(state)
+                self.pincodes.append(pincode)
+                self.latitudes.append(float(lat))
+                self.longitudes.append(float(lng))
+                for label in [name] + [alias for alias in aliases.split(';') if alias]:
+                    full = _key(label)
+                    by_name[full].append(row)
+                    words = full.split(' ')
+                    for i in range(len(words)):
+                        keys.append((' '.join(words[i:]), row))
+
+        keys.sort()
+        # Normalized names and parents, for ranking suggestions
+        self.name_keys = [_key(name) for name in self.names]
+        parent_keys = {parent: _key(parent) for parent in set(self.districts) | set(self.states)}
+        self.district_keys = [parent_keys[district] for district in self.districts]
+        self.state_keys = [parent_keys[state] for state in self.states]
+        self.keys = [key for key, _ in keys]
+        self.key_rows = [row for _, row in keys]
+        self.by_name = dict(by_name)
+
+        # Pincode centroid over the towns/localities sharing it
+        sums = defaultdict(lambda: [0.0, 0.0, 0, None])
+        for row, pincode in enumerate(self.pincodes):
+            if pincode and self.kinds[row] in ('locality', 'town'):
+                entry = sums[pincode]
+                entry[0] += self.latitudes[row]
+                entry[1] += self.longitudes[row]
+                entry[2] += 1
+                if entry[3] is None or KIND_RANK[self.kinds[row]] < KIND_RANK[self.kinds[entry[3]]]:
+                    entry[3] = row
+        self.pincode_map = {pincode: (lat / n, lng / n, row) for pincode, (lat, lng, n, row) in sums.items()}
+        self.sorted_pincodes = sorted(self.pincode_map)
+
+    def __len__(self):
+        return len(self.names)
+
+    def place(self, row):
+        """Place as a dict, with a display label"""
+        parts = [self.names[row]]
+        for parent in (self.districts[row], self.states[row]):
+            if parent and parent != parts[-1]:
+                parts.append(parent)
+        label = ', '.join(parts)
+        if self.pincodes[row] and self.kinds[row] in ('locality', 'town'):
+            label += f" ({self.pincodes[row]})"
+        return {
+            'label': label,
+            'kind': self.kinds[row],
+            'name': self.names[row],
+            'district': self.districts[row],
+            'state': self.states[row],
+            'pincode': self.pincodes[row],
+            'latitude': self.latitudes[row],
+            'longitude': self.longitudes[row]
+        }
+
+    def _in_context(self, row, context):
+        return (self.district_keys[row] in context) + (self.state_keys[row] in context)
+
+    def lookup_pincode(self, pincode):
+        """
+        Coordinates of a 6-digit pincode
+
+        Returns:
+            tuple: (latitude, longitude) or None
+        """
+        entry = self.pincode_map.get(str(pincode).strip())
+        return (entry[0], entry[1]) if entry else None
+
+    def complete(self, text, limit=8):
+        """
+        Type-ahead suggestions for what the user typed so far
+
+        The first comma-separated part is the prefix; later parts (e.g. a
+        district or state) rank places inside them first. Digits complete
+        pincodes.
+
+        Returns:
+            list: Place dicts, best match first
+        """
+        parts = normalize_address(text).split(', ')
+        prefix = parts[0]
+        if not prefix:
+            return []
+        context = set(parts[1:])
+
+        if prefix.isdigit():
+            lo = bisect_left(self.sorted_pincodes, prefix)
+            hi = bisect_right(self.sorted_pincodes, prefix + '\uffff')
+            results = []
+            for pincode in self.sorted_pincodes[lo:min(hi, lo + limit)]:
+                lat, lng, row = self.pincode_map[pincode]
+                place = self.place(row)
+                place.update({'label': f"{pincode} - {place['label'].split(' (')[0]}", 'pincode': pincode,
+                              'latitude': lat, 'longitude': lng})
+                results.append(place)
+            return results
+
+        lo = bisect_left(self.keys, prefix)
+        hi = min(bisect_right(self.keys, prefix + '\uffff'), lo + MAX_SCAN)
+        candidates = {}
+        for i in range(lo, hi):
+            row = self.key_rows[i]
+            exact = self.keys[i] == prefix
+            whole_name = self.keys[i] == self.name_keys[row]
+            rank = (not exact, -self._in_context(row, context), not whole_name, len(self.names[row]),
+                    KIND_RANK[self.kinds[row]], self.names[row])
+            if row not in candidates or rank < candidates[row]:
+                candidates[row] = rank
+        best = sorted(candidates, key=candidates.get)[:limit]
+        return [self.place(row) for row in best]
+
+    def geocode(self, address):
+        """
+        Coordinates for a free-text address, or None if no part of it is known
+
+        A pincode anywhere in the text wins; otherwise the most specific
+        comma-separated part naming a known place is used, preferring places
+        inside the district/state named by the other parts.
+        """
+        match = PINCODE_RE.search(address or '')
+        if match and match.group(1) in self.pincode_map:
+            return self.lookup_pincode(match.group(1))
+
+        parts = normalize_address(address).split(', ')
+        context = set(parts)
+        for part in parts:
+            rows = self.by_name.get(part)
+            if rows:
+                row = min(rows, key=lambda r: (-self._in_context(r, context - {part}), KIND_RANK[self.kinds[r]]))
+                return (self.latitudes[row], self.longitudes[row])
+        return None
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide gazetteer, loaded on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+def write_gazetteer(rows, path=GAZETTEER_PATH):
+    """
+    Write place dicts (keys as in COLUMNS) to the compact gzipped TSV
+
+    Returns:
+        int: Rows written
+    """
+    order = {'state': 0, 'district': 1, 'town': 2, 'locality': 3}
+    rows = sorted(rows, key=lambda r: (r['state'], order[r['kind']], r.get('district', ''), r['name']))
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=9) as f:
+        f.write('# ' + '\t'.join(COLUMNS) + '\n')
+        for row in rows:
+            f.write(unicodedata.normalize('NFKC', '\t'.join([
+                row['kind'], row['name'], row.get('district', ''), row['state'], row.get('pincode', ''),
+                f"{float(row['latitude']):.4f}", f"{float(row['longitude']):.4f}", ';'.join(row.get('aliases', []))
+            ])) + '\n')
+    return len(rows)
+
+
+def _office_name(name):
+    # "Hadapsar S.O" / "Wagholi B.O" -> "Hadapsar" / "Wagholi"
+    return re.sub(r'\s+(?:[BSH]\.?\s?O\.?|GPO|G\.P\.O\.?)$', '', name.strip(), flags=re.I).strip()
+
+
+def build_from_pincode_directory(source, path=GAZETTEER_PATH):
+    """
+    Build the gazetteer from the India Post "All India Pincode Directory" CSV
+
+    Each post office becomes a locality; districts and states are placed at
+    the mean of their offices. Offices without usable coordinates are
+    skipped.
+
+    Returns:
+        int: Rows written
+    """
+    places = {}
+    districts = defaultdict(lambda: [0.0, 0.0, 0])
+    states = defaultdict(lambda: [0.0, 0.0, 0])
+    with open(source, newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            record = {key.strip().lower(): (value or '').strip() for key, value in record.items() if key}
+            try:
+                lat = float(record.get('latitude', ''))
+                lng = float(record.get('longitude', ''))
+            except ValueError:
+                continue
+            if not (INDIA_BOUNDS[0] <= lat <= INDIA_BOUNDS[1] and INDIA_BOUNDS[2] <= lng <= INDIA_BOUNDS[3]):
+                continue
+            state = record.get('statename', '').title()
+            district = (record.get('districtname') or record.get('district', '')).title()
+            name = _office_name(record.get('officename', '')).title()
+            pincode = record.get('pincode', '')
+            if not (state and district and name):
+                continue
+            places.setdefault((name, district, state, pincode), {
+                'kind': 'locality', 'name': name, 'district': district, 'state': state, 'pincode': pincode,
+                'latitude': lat, 'longitude': lng
+            })
+            for totals, key in ((districts, (district, state)), (states, state)):
+                totals[key][0] += lat
+                totals[key][1] += lng
+                totals[key][2] += 1
+
+    rows = list(places.values())
+    rows += [{'kind': 'district', 'name': district, 'district': district, 'state': state,
+              'latitude': lat / n, 'longitude': lng / n} for (district, state), (lat, lng, n) in districts.items()]
+    rows += [{'kind': 'state', 'name': state, 'state': state, 'latitude': lat / n, 'longitude': lng / n}
+             for state, (lat, lng, n) in states.items()]
+    return write_gazetteer(rows, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision offline gazetteer")
+    parser.add_argument('--build', metavar='CSV', help='Build the gazetteer from the pincode directory CSV')
+    parser.add_argument('--output', default=GAZETTEER_PATH, help='Gazetteer file to write or read')
+    parser.add_argument('--complete', metavar='TEXT', help='Show type-ahead suggestions for TEXT')
+    parser.add_argument('--geocode', metavar='ADDRESS', help='Resolve an address offline')
+    args = parser.parse_args()
+
+    if args.build:
+        if not os.path.exists(args.build):
+            print(f"File not found: {args.build}")
+            return False
+        print(f"Wrote {build_from_pincode_directory(args.build, args.output):,} places to {args.output}")
+        return True
+
+    started = time.perf_counter()
+    gazetteer = Gazetteer(args.output)
+    print(f"Loaded {len(gazetteer):,} places, {len(gazetteer.pincode_map):,} pincodes "
+          f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if args.complete:
+        for place in gazetteer.complete(args.complete):
+            print(f"  {place['label']} [{place['kind']}] {place['latitude']:.4f}, {place['longitude']:.4f}")
+    if args.geocode:
+        print(f"  {gazetteer.geocode(args.geocode) or 'Not found offline'}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Geo Query Benchmark for AgriVision
+Latency percentiles and memory of the nearby-shop path with 1k, 100k and 1M
+synthetic shops, across search radii:
+- Database.get_nearby_shops (shop index lookup plus row fetch)
+- PesticideShopLocator.get_shops_from_database (adds the Database setup and
+  conversion to map dictionaries)
+- PesticideShopLocator.sort_shops_by_distance (the list view's distance
+  sort in render_pesticide_shops_map)
+
+Shop databases are generated once with synthetic_data into --workdir and
+reused. Query points are drawn around the same towns the shops are, so
+searches hit realistic densities. A run can be saved as the baseline;
+later runs compare against it and fail when a latency or memory figure
+regresses beyond the tolerance.
+
+Usage:
+    python geo_benchmark.py                                  # compare with the baseline
+    python geo_benchmark.py --sizes 1000,100000 --queries 50
+    python geo_benchmark.py --update-baseline
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import platform
+import argparse
+import resource
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import synthetic_data
+from database import Database
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_RADII = (1, 5, 10, 25, 50)
+DEFAULT_QUERIES = 100
+# Timed passes per radius; each percentile keeps its best pass, which
+# filters out interference from other processes
+DEFAULT_ROUNDS = 3
+WARMUP_QUERIES = 5
+MEMORY_QUERIES = 10
+WORKDIR = "data/synthetic/geo_benchmark"
+BASELINE_PATH = "data/geo_benchmark_baseline.json"
+# A figure regresses when it is this much worse than the baseline...
+DEFAULT_TOLERANCE = 0.5
+# ...and worse by more than this, so scheduling jitter on small queries never fails a run
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_KB = 64
+# Query points scatter around town centres like the synthetic shops do
+POINT_SPREAD_DEGREES = 0.12
+
+
+def ensure_database(workdir, size, seed):
+    """
+    Benchmark database with exactly `size` synthetic shops, generated on first use
+
+    Returns:
+        str: Database path
+    """
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, f"geo_{size}.db")
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            existing = conn.execute("SELECT COUNT(*) FROM pesticide_shops").fetchone()[0]
+        except sqlite3.Error:
+            existing = None
+        finally:
+            conn.close()
+        if existing == size:
+            return path
+        os.remove(path)
+    print(f"Generating {size:,} shops in {path}")
+    synthetic_data.generate(path, shops=size, seed=seed)
+    return path
+
+
+def query_points(count, seed):
+    """(lat, lng) pairs around the synthetic towns, weighted like the shops"""
+    rng = np.random.default_rng(seed)
+    weights = np.array([city[5] for city in synthetic_data.CITIES], dtype=float)
+    towns = rng.choice(len(synthetic_data.CITIES), size=count, p=weights / weights.sum())
+    offsets = rng.normal(0, POINT_SPREAD_DEGREES, size=(count, 2))
+    return [(round(synthetic_data.CITIES[town][2] + offset[0], 6), round(synthetic_data.CITIES[town][3] + offset[1], 6))
+            for town, offset in zip(towns, offsets)]
+
+
+def _percentiles(latencies):
+    values = np.array(latencies) * 1000
+    return {'p50': round(float(np.percentile(values, 50)), 3), 'p95': round(float(np.percentile(values, 95)), 3),
+            'p99': round(float(np.percentile(values, 99)), 3), 'mean': round(float(values.mean()), 3)}
+
+
+def measure(query, points, rounds=DEFAULT_ROUNDS):
+    """
+    Latency percentiles (ms), average result count and peak allocation of query(lat, lng)
+
+    Memory is traced in a separate, shorter pass so tracing does not skew the timings.
+    """
+    for lat, lng in points[:WARMUP_QUERIES]:
+        query(lat, lng)
+
+    passes = []
+    for _ in range(rounds):
+        latencies = []
+        results = 0
+        for lat, lng in points:
+            began = time.perf_counter()
+            found = query(lat, lng)
+            latencies.append(time.perf_counter() - began)
+            results += len(found)
+        passes.append(_percentiles(latencies))
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for lat, lng in points[:MEMORY_QUERIES]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            query(lat, lng)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    metrics = {key: min(timings[key] for timings in passes) for key in passes[0]}
+    metrics['results'] = round(results / len(points), 1)
+    metrics['peak_kb'] = round(peak / 1024, 1)
+    return metrics
+
+
+def _index_bytes(index):
+    arrays = [index.ids, index.lats, index.lngs, index.active, index.has_hours,
+              index.interval_shops, index.interval_starts, index.interval_ends]
+    return int(sum(array.nbytes for array in arrays) + sum(posting.nbytes for posting in index.postings.values()))
+
+
+def benchmark_size(db_path, points, radii, rounds=DEFAULT_ROUNDS):
+    """
+    Every target at every radius against one database
+
+    Returns:
+        dict: Index load time and size, peak RSS and per-target, per-radius metrics
+    """
+    db = Database(db_path)
+    db.cache.clear()
+    began = time.perf_counter()
+    index = db.get_shop_index()
+    result = {
+        'shops': len(index),
+        'index_load_seconds': round(time.perf_counter() - began, 3),
+        'index_kb': round(_index_bytes(index) / 1024, 1),
+        'targets': {}
+    }
+
+    targets = {'get_nearby_shops': lambda radius: lambda lat, lng: db.get_nearby_shops(lat, lng, radius)}
+    try:
+        from pesticide_shops_map import PesticideShopLocator
+    except ImportError as e:
+        print(f"  Skipping locator targets: {e}")
+    else:
+        locator = PesticideShopLocator(db_path)
+
+        def sort_target(radius):
+            # The list view sorts the shops the search returned
+            found = {point: locator.get_shops_from_database(point[0], point[1], radius) for point in points}
+            return lambda lat, lng: locator.sort_shops_by_distance(lat, lng, list(found[(lat, lng)]))
+
+        targets['get_shops_from_database'] = lambda radius: lambda lat, lng: locator.get_shops_from_database(lat, lng, radius)
+        targets['sort_shops_by_distance'] = sort_target
+
+    for name, make_query in targets.items():
+        result['targets'][name] = {}
+        for radius in radii:
+            metrics = measure(make_query(radius), points, rounds)
+            result['targets'][name][str(radius)] = metrics
+            print(f"  {name:24} {radius:>4} km  p50 {metrics['p50']:9.3f}  p95 {metrics['p95']:9.3f}  "
+                  f"p99 {metrics['p99']:9.3f} ms  {metrics['results']:6.1f} shops  peak {metrics['peak_kb']:8.1f} KB")
+
+    # ru_maxrss is in KB on Linux
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(f"  index: {result['index_load_seconds']}s to load, {result['index_kb']:,} KB; "
+          f"process peak RSS {result['peak_rss_mb']} MB")
+    return result
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Figures in current that are worse than the baseline beyond the tolerance
+
+    Latency is judged on p50 (tail percentiles of 100 queries are too noisy
+    to fail a run on; they are reported and saved for reading). Only sizes,
+    targets and radii present in both runs are compared.
+
+    Returns:
+        list: Human-readable regression descriptions (empty when none)
+    """
+    regressions = []
+
+    def check(label, now, before, floor, unit):
+        if before is not None and now > before * (1 + tolerance) and now - before > floor:
+            regressions.append(f"{label}: {before} -> {now} {unit} (+{(now / before - 1) * 100:.0f}%)"
+                               if before else f"{label}: {before} -> {now} {unit}")
+
+    for size, run in current['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if not base:
+            continue
+        check(f"{size} shops index size", run['index_kb'], base.get('index_kb'), MIN_REGRESSION_KB, 'KB')
+        for target, radii in run['targets'].items():
+            for radius, metrics in radii.items():
+                before = base.get('targets', {}).get(target, {}).get(radius)
+                if not before:
+                    continue
+                label = f"{size} shops {target} {radius} km"
+                check(f"{label} p50", metrics['p50'], before.get('p50'), MIN_REGRESSION_MS, 'ms')
+                check(f"{label} peak memory", metrics['peak_kb'], before.get('peak_kb'), MIN_REGRESSION_KB, 'KB')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision nearby-shop benchmark")
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated shop counts')
+    parser.add_argument('--radii', default=",".join(str(radius) for radius in DEFAULT_RADII),
+                        help='Comma-separated search radii in km')
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES, help='Timed queries per radius and pass')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help='Timed passes per radius (best kept)')
+    parser.add_argument('--workdir', default=WORKDIR, help='Where benchmark databases are kept')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline results file')
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown before a figure counts as a regression (0.5 = 50%%)')
+    parser.add_argument('--output', help='Also write this run to a JSON file')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for shops and query points')
+    args = parser.parse_args()
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+        radii = [float(radius) if '.' in radius else int(radius) for radius in args.radii.split(',')]
+    except ValueError:
+        print("--sizes and --radii must be comma-separated numbers")
+        return False
+
+    points = query_points(args.queries, args.seed)
+    run = {'environment': environment(), 'queries': args.queries, 'rounds': args.rounds, 'radii': radii, 'sizes': {}}
+    for size in sizes:
+        db_path = ensure_database(args.workdir, size, args.seed)
+        print(f"\n{size:,} shops")
+        run['sizes'][str(size)] = benchmark_size(db_path, points, radii, args.rounds)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return True
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return True
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('platform') != run['environment']['platform'] or \
+            baseline.get('environment', {}).get('cpus') != run['environment']['cpus']:
+        print(f"\nNote: the baseline was recorded on {baseline.get('environment', {}).get('platform')} "
+              f"({baseline.get('environment', {}).get('cpus')} CPUs); timings may not be comparable")
+
+    regressions = compare(run, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return False
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Geocoding Cache for AgriVision
+Persistent SQLite cache in front of Nominatim for the shop locator:
+- keys are normalized addresses ("Hadapsar,  PUNE." == "hadapsar, pune") or
+  coordinates rounded to ~11 m for reverse lookups
+- found results live for POSITIVE_TTL_DAYS, "not found" for NEGATIVE_TTL_DAYS;
+  upstream errors are never cached
+- a token bucket keeps upstream calls within Nominatim's 1 request/second
+  policy (per process)
+- concurrent sessions asking for the same key share one upstream call
+
+The geocoder is anything with geopy's geocode(query)/reverse(query)
+interface, so a local stub can stand in for Nominatim. The default
+Nominatim endpoint can also be redirected to a local stub server with
+AGRIVISION_NOMINATIM_DOMAIN (and AGRIVISION_NOMINATIM_SCHEME=http).
+
+Usage:
+    python geocode_cache.py --stats
+    python geocode_cache.py --purge
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import unicodedata
+
+USER_AGENT = "agrivision_pesticide_locator"
+POSITIVE_TTL_DAYS = 90
+NEGATIVE_TTL_DAYS = 1
+RATE_PER_SECOND = 1.0
+BURST = 1
+MAX_WAIT_SECONDS = 10.0
+UPSTREAM_TIMEOUT_SECONDS = 10
+REVERSE_DECIMALS = 4
+PURGE_EVERY_WRITES = 1000
+
+CREATE_GEOCODE_CACHE_SQL = '''
+    CREATE TABLE IF NOT EXISTS geocode_cache (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        found INTEGER NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        address TEXT,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID
+'''
+
+
+class RateLimited(Exception):
+    """The upstream geocoder is saturated; try again shortly"""
+
+
+def normalize_address(address):
+    """
+    Cache key for a free-text address
+
+    Case, accents-as-composed-characters, punctuation, repeated spaces and a
+    trailing ", India" do not change the key; the order of the parts does.
+
+    Returns:
+        str: Normalized key ('' for blank input)
+    """
+    text = unicodedata.normalize('NFKC', address or '').casefold()
+    text = re.sub(r"[.;:/\\#()\[\]\"'_-]+", ' ', text)
+    parts = [re.sub(r'\s+', ' ', part).strip() for part in text.split(',')]
+    parts = [part for part in parts if part]
+    if len(parts) > 1 and parts[-1] == 'india':
+        parts.pop()
+    return ', '.join(parts)
+
+
+def reverse_key(lat, lng):
+    return f"{round(float(lat), REVERSE_DECIMALS):.{REVERSE_DECIMALS}f},{round(float(lng), REVERSE_DECIMALS):.{REVERSE_DECIMALS}f}"
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep until it is due"""
+
+    def __init__(self, rate_per_second=RATE_PER_SECOND, capacity=BURST):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait=MAX_WAIT_SECONDS):
+        """
+        Take one token, waiting for it if needed
+
+        Returns:
+            bool: False (without taking a token) if the wait would exceed max_wait
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return False
+            # Tokens may go negative: later callers queue behind this reservation
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _default_geocoder():
+    from geopy.geocoders import Nominatim
+
+    options = {'user_agent': USER_AGENT}
+    if os.environ.get('AGRIVISION_NOMINATIM_DOMAIN'):
+        options['domain'] = os.environ['AGRIVISION_NOMINATIM_DOMAIN']
+        options['scheme'] = os.environ.get('AGRIVISION_NOMINATIM_SCHEME', 'https')
+    return Nominatim(**options)
+
+
+class GeocodeCache:
+    """Read-through geocode cache with negative caching, rate limiting and call coalescing"""
+
+    def __init__(self, db_name, geocoder=None, limiter=None):
+        self.db_name = db_name
+        self._geocoder = geocoder
+        self.limiter = limiter or TokenBucket()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.writes = 0
+        self.counters = {'hits': 0, 'negative_hits': 0, 'upstream_calls': 0, 'coalesced': 0,
+                         'errors': 0, 'rate_limited': 0}
+
+    @property
+    def geocoder(self):
+        if self._geocoder is None:
+            self._geocoder = _default_geocoder()
+        return self._geocoder
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, timeout=30)
+            conn.execute(CREATE_GEOCODE_CACHE_SQL)
+            self.local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _lookup(self, kind, key):
+        return self._connection().execute('''
+            SELECT found, latitude, longitude, address FROM geocode_cache
+            WHERE kind = ? AND key = ? AND expires_at > ?
+        ''', (kind, key, time.time())).fetchone()
+
+    def _store(self, kind, key, latitude, longitude, address):
+        found = latitude is not None
+        ttl_days = POSITIVE_TTL_DAYS if found else NEGATIVE_TTL_DAYS
+        conn = self._connection()
+        conn.execute('''
+            INSERT OR REPLACE INTO geocode_cache (kind, key, found, latitude, longitude, address, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (kind, key, int(found), latitude, longitude, address, time.time() + ttl_days * 86400))
+        conn.commit()
+        with self.lock:
+            self.writes += 1
+            purge = self.writes % PURGE_EVERY_WRITES == 0
+        if purge:
+            self.purge_expired()
+        return (int(found), latitude, longitude, address)
+
+    def _resolve(self, kind, key, fetch):
+        """Cached row for key, calling fetch() once per key across concurrent callers on a miss"""
+        row = self._lookup(kind, key)
+        if row is not None:
+            self._count('hits' if row[0] else 'negative_hits')
+            return row
+
+        with self.lock:
+            call = self.inflight.get((kind, key))
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.inflight[(kind, key)] = call
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            # Another process may have filled the entry meanwhile
+            call.result = self._lookup(kind, key)
+            if call.result is None:
+                if not self.limiter.acquire():
+                    self._count('rate_limited')
+                    raise RateLimited("Geocoding service is busy, please try again in a moment")
+                self._count('upstream_calls')
+                try:
+                    call.result = self._store(kind, key, *fetch())
+                except RateLimited:
+                    raise
+                except Exception:
+                    self._count('errors')
+                    raise
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[(kind, key)]
+            call.done.set()
+
+    def geocode(self, address):
+        """
+        Coordinates for an address
+
+        Returns:
+            tuple: (latitude, longitude), or None if the address is unknown
+
+        Raises:
+            RateLimited: The upstream rate limit would need too long a wait
+            Exception: Upstream errors (not cached)
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+
+        def fetch():
+            location = self.geocoder.geocode(address.strip(), timeout=UPSTREAM_TIMEOUT_SECONDS)
+            if location is None:
+                return None, None, None
+            return location.latitude, location.longitude, location.address
+
+        found, latitude, longitude, _ = self._resolve('forward', key, fetch)
+        return (latitude, longitude) if found else None
+
+    def reverse(self, lat, lng):
+        """
+        Address for coordinates (cached at ~11 m resolution)
+
+        Returns:
+            str: Address, or None if nothing is known there
+        """
+        key = reverse_key(lat, lng)
+
+        def fetch():
+            location = self.geocoder.reverse(key.replace(',', ', '), timeout=UPSTREAM_TIMEOUT_SECONDS)
+            if location is None:
+                return None, None, None
+            return location.latitude, location.longitude, location.address
+
+        found, _, _, address = self._resolve('reverse', key, fetch)
+        return address if found else None
+
+    def purge_expired(self):
+        """Delete expired entries; returns how many were removed"""
+        conn = self._connection()
+        removed = conn.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+        return removed
+
+    def stats(self):
+        """Hit, upstream-call and coalescing counters plus stored entry counts"""
+        with self.lock:
+            stats = dict(self.counters)
+        stats['entries'], stats['negative_entries'] = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(found = 0), 0) FROM geocode_cache WHERE expires_at > ?",
+            (time.time(),)).fetchone()
+        lookups = stats['hits'] + stats['negative_hits'] + stats['upstream_calls'] + stats['coalesced']
+        stats['hit_rate'] = round((lookups - stats['upstream_calls']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_name="agrivision.db"):
+    """Process-wide geocode cache for a database file, shared by every session"""
+    with _caches_lock:
+        if db_name not in _caches:
+            _caches[db_name] = GeocodeCache(db_name)
+        return _caches[db_name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision geocode cache")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database')
+    parser.add_argument('--stats', action='store_true', help='Show stored entry counts')
+    parser.add_argument('--purge', action='store_true', help='Delete expired entries')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return False
+
+    cache = GeocodeCache(args.db)
+    if args.purge:
+        print(f"Removed {cache.purge_expired():,} expired entries")
+    stats = cache.stats()
+    print(f"{stats['entries']:,} cached lookups ({stats['negative_entries']:,} not found)")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
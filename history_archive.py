@@ -0,0 +1,406 @@
+"""
+Prediction History Partitioning for AgriVision
+Recent predictions live in the hot prediction_history table. A background
+archiver moves whole months older than HOT_MONTHS into monthly archive tables
+(prediction_history_YYYY_MM, same columns, zlib-compressed input_data) that
+are registered in history_partitions. Per-user totals are kept current in
+user_prediction_summary by an insert trigger. The read functions here span
+the hot table and every archive and return rows shaped like the hot table.
+"""
+
+import zlib
+import sqlite3
+import threading
+from datetime import date
+
+import prediction_inputs
+
+HOT_MONTHS = 6
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_INTERVAL_SECONDS = 6 * 3600
+ARCHIVE_PREFIX = 'prediction_history_'
+
+CREATE_PARTITIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS history_partitions (
+        name TEXT PRIMARY KEY,
+        month TEXT NOT NULL UNIQUE,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        raw_bytes INTEGER NOT NULL DEFAULT 0,
+        stored_bytes INTEGER NOT NULL DEFAULT 0,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CREATE_SUMMARY_SQL = '''
+    CREATE TABLE IF NOT EXISTS user_prediction_summary (
+        user_id INTEGER NOT NULL,
+        prediction_type TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        last_at TIMESTAMP,
+        last_result TEXT,
+        PRIMARY KEY (user_id, prediction_type)
+    ) WITHOUT ROWID
+'''
+
+# Archiving deletes from the hot table, so only inserts touch the summary
+CREATE_SUMMARY_TRIGGER_SQL = '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_prediction_summary AFTER INSERT ON prediction_history
+    WHEN NEW.user_id IS NOT NULL
+    BEGIN
+        INSERT INTO user_prediction_summary (user_id, prediction_type, count, last_at, last_result)
+        VALUES (NEW.user_id, COALESCE(NEW.prediction_type, ''), 1,
+                COALESCE(NEW.created_at, CURRENT_TIMESTAMP), NEW.result)
+        ON CONFLICT (user_id, prediction_type) DO UPDATE SET
+            count = count + 1,
+            last_result = CASE WHEN excluded.last_at >= last_at THEN excluded.last_result ELSE last_result END,
+            last_at = MAX(last_at, excluded.last_at);
+    END
+'''
+
+HISTORY_COLUMNS = "id, user_id, prediction_type, input_data, result, created_at"
+
+# input_data is ~100 bytes of JSON, too short for zlib to find repeats on its
+# own. A preset dictionary of the keys and common values MLModules saves
+# roughly halves it. Archived blobs start with a format byte; never edit
+# this dictionary, add a new format instead.
+ZLIB_FORMAT = b'\x01'
+ZLIB_DICTIONARY = (
+    b'{"N": {"P": {"K": , "temp": , "humidity": , "ph": , "rainfall": }'
+    b'{"soil_moisture": , "temperature": , "soil_type": "Loamy"Clay"Sandy"Silt", "crop": ", '
+    b'"growth_stage": "Initial"Mid"Late"}'
+    b'{"area": , "state": "Maharashtra", "season": "Kharif"Rabi"Summer"Whole Year", "fertilizer": , "year": 20'
+)
+# A 1 KB window holds the whole dictionary and is much cheaper to set up per row
+ZLIB_WBITS = -10
+
+_archiver = None
+_archiver_lock = threading.Lock()
+_archiver_stop = threading.Event()
+
+
+def archive_table_name(month):
+    """Archive table for a 'YYYY-MM' month"""
+    return ARCHIVE_PREFIX + month.replace('-', '_')
+
+
+def compress(text):
+    """Compress one input_data JSON string for an archive partition"""
+    if text is None:
+        return None
+    compressor = zlib.compressobj(6, zlib.DEFLATED, ZLIB_WBITS, 4, zlib.Z_DEFAULT_STRATEGY, ZLIB_DICTIONARY)
+    return ZLIB_FORMAT + compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+
+def decompress(blob):
+    """Inverse of compress"""
+    if blob is None:
+        return None
+    decompressor = zlib.decompressobj(ZLIB_WBITS, ZLIB_DICTIONARY)
+    return (decompressor.decompress(blob[1:]) + decompressor.flush()).decode('utf-8')
+
+
+def init_partitioning(cursor):
+    """Create the partition registry and summary rollup (called from Database.init_database)"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_created ON prediction_history(created_at)
+    ''')
+    cursor.execute(CREATE_PARTITIONS_SQL)
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'user_prediction_summary'")
+    summary_exists = cursor.fetchone() is not None
+    cursor.execute(CREATE_SUMMARY_SQL)
+    cursor.execute(CREATE_SUMMARY_TRIGGER_SQL)
+    if not summary_exists:
+        rebuild_summary(cursor)
+
+
+def archive_tables(cursor):
+    """(table name, month) of every archive partition, newest month first"""
+    try:
+        cursor.execute("SELECT name, month FROM history_partitions ORDER BY month DESC")
+    except sqlite3.OperationalError:
+        # Database created before partitioning; everything is still hot
+        return []
+    return cursor.fetchall()
+
+
+def history_source_sql(cursor, columns):
+    """
+    Subquery over the hot table and every archive partition
+
+    Only use for columns stored uncompressed (everything except input_data).
+
+    Args:
+        cursor: Cursor used to read the partition registry
+        columns: Column list to select from each partition
+
+    Returns:
+        str: Parenthesised UNION ALL subquery
+    """
+    tables = ['prediction_history'] + [name for name, _ in archive_tables(cursor)]
+    return "(" + " UNION ALL ".join(f"SELECT {columns} FROM {table}" for table in tables) + ")"
+
+
+def rebuild_summary(cursor):
+    """Recompute user_prediction_summary from all partitions in one grouped pass"""
+    cursor.execute("DELETE FROM user_prediction_summary")
+    # The bare result column comes from the row holding MAX(created_at)
+    cursor.execute(f'''
+        INSERT INTO user_prediction_summary (user_id, prediction_type, count, last_at, last_result)
+        SELECT user_id, COALESCE(prediction_type, ''), COUNT(*), MAX(created_at), result
+        FROM {history_source_sql(cursor, 'user_id, prediction_type, result, created_at')}
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, COALESCE(prediction_type, '')
+    ''')
+
+
+def archive_cutoff(hot_months=HOT_MONTHS, today=None):
+    """First day of the oldest month kept hot ('YYYY-MM-DD')"""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - (hot_months - 1)
+    return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}-01"
+
+
+def _ensure_archive_table(cursor, month):
+    name = archive_table_name(month)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            prediction_type TEXT,
+            input_data BLOB,
+            result TEXT,
+            created_at TIMESTAMP
+        )
+    ''')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_user_created ON {name}(user_id, created_at)")
+    cursor.execute("INSERT OR IGNORE INTO history_partitions (name, month) VALUES (?, ?)", (name, month))
+    return name
+
+
+def archive_predictions(db_name, hot_months=HOT_MONTHS, batch_size=ARCHIVE_BATCH_SIZE, stop_event=None):
+    """
+    Move predictions older than the hot window into monthly archive tables
+
+    Each batch is copied and deleted in one transaction, so every row is in
+    exactly one partition at any time.
+
+    Args:
+        db_name: SQLite database path
+        hot_months: Months (including the current one) kept in prediction_history
+        batch_size: Rows moved per transaction
+        stop_event: Optional threading.Event that ends the run between batches
+
+    Returns:
+        dict: Rows archived per month
+    """
+    cutoff = archive_cutoff(hot_months)
+    archived = {}
+    # Typed inputs must be captured while input_data is still plain JSON in the hot table
+    prediction_inputs.backfill(db_name, partitions=['prediction_history'])
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        cursor = conn.cursor()
+        init_partitioning(cursor)
+        conn.commit()
+
+        while not (stop_event and stop_event.is_set()):
+            cursor.execute(f'''
+                SELECT {HISTORY_COLUMNS}
+                FROM prediction_history
+                WHERE created_at < ?
+                ORDER BY created_at, id
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(str(row[5])[:7], []).append(row)
+
+            try:
+                for month, month_rows in by_month.items():
+                    name = _ensure_archive_table(cursor, month)
+                    raw_bytes = sum(len(row[3] or '') for row in month_rows)
+                    packed = [row[:3] + (compress(row[3]),) + row[4:] for row in month_rows]
+                    cursor.executemany(f'''
+                        INSERT OR REPLACE INTO {name} ({HISTORY_COLUMNS})
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', packed)
+                    cursor.execute('''
+                        UPDATE history_partitions
+                        SET row_count = row_count + ?, raw_bytes = raw_bytes + ?, stored_bytes = stored_bytes + ?,
+                            archived_at = CURRENT_TIMESTAMP
+                        WHERE name = ?
+                    ''', (len(packed), raw_bytes, sum(len(row[3] or b'') for row in packed), name))
+                    archived[month] = archived.get(month, 0) + len(packed)
+
+                cursor.executemany("DELETE FROM prediction_history WHERE id = ?", [(row[0],) for row in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+    return archived
+
+
+def _page_from(cursor, table, user_id, before, limit):
+    if before:
+        cursor.execute(f'''
+            SELECT id, prediction_type, input_data, result, created_at
+            FROM {table}
+            WHERE user_id = ? AND (created_at, id) < (?, ?)
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (user_id, before[0], before[1], limit))
+    else:
+        cursor.execute(f'''
+            SELECT id, prediction_type, input_data, result, created_at
+            FROM {table}
+            WHERE user_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (user_id, limit))
+    return cursor.fetchall()
+
+
+def get_user_history_page(conn, user_id, before=None, limit=10):
+    """
+    One page of a user's predictions across all partitions, newest first
+
+    The hot table answers most pages alone. Archives are read newest month
+    first and only until they can no longer contribute to the page.
+
+    Args:
+        conn: Open database connection
+        user_id: User whose history to read
+        before: (created_at, id) cursor from the previous page, or None
+        limit: Page size
+
+    Returns:
+        tuple: ((id, prediction_type, input_data, result, created_at) rows,
+                cursor for the next page or None)
+    """
+    cursor = conn.cursor()
+    # One read transaction, so a concurrent archiver batch cannot move rows between queries
+    cursor.execute("BEGIN")
+    try:
+        rows = _page_from(cursor, 'prediction_history', user_id, before, limit + 1)
+        partitions = archive_tables(cursor)
+
+        if partitions:
+            # Every archived row is older than the start of the month after the newest archive
+            year, month = int(partitions[0][1][:4]), int(partitions[0][1][5:7])
+            boundary = f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+            if len(rows) <= limit or str(rows[limit][4]) < boundary:
+                archived_rows = 0
+                for name, _ in partitions:
+                    found = _page_from(cursor, name, user_id, before, limit + 1)
+                    rows.extend(row[:2] + (decompress(row[2]),) + row[3:] for row in found)
+                    archived_rows += len(found)
+                    # Older months cannot beat a full page from newer ones
+                    if archived_rows > limit:
+                        break
+                rows.sort(key=lambda row: (str(row[4]), row[0]), reverse=True)
+    finally:
+        conn.rollback()
+
+    next_cursor = (rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def get_prediction(conn, prediction_id, user_id=None):
+    """
+    Look up one prediction by id in whichever partition holds it
+
+    Returns:
+        tuple: (prediction_type, input_data, result, created_at) or None
+    """
+    cursor = conn.cursor()
+    tables = ['prediction_history'] + [name for name, _ in archive_tables(cursor)]
+    for index, table in enumerate(tables):
+        cursor.execute(f'''
+            SELECT prediction_type, input_data, result, created_at
+            FROM {table}
+            WHERE id = ? AND (? IS NULL OR user_id = ?)
+        ''', (prediction_id, user_id, user_id))
+        row = cursor.fetchone()
+        if row:
+            return row if index == 0 else (row[0], decompress(row[1])) + row[2:]
+    return None
+
+
+def iter_history_chunks(conn, prediction_type, chunk_size=5000):
+    """
+    Stream every prediction of one type, hot table first, in id-ordered chunks
+
+    Yields:
+        list: Up to chunk_size (id, input_data, result) rows
+    """
+    cursor = conn.cursor()
+    tables = ['prediction_history'] + [name for name, _ in archive_tables(cursor)]
+    for index, table in enumerate(tables):
+        last_id = 0
+        while True:
+            cursor.execute(f'''
+                SELECT id, input_data, result
+                FROM {table}
+                WHERE prediction_type = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (prediction_type, last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield rows if index == 0 else [(row[0], decompress(row[1]), row[2]) for row in rows]
+
+
+def get_partition_stats(conn):
+    """
+    Row counts and compression per partition
+
+    Returns:
+        list: (partition, month, rows, raw bytes, stored bytes), hot table first
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(input_data)), 0) FROM prediction_history")
+    hot_rows, hot_bytes = cursor.fetchone()
+    cursor.execute('''
+        SELECT name, month, row_count, raw_bytes, stored_bytes
+        FROM history_partitions
+        ORDER BY month DESC
+    ''')
+    return [('prediction_history', 'hot', hot_rows, hot_bytes, hot_bytes)] + cursor.fetchall()
+
+
+def start_archiver(db_name="agrivision.db", interval_seconds=ARCHIVE_INTERVAL_SECONDS, hot_months=HOT_MONTHS):
+    """
+    Start the background archiver once per process
+
+    Safe to call on every Streamlit rerun; later calls are no-ops.
+    """
+    global _archiver
+    with _archiver_lock:
+        if _archiver is not None:
+            return
+        _archiver = threading.Thread(target=_archiver_loop, args=(db_name, interval_seconds, hot_months),
+                                     name="agrivision-archiver")
+        _archiver.daemon = True
+        _archiver.start()
+
+
+def _archiver_loop(db_name, interval_seconds, hot_months):
+    while not _archiver_stop.is_set():
+        try:
+            # Resumes the typed-input migration for rows archived before it existed
+            prediction_inputs.backfill(db_name)
+            archived = archive_predictions(db_name, hot_months, stop_event=_archiver_stop)
+            if archived:
+                print(f"Archived predictions: {archived}")
+        except Exception as e:
+            print(f"History archiver error: {e}")
+        _archiver_stop.wait(interval_seconds)
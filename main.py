@@ -14,6 +14,23 @@ from language_utils import get_text, get_current_language, render_voice_controls
 from voice_assistant import VoiceAssistant
 from crop_disease_detection import render_disease_detection_ui
 from pesticide_shops_map import render_pesticide_shops_map
+from model_registry import start_warmup
+from online_learning import start_feedback_worker
+from history_archive import start_archiver
+from db_backup import start_scheduler as start_backup_scheduler
+from db_maintenance import start_scheduler as start_maintenance_scheduler
+import query_monitor
+
+# Load models and prime caches in the background as soon as the server imports the app
+start_warmup()
+# Apply farmer feedback to the online models in mini-batches
+start_feedback_worker()
+# Move old predictions into monthly archive partitions
+start_archiver()
+# Take scheduled online backups following the admin Backup Frequency setting
+start_backup_scheduler()
+# Checkpoint the WAL, refresh planner statistics and vacuum in small slices
+start_maintenance_scheduler()
 
 # Page configuration
 st.set_page_config(
@@ -109,10 +126,12 @@ def main():
     # Check if accessing admin panel
     query_params = st.query_params
     if 'admin' in query_params and query_params['admin'] == 'true':
+        query_monitor.set_page("admin")
         admin_panel.show_admin_dashboard()
         return
     
     # Authentication check
+    query_monitor.set_page("login")
     if not auth_manager.require_auth():
         return
     
@@ -220,6 +239,9 @@ def main():
     else:
         selected_page = menu_mapping.get(menu, "dashboard")
     
+    # Tag this rerun's queries with the page being rendered
+    query_monitor.set_page(selected_page)
+    
     if selected_page == "dashboard":
         dashboard.show_dashboard()
     elif selected_page == "crop":
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Map Clustering for AgriVision
+Server-side marker clustering for the shop maps. Shops are bucketed into
+square grid cells of CELL_PIXELS screen pixels in Web Mercator at each zoom
+level, so a map view only ever carries as many features as cells fit on the
+screen (and never more than MAX_FEATURES), whether the database holds a
+hundred shops or a hundred thousand:
+- each zoom level is aggregated once per index (counts and centroids with
+  numpy) and reused by every session until the shop data changes
+- a view is returned as one compact GeoJSON FeatureCollection, drawn by a
+  single folium.GeoJson layer instead of one folium.Marker per shop
+
+Usage:
+    python map_clustering.py --db agrivision.db --zoom 5
+"""
+
+import sys
+import json
+import math
+import argparse
+import threading
+
+import numpy as np
+
+TILE_SIZE = 256
+CELL_PIXELS = 64
+MIN_ZOOM = 0
+MAX_ZOOM = 18
+MAX_FEATURES = 500
+# Web Mercator is undefined at the poles
+MAX_LATITUDE = 85.05112878
+COORDINATE_DECIMALS = 5
+
+
+def mercator_pixels(lats, lngs, zoom):
+    """
+    World pixel coordinates of points at a zoom level
+
+    Args:
+        lats: Latitudes (array-like)
+        lngs: Longitudes (array-like)
+        zoom: Zoom level
+
+    Returns:
+        tuple: (x, y) float arrays; the world is TILE_SIZE * 2**zoom pixels wide
+    """
+    scale = TILE_SIZE * (2 ** zoom)
+    lats = np.clip(np.asarray(lats, dtype=float), -MAX_LATITUDE, MAX_LATITUDE)
+    lngs = np.asarray(lngs, dtype=float)
+    x = (lngs + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lats))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def parse_leaflet_bounds(bounds):
+    """
+    Viewport from the bounds streamlit-folium reports for a map
+
+    Args:
+        bounds: {'_southWest': {'lat', 'lng'}, '_northEast': {'lat', 'lng'}}
+
+    Returns:
+        tuple: (south, west, north, east), or None if the map has not reported bounds yet
+    """
+    try:
+        south_west, north_east = bounds['_southWest'], bounds['_northEast']
+        view = (float(south_west['lat']), float(south_west['lng']),
+                float(north_east['lat']), float(north_east['lng']))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return None if any(math.isnan(value) for value in view) else view
+
+
+class ClusterIndex:
+    """Grid clusters of a fixed set of points, aggregated lazily per zoom level"""
+
+    def __init__(self, ids, labels, lats, lngs, cell_pixels=CELL_PIXELS):
+        self.ids = list(ids)
+        self.labels = list(labels)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lngs = np.asarray(lngs, dtype=float)
+        self.cell_pixels = cell_pixels
+        self.levels = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, cell_pixels=CELL_PIXELS):
+        """Build from (id, label, latitude, longitude) rows, skipping rows without coordinates"""
+        rows = [row for row in rows if row[2] is not None and row[3] is not None]
+        return cls([row[0] for row in rows], [row[1] for row in rows],
+                   [row[2] for row in rows], [row[3] for row in rows], cell_pixels)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _level(self, zoom):
+        """Per-cluster count, centroid, bounds and first member at a zoom level"""
+        zoom = int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+        level = self.levels.get(zoom)
+        if level is not None:
+            return level
+
+        x, y = mercator_pixels(self.lats, self.lngs, zoom)
+        columns = int(TILE_SIZE * (2 ** zoom) // self.cell_pixels) + 1
+        cells = (y // self.cell_pixels).astype(np.int64) * columns + (x // self.cell_pixels).astype(np.int64)
+        keys, first, inverse = np.unique(cells, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(keys))
+        level = {
+            'count': counts,
+            'lat': np.bincount(inverse, weights=self.lats, minlength=len(keys)) / counts,
+            'lng': np.bincount(inverse, weights=self.lngs, minlength=len(keys)) / counts,
+            'first': first
+        }
+        for name, reduce, values in (('south', np.minimum, self.lats), ('west', np.minimum, self.lngs),
+                                     ('north', np.maximum, self.lats), ('east', np.maximum, self.lngs)):
+            extent = np.full(len(keys), np.inf if reduce is np.minimum else -np.inf)
+            reduce.at(extent, inverse, values)
+            level[name] = extent
+        with self.lock:
+            self.levels.setdefault(zoom, level)
+            return self.levels[zoom]
+
+    def clusters(self, zoom, view=None, max_features=MAX_FEATURES):
+        """
+        Clusters visible in a view
+
+        Zooms out a level at a time while the view would hold more than
+        max_features clusters.
+
+        Args:
+            zoom: Map zoom level
+            view: (south, west, north, east), or None for every point
+            max_features: Upper bound on the returned clusters
+
+        Returns:
+            tuple: (zoom the clusters were built at, list of cluster dicts with
+                    count, lat, lng, bounds and, for single points, id and label)
+        """
+        zoom = int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+        while True:
+            level = self._level(zoom)
+            if view is None:
+                visible = np.arange(len(level['count']))
+            else:
+                # A cluster is drawn if any of its members is in view
+                south, west, north, east = view
+                visible = np.flatnonzero((level['north'] >= south) & (level['south'] <= north) &
+                                         (level['east'] >= west) & (level['west'] <= east))
+            if len(visible) <= max_features or zoom == MIN_ZOOM:
+                break
+            zoom -= 1
+
+        if len(visible) > max_features:
+            # A single zoom-0 view of the whole world; keep the largest clusters
+            visible = visible[np.argsort(-level['count'][visible], kind='stable')[:max_features]]
+
+        clusters = []
+        for i in visible:
+            count = int(level['count'][i])
+            cluster = {
+                'count': count,
+                'lat': float(level['lat'][i]),
+                'lng': float(level['lng'][i]),
+                'bounds': (float(level['south'][i]), float(level['west'][i]),
+                           float(level['north'][i]), float(level['east'][i]))
+            }
+            if count == 1:
+                member = int(level['first'][i])
+                cluster['id'] = self.ids[member]
+                cluster['label'] = self.labels[member]
+            clusters.append(cluster)
+        return zoom, clusters
+
+    def to_geojson(self, zoom, view=None, max_features=MAX_FEATURES):
+        """
+        Clusters visible in a view as a GeoJSON FeatureCollection
+
+        Every feature is a Point with an 'id' and 'count' and 'label'
+        properties; single shops also carry their shop 'id' property.
+
+        Returns:
+            dict: FeatureCollection
+        """
+        built_zoom, clusters = self.clusters(zoom, view, max_features)
+        features = []
+        for cluster in clusters:
+            properties = {'count': cluster['count']}
+            if cluster['count'] == 1:
+                properties['id'] = cluster['id']
+                properties['label'] = str(cluster['label'])
+            else:
+                properties['label'] = f"{cluster['count']:,} shops"
+            features.append({
+                'type': 'Feature',
+                # Set here so folium never has to add ids to a shared collection
+                'id': str(len(features)),
+                'geometry': {'type': 'Point', 'coordinates': [round(cluster['lng'], COORDINATE_DECIMALS),
+                                                              round(cluster['lat'], COORDINATE_DECIMALS)]},
+                'properties': properties
+            })
+        return {'type': 'FeatureCollection', 'features': features, 'zoom': built_zoom}
+
+
+def _cluster_style(feature):
+    count = feature['properties']['count']
+    if count == 1:
+        return {'radius': 6, 'color': '#B71C1C', 'fillColor': '#E53935', 'fillOpacity': 0.9, 'weight': 1}
+    # Area grows with the shop count, capped so dense states stay readable
+    radius = min(10 + 4 * math.log10(count) ** 2, 30)
+    color = '#2E7D32' if count < 10 else '#F9A825' if count < 100 else '#E65100'
+    return {'radius': radius, 'color': color, 'fillColor': color, 'fillOpacity': 0.6, 'weight': 2}
+
+
+def add_cluster_layer(folium_map, collection, name="Shops"):
+    """
+    Draw a FeatureCollection from ClusterIndex.to_geojson on a folium map
+
+    Args:
+        folium_map: folium.Map to add the layer to
+        collection: FeatureCollection
+        name: Layer name
+
+    Returns:
+        folium.GeoJson: The added layer, or None for a view without shops
+    """
+    import folium
+
+    if not collection['features']:
+        return None
+    layer = folium.GeoJson(
+        collection,
+        name=name,
+        marker=folium.CircleMarker(),
+        style_function=_cluster_style,
+        tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False)
+    )
+    layer.add_to(folium_map)
+    return layer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision shop map clustering")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database')
+    parser.add_argument('--zoom', type=int, default=5, help='Map zoom level')
+    parser.add_argument('--view', help='south,west,north,east (default: every shop)')
+    args = parser.parse_args()
+
+    from database import Database
+
+    view = None
+    if args.view:
+        try:
+            view = tuple(float(value) for value in args.view.split(','))
+        except ValueError:
+            view = ()
+        if len(view) != 4:
+            print("--view must be four numbers: south,west,north,east")
+            return False
+
+    index = Database(args.db).get_shop_cluster_index()
+    collection = index.to_geojson(args.zoom, view)
+    payload = len(json.dumps(collection, separators=(',', ':')))
+    singles = sum(1 for feature in collection['features'] if feature['properties']['count'] == 1)
+    print(f"{len(index):,} shops -> {len(collection['features']):,} features at zoom {collection['zoom']} "
+          f"({singles:,} single shops), {payload / 1024:.1f} KB of GeoJSON")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,151 @@
+"""
+Map Render Cache for AgriVision
+Process-wide LRU of rendered shop maps. Every Streamlit rerun used to
+rebuild the folium map and serialize it again even when the search had not
+changed; entries here are keyed by (center rounded to ~11 m, radius, shop
+data version, zoom, ...) and shared by all sessions, so repeated and popular
+searches render once.
+
+Values are whatever the caller renders (the map HTML, or a GeoJSON
+FeatureCollection for maps that stay interactive through st_folium).
+Eviction is least-recently-used, bounded by entry count and total size.
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 128
+MAX_BYTES = 64 * 1024 * 1024
+CENTER_DECIMALS = 4
+
+
+def map_key(kind, center_lat, center_lng, radius_km, version, zoom, *extra):
+    """
+    Cache key for a map
+
+    Args:
+        kind: Which map ('locator', 'shops_overview', ...)
+        center_lat: Center latitude (rounded to CENTER_DECIMALS)
+        center_lng: Center longitude (rounded to CENTER_DECIMALS)
+        radius_km: Search radius
+        version: Version of the shop data drawn (see shops_version)
+        zoom: Zoom level
+        extra: Anything else the rendering depends on
+
+    Returns:
+        tuple: Hashable key
+    """
+    return (kind, round(float(center_lat), CENTER_DECIMALS), round(float(center_lng), CENTER_DECIMALS),
+            radius_km, version, zoom) + extra
+
+
+def shops_version(shops, fields=('name', 'lat', 'lng', 'address', 'rating', 'phone', 'open_now', 'products')):
+    """
+    Content digest of a list of shop dicts, for results that have no database generation
+
+    Returns:
+        str: Hex digest that changes whenever a drawn field changes
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for shop in shops:
+        digest.update(json.dumps([shop.get(field) for field in fields], default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_html(folium_map):
+    """Standalone HTML document for a folium map (for st.components.v1.html)"""
+    return folium_map.get_root().render()
+
+
+def _size(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, bytes):
+        return len(value)
+    return len(json.dumps(value, separators=(',', ':'), default=str))
+
+
+class MapRenderCache:
+    """Thread-safe LRU of rendered maps bounded by entries and bytes"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, render):
+        """
+        Cached value for key, calling render() on a miss
+
+        Concurrent misses on the same key may both render; the maps are
+        identical, so the later one simply replaces the earlier.
+
+        Args:
+            key: Key from map_key
+            render: Callable producing the HTML string or GeoJSON dict
+
+        Returns:
+            The cached or freshly rendered value (shared; do not mutate)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = render()
+        size = _size(value)
+        if size > self.max_bytes:
+            return value
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+            self.entries[key] = (size, value)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                evicted_size, _ = self.entries.popitem(last=False)[1]
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Hit/miss/eviction counters, entry count and cached bytes"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide map render cache shared by every session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MapRenderCache()
+        return _cache
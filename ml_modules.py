@@ -1,32 +1,33 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import plotly.express as px
 import plotly.graph_objects as go
 from database import Database
 from language_utils import get_text, get_current_language
+from crop_fallback import CropFallbackRecommender
+from model_registry import start_warmup, is_ready, get_model
+from online_learning import get_learner
 
 class MLModules:
     def __init__(self):
         self.db = Database()
         
-        # Load models
+        # Models are loaded once per process by the background warm-up
+        start_warmup()
+        self.models_warming_up = not is_ready()
+        self.crop_model = get_model('crop_model')
+        self.crop_encoder = get_model('crop_encoder')
+        self.irrigation_model = get_model('irrigation_model')
+        self.irrigation_preprocessor = get_model('irrigation_preprocessor')
+        self.yield_model = get_model('yield_model')
+        self.yield_preprocessor = get_model('yield_preprocessor')
+        
+        # Lightweight nearest-centroid engine used when the crop model is unavailable
         try:
-            self.crop_model = joblib.load("models/crop_recommendation_model.pkl")
-            self.crop_encoder = joblib.load("models/crop_encoder.pkl")
-            self.irrigation_model = joblib.load("models/irrigation_model.pkl")
-            self.irrigation_preprocessor = joblib.load("models/irrigation_preprocessor.pkl")
-            self.yield_model = joblib.load("models/yield_prediction_model.pkl")
-            self.yield_preprocessor = joblib.load("models/yield_preprocessor.pkl")
-        except Exception as e:
-            st.error(f"Error loading models: {e}")
-            self.crop_model = None
-            self.crop_encoder = None
-            self.irrigation_model = None
-            self.irrigation_preprocessor = None
-            self.yield_model = None
-            self.yield_preprocessor = None
+            self.crop_fallback = CropFallbackRecommender()
+        except Exception:
+            self.crop_fallback = None
     
     def show_crop_recommendation(self):
         """Enhanced crop recommendation module"""
@@ -121,6 +122,12 @@ class MLModules:
                         </div>
                         """, unsafe_allow_html=True)
                         
+                        # Feedback-tuned model running alongside the forest
+                        self.show_online_crop_opinion(
+                            {'N': N, 'P': P, 'K': K, 'temp': temp, 'humidity': humidity, 'ph': ph, 'rainfall': rainfall},
+                            crop_name
+                        )
+                        
                         # Show crop details
                         self.show_crop_details(crop_name)
                         
@@ -129,6 +136,46 @@ class MLModules:
                         
                     except Exception as e:
                         st.error(f"Prediction error: {str(e)}")
+                elif self.crop_fallback:
+                    try:
+                        recommendations = self.crop_fallback.recommend(
+                            [N, P, K, temp, humidity, ph, rainfall], top_k=5
+                        )
+                        crop_name = recommendations[0]['crop']
+                        
+                        # Save prediction
+                        user = st.session_state.get('user')
+                        if user:
+                            self.db.save_prediction(
+                                user['id'], 
+                                'crop',
+                                {'N': N, 'P': P, 'K': K, 'temp': temp, 'humidity': humidity, 'ph': ph, 'rainfall': rainfall},
+                                crop_name
+                            )
+                        
+                        if self.models_warming_up:
+                            st.info("The main crop model is still warming up. Showing results from the lightweight fallback engine.")
+                        else:
+                            st.info("The main crop model is unavailable. Showing results from the lightweight fallback engine.")
+                        
+                        # Display result
+                        st.markdown(f"""
+                        <div class="result-section">
+                            <h2>{get_text('Recommended Crop', current_lang)}: {crop_name}</h2>
+                            <p>Based on your soil and environmental conditions, {crop_name} is the most suitable crop for cultivation.</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                        
+                        # Show crop details
+                        self.show_crop_details(crop_name)
+                        
+                        # Show confidence scores
+                        self.show_fallback_confidence(recommendations)
+                        
+                    except Exception as e:
+                        st.error(f"Prediction error: {str(e)}")
+                elif self.models_warming_up:
+                    st.info("Models are warming up. Please try again in a few seconds.")
                 else:
                     st.error("Model not available")
         
@@ -233,6 +280,48 @@ class MLModules:
         except:
             pass
     
+    def show_online_crop_opinion(self, input_values, crop_name):
+        """Show the feedback-tuned crop model's answer next to the forest's"""
+        try:
+            learner = get_learner('crop')
+            if learner is None or not learner.is_trained:
+                return
+            online_crop = learner.predict(input_values)
+            if online_crop == crop_name:
+                st.caption(f"Confirmed by farmer feedback ({learner.feedback_count} harvest reports)")
+            else:
+                st.info(f"Farmers with similar conditions also reported good results with **{online_crop}** "
+                        f"({learner.feedback_count} harvest reports)")
+        except Exception:
+            pass
+    
+    def show_online_yield_opinion(self, input_values, predicted_yield):
+        """Show the feedback-tuned yield estimate next to the batch model's"""
+        try:
+            learner = get_learner('yield')
+            if learner is None or not learner.is_trained:
+                return
+            online_yield = learner.predict(input_values)
+            st.caption(f"Estimate from reported harvests: {online_yield:.2f} tons/ha "
+                       f"({learner.feedback_count} reports, model: {predicted_yield:.2f} tons/ha)")
+        except Exception:
+            pass
+    
+    def show_fallback_confidence(self, recommendations):
+        """Show confidence scores from the fallback recommender"""
+        crop_names = [r['crop'] for r in recommendations]
+        confidences = [r['confidence'] for r in recommendations]
+        
+        fig = px.bar(
+            x=crop_names,
+            y=confidences,
+            title="Prediction Confidence Scores",
+            labels={'x': 'Crop', 'y': 'Confidence'},
+            color=confidences,
+            color_continuous_scale='Viridis'
+        )
+        st.plotly_chart(fig, width='stretch')
+    
     def show_crop_statistics(self):
         """Show crop statistics and trends"""
         col1, col2 = st.columns(2)
@@ -435,6 +524,8 @@ class MLModules:
                         
                     except Exception as e:
                         st.error(f"Prediction error: {str(e)}")
+                elif self.models_warming_up:
+                    st.info("Models are warming up. Please try again in a few seconds.")
                 else:
                     st.error("Model not available")
         
@@ -679,6 +770,12 @@ class MLModules:
                         </div>
                         """, unsafe_allow_html=True)
                         
+                        # Feedback-tuned model running alongside the batch model
+                        self.show_online_yield_opinion(
+                            {'area': area, 'state': state, 'crop': crop_type, 'season': season, 'year': crop_year},
+                            predicted_yield
+                        )
+                        
                         # Show yield insights
                         self.show_yield_insights(predicted_yield, crop_type, area, rainfall, fertilizer, current_lang)
                         
@@ -687,6 +784,8 @@ class MLModules:
                         
                     except Exception as e:
                         st.error(f"Prediction error: {str(e)}")
+                elif self.models_warming_up:
+                    st.info("Models are warming up. Please try again in a few seconds.")
                 else:
                     st.error("Model not available")
         
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Model Evaluation for AgriVision
+Runs k-fold cross-validation for each model over its dataset, with folds in
+parallel across cores. Fold results are cached by data and model hash and the
+aggregated metrics are persisted for the admin panel.
+
+Usage:
+    python model_evaluation.py                # evaluate every model
+    python model_evaluation.py --model crop   # evaluate one model
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.pipeline import make_pipeline
+from sklearn.model_selection import KFold, StratifiedKFold
+from sklearn.metrics import accuracy_score, f1_score, r2_score, mean_absolute_error
+
+from dataset_cache import file_checksum, source_checksum, load_dataset as load_columnar
+
+METRICS_PATH = "models/model_metrics.json"
+FOLD_CACHE_DIR = "models/evaluation_cache"
+
+# Datasets for irrigation and yield are not bundled with the repository;
+# drop them at these paths to have those models evaluated too.
+MODEL_SPECS = {
+    'crop': {
+        'name': 'Crop Recommendation',
+        'task': 'classification',
+        'model': 'models/crop_recommendation_model.pkl',
+        'preprocessor': None,
+        'dataset': 'data/Crop_Recommendation.csv',
+        'features': ['Nitrogen', 'Phosphorus', 'Potassium', 'Temperature', 'Humidity', 'pH_Value', 'Rainfall'],
+        'label': 'Crop'
+    },
+    'irrigation': {
+        'name': 'Irrigation Recommendation',
+        'task': 'classification',
+        'model': 'models/irrigation_model.pkl',
+        'preprocessor': 'models/irrigation_preprocessor.pkl',
+        'dataset': 'data/Irrigation_Recommendation.csv',
+        'features': ['Temperature', 'Humidity', 'Rainfall', 'soil_moisture', 'water_required_mm',
+                     'Crop', 'soil_type', 'growth_stage'],
+        'label': 'irrigation_required'
+    },
+    'yield': {
+        'name': 'Yield Prediction',
+        'task': 'regression',
+        'model': 'models/yield_prediction_model.pkl',
+        'preprocessor': 'models/yield_preprocessor.pkl',
+        'dataset': 'data/Crop_Yield.csv',
+        'features': ['index', 'Crop', 'State', 'Crop_Year', 'Season', 'Area'],
+        'label': 'Yield'
+    }
+}
+
+_metrics_lock = threading.Lock()
+_running = set()
+
+
+def model_hash(spec):
+    """Hash of the model (and preprocessor) files that define an estimator"""
+    digest = hashlib.sha256()
+    for path in (spec['model'], spec['preprocessor']):
+        if path:
+            digest.update(file_checksum(path).encode())
+    return digest.hexdigest()
+
+
+def build_estimator(spec):
+    """
+    Build an unfitted estimator with the same hyperparameters as the saved model
+
+    Hyperparameter searches are unwrapped to their best estimator so every
+    fold trains one model instead of re-running the search.
+    """
+    model = joblib.load(spec['model'])
+    estimator = getattr(model, 'best_estimator_', model)
+    estimator = clone(estimator)
+    if spec['preprocessor']:
+        return make_pipeline(clone(joblib.load(spec['preprocessor'])), estimator)
+    return estimator
+
+
+def load_dataset(spec):
+    """Load the feature frame and label array for a model from the columnar cache"""
+    dataset = load_columnar(spec['dataset'])
+    return dataset.to_frame(spec['features']), np.asarray(dataset.values(spec['label']))
+
+
+def _fold_cache_path(data_hash, estimator_hash, n_folds, fold):
+    key = hashlib.sha256(f"{data_hash}:{estimator_hash}:{n_folds}:{fold}".encode()).hexdigest()[:32]
+    return os.path.join(FOLD_CACHE_DIR, f"{key}.json")
+
+
+def run_fold(estimator, task, X, y, train_index, test_index):
+    """Fit on one training split and score on its held-out split"""
+    model = clone(estimator)
+    model.fit(X.iloc[train_index], y[train_index])
+    predictions = model.predict(X.iloc[test_index])
+    actual = y[test_index]
+
+    if task == 'classification':
+        return {
+            'accuracy': float(accuracy_score(actual, predictions)),
+            'f1_macro': float(f1_score(actual, predictions, average='macro')),
+            'test_size': int(len(test_index))
+        }
+    return {
+        'r2': float(r2_score(actual, predictions)),
+        'mae': float(mean_absolute_error(actual, predictions)),
+        'test_size': int(len(test_index))
+    }
+
+
+def evaluate_model(key, n_folds=5, n_jobs=-1):
+    """
+    Cross-validate one model, reusing cached fold results when nothing changed
+
+    Args:
+        key: Key in MODEL_SPECS
+        n_folds: Number of folds
+        n_jobs: Parallel fold workers (-1 uses every core)
+
+    Returns:
+        dict: Aggregated metrics for the model
+    """
+    spec = MODEL_SPECS[key]
+    result = {
+        'name': spec['name'],
+        'task': spec['task'],
+        'evaluated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+    for path, what in ((spec['model'], 'model'), (spec['dataset'], 'dataset')):
+        if not os.path.exists(path):
+            result['status'] = f'{what} missing'
+            return result
+
+    started = time.time()
+    data_hash = source_checksum(spec['dataset'])
+    estimator_hash = model_hash(spec)
+    result['model_updated'] = datetime.fromtimestamp(os.path.getmtime(spec['model'])).strftime('%Y-%m-%d')
+    result['data_hash'] = data_hash[:12]
+    result['model_hash'] = estimator_hash[:12]
+
+    X, y = load_dataset(spec)
+    if spec['task'] == 'classification':
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    else:
+        splitter = KFold(n_splits=n_folds, shuffle=True, random_state=42)
+    splits = list(splitter.split(X, y))
+
+    # Only folds without a cached result for this data and model are recomputed
+    fold_results = [None] * n_folds
+    for fold in range(n_folds):
+        cache_path = _fold_cache_path(data_hash, estimator_hash, n_folds, fold)
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                fold_results[fold] = json.load(f)
+
+    missing = [fold for fold in range(n_folds) if fold_results[fold] is None]
+    if missing:
+        estimator = build_estimator(spec)
+        computed = Parallel(n_jobs=n_jobs)(
+            delayed(run_fold)(estimator, spec['task'], X, y, *splits[fold]) for fold in missing
+        )
+        os.makedirs(FOLD_CACHE_DIR, exist_ok=True)
+        for fold, fold_result in zip(missing, computed):
+            fold_results[fold] = fold_result
+            with open(_fold_cache_path(data_hash, estimator_hash, n_folds, fold), 'w') as f:
+                json.dump(fold_result, f)
+
+    metric_names = [name for name in fold_results[0] if name != 'test_size']
+    for name in metric_names:
+        values = np.array([fold_result[name] for fold_result in fold_results])
+        result[name] = round(float(values.mean()), 4)
+        result[f'{name}_std'] = round(float(values.std()), 4)
+
+    result['status'] = 'evaluated'
+    result['folds'] = n_folds
+    result['folds_recomputed'] = len(missing)
+    result['samples'] = int(len(y))
+    result['seconds'] = round(time.time() - started, 2)
+    return result
+
+
+def load_metrics(path=METRICS_PATH):
+    """Read persisted metrics; returns an empty dict if none were saved yet"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_metrics(key, result, path=METRICS_PATH):
+    """Persist one model's latest metrics and append to its history"""
+    with _metrics_lock:
+        metrics = load_metrics(path)
+        previous = metrics.get(key, {})
+        history = previous.get('history', [])
+        # One history point per distinct (data, model) pair
+        if result.get('status') == 'evaluated':
+            latest = history[-1] if history else {}
+            if (latest.get('data_hash'), latest.get('model_hash')) != (result['data_hash'], result['model_hash']):
+                history.append({
+                    'evaluated_at': result['evaluated_at'],
+                    'data_hash': result['data_hash'],
+                    'model_hash': result['model_hash'],
+                    'score': result.get('accuracy', result.get('r2'))
+                })
+        result['history'] = history[-24:]
+        metrics[key] = result
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        os.replace(tmp_path, path)
+    return result
+
+
+def evaluate_all(keys=None, n_folds=5, n_jobs=-1):
+    """Evaluate the given models (all by default) and persist their metrics"""
+    results = {}
+    for key in keys or MODEL_SPECS:
+        try:
+            result = evaluate_model(key, n_folds=n_folds, n_jobs=n_jobs)
+        except Exception as e:
+            result = {
+                'name': MODEL_SPECS[key]['name'],
+                'status': f'error: {e}',
+                'evaluated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        results[key] = save_metrics(key, result)
+    return results
+
+
+def start_evaluation(keys=None, n_folds=5):
+    """
+    Run an evaluation on a background thread (used by the admin panel)
+
+    Returns:
+        bool: False if an evaluation of the same models is already running
+    """
+    job = tuple(sorted(keys or MODEL_SPECS))
+    with _metrics_lock:
+        if job in _running:
+            return False
+        _running.add(job)
+
+    def run():
+        try:
+            evaluate_all(list(job), n_folds=n_folds)
+        finally:
+            with _metrics_lock:
+                _running.discard(job)
+
+    thread = threading.Thread(target=run, name="agrivision-evaluation")
+    thread.daemon = True
+    thread.start()
+    return True
+
+
+def is_evaluation_running():
+    """Whether a background evaluation is in progress"""
+    return bool(_running)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate AgriVision models")
+    parser.add_argument('--model', choices=sorted(MODEL_SPECS), action='append',
+                        help='Model to evaluate (repeatable; default: all)')
+    parser.add_argument('--folds', type=int, default=5, help='Number of folds')
+    parser.add_argument('--jobs', type=int, default=-1, help='Parallel fold workers (-1: all cores)')
+    args = parser.parse_args()
+
+    results = evaluate_all(args.model, n_folds=args.folds, n_jobs=args.jobs)
+    for key, result in results.items():
+        if result.get('status') != 'evaluated':
+            print(f"{result['name']}: {result['status']}")
+        elif result['task'] == 'classification':
+            print(f"{result['name']}: accuracy {result['accuracy']:.2%} ± {result['accuracy_std']:.2%} "
+                  f"({result['folds_recomputed']}/{result['folds']} folds computed, {result['seconds']}s)")
+        else:
+            print(f"{result['name']}: R² {result['r2']:.3f} ± {result['r2_std']:.3f} "
+                  f"({result['folds_recomputed']}/{result['folds']} folds computed, {result['seconds']}s)")
+    print(f"Metrics written to {METRICS_PATH}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,183 @@
+"""
+Model Registry and Warm-up for AgriVision
+Loads the ML models once per server process on a background thread,
+runs representative predictions through them and primes reference data
+so the first farmer after a deploy does not pay for it.
+"""
+
+import threading
+import time
+import joblib
+import pandas as pd
+
+MODEL_FILES = {
+    'crop_model': 'models/crop_recommendation_model.pkl',
+    'crop_encoder': 'models/crop_encoder.pkl',
+    'irrigation_model': 'models/irrigation_model.pkl',
+    'irrigation_preprocessor': 'models/irrigation_preprocessor.pkl',
+    'yield_model': 'models/yield_prediction_model.pkl',
+    'yield_preprocessor': 'models/yield_preprocessor.pkl'
+}
+
+# Inputs shaped exactly like the prediction pages build them
+SAMPLE_CROP_INPUT = [[50, 50, 50, 25, 65, 6.5, 100]]
+SAMPLE_IRRIGATION_INPUT = {
+    "soil_moisture": 60,
+    "Temperature": 25,
+    "Humidity": 70,
+    "Rainfall": 10,
+    "soil_type": "Loamy",
+    "Crop": "Rice",
+    "growth_stage": "Mid",
+    "water_required_mm": 0
+}
+SAMPLE_YIELD_INPUT = {
+    "index": 0,
+    "State": "Maharashtra",
+    "Crop": "Rice",
+    "Crop_Year": 2024,
+    "Season": "Kharif",
+    "Area": 10.0
+}
+
+_models = {}
+_errors = {}
+_status = {'state': 'idle', 'started_at': None, 'finished_at': None, 'steps': []}
+_ready = threading.Event()
+_lock = threading.Lock()
+_thread = None
+
+
+def start_warmup(db_name="agrivision.db"):
+    """
+    Start the warm-up thread once per process
+
+    Safe to call on every Streamlit rerun; later calls are no-ops.
+
+    Args:
+        db_name: Database used to prime the reference-data caches
+    """
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _status['state'] = 'warming_up'
+        _status['started_at'] = time.time()
+        _thread = threading.Thread(target=warm_up, args=(db_name,), name="agrivision-warmup")
+        _thread.daemon = True
+        _thread.start()
+
+
+def warm_up(db_name="agrivision.db"):
+    """Load models, run sample predictions and prime reference data"""
+    load_models()
+
+    _run_step("crop prediction", _warm_crop_model)
+    _run_step("irrigation prediction", _warm_irrigation_model)
+    _run_step("yield prediction", _warm_yield_model)
+    _run_step("reference data", lambda: _prime_reference_data(db_name))
+    _run_step("gazetteer", _load_gazetteer)
+
+    _status['state'] = 'ready'
+    _status['finished_at'] = time.time()
+    _ready.set()
+
+
+def load_models():
+    """Load every model file independently so one missing file does not disable the rest"""
+    for name, path in MODEL_FILES.items():
+        start = time.perf_counter()
+        try:
+            _models[name] = joblib.load(path)
+            _errors.pop(name, None)
+            _record_step(f"load {name}", start)
+        except Exception as e:
+            _models[name] = None
+            _errors[name] = str(e)
+            _record_step(f"load {name}", start, error=e)
+
+
+def _run_step(label, func):
+    start = time.perf_counter()
+    try:
+        func()
+        _record_step(label, start)
+    except Exception as e:
+        _record_step(label, start, error=e)
+
+
+def _record_step(label, start, error=None):
+    _status['steps'].append({
+        'step': label,
+        'seconds': round(time.perf_counter() - start, 3),
+        'error': str(error) if error else None
+    })
+
+
+def _warm_crop_model():
+    model, encoder = _models.get('crop_model'), _models.get('crop_encoder')
+    if model is not None and encoder is not None:
+        encoded = model.predict(pd.DataFrame(SAMPLE_CROP_INPUT))
+        encoder.inverse_transform(encoded)
+        if hasattr(model, 'predict_proba'):
+            model.predict_proba(pd.DataFrame(SAMPLE_CROP_INPUT))
+
+    # The fallback engine builds its array file on first use
+    from crop_fallback import CropFallbackRecommender
+    CropFallbackRecommender().recommend(SAMPLE_CROP_INPUT[0])
+
+
+def _warm_irrigation_model():
+    model, preprocessor = _models.get('irrigation_model'), _models.get('irrigation_preprocessor')
+    if model is not None and preprocessor is not None:
+        processed = preprocessor.transform(pd.DataFrame([SAMPLE_IRRIGATION_INPUT]))
+        model.predict_proba(processed)
+
+
+def _warm_yield_model():
+    model, preprocessor = _models.get('yield_model'), _models.get('yield_preprocessor')
+    if model is not None and preprocessor is not None:
+        processed = preprocessor.transform(pd.DataFrame([SAMPLE_YIELD_INPUT]))
+        model.predict(processed)
+
+
+def _prime_reference_data(db_name):
+    from database import Database
+    db = Database(db_name)
+    # Same calls the dashboard and resources pages make on every render
+    db.get_schemes(3)
+    db.get_schemes(50)
+    db.search_pesticides("")
+    db.get_pesticide_shops()
+
+
+def _load_gazetteer():
+    from gazetteer import get_gazetteer
+    get_gazetteer()
+
+
+def is_ready():
+    """Whether the warm-up has finished"""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout=None):
+    """Block until warm-up finishes; returns False on timeout"""
+    return _ready.wait(timeout)
+
+
+def get_model(name):
+    """Get a loaded model by name, or None if missing or not loaded yet"""
+    return _models.get(name)
+
+
+def get_load_errors():
+    """Get model load errors keyed by model name"""
+    return dict(_errors)
+
+
+def get_status():
+    """Get warm-up state, timings and step results"""
+    status = dict(_status)
+    status['steps'] = list(_status['steps'])
+    return status
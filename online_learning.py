@@ -0,0 +1,355 @@
+"""
+Online Learning from Farmer Feedback for AgriVision
+Incrementally updated models that run alongside the batch-trained forests.
+Farmer confirmations and corrections are applied in mini-batches by a
+background worker, so the models improve without full retrains.
+
+With several app processes on one database, only the process holding
+"<db>.feedback.lock" applies feedback (another takes over if it exits), so
+the model files have a single writer; the other processes reload the models
+whenever the files change.
+"""
+
+import os
+import json
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows): every process runs its own worker
+    fcntl = None
+
+from crop_fallback import DATA_PATH, FEATURE_COLUMNS, LABEL_COLUMN
+from dataset_cache import load_dataset
+
+ONLINE_CROP_MODEL_PATH = "models/online_crop_model.pkl"
+ONLINE_YIELD_MODEL_PATH = "models/online_yield_model.pkl"
+YIELD_PREPROCESSOR_PATH = "models/yield_preprocessor.pkl"
+
+# Keys used by MLModules when saving crop predictions, in model feature order
+CROP_INPUT_KEYS = ['N', 'P', 'K', 'temp', 'humidity', 'ph', 'rainfall']
+
+FEEDBACK_BATCH_SIZE = 64
+FEEDBACK_POLL_SECONDS = 30
+
+
+def _save_atomically(obj, path):
+    """Dump with joblib to a temporary file and rename over the target"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _file_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class OnlineCropLearner:
+    """Crop classifier updated with partial_fit from farmer feedback"""
+
+    def __init__(self, model_path=ONLINE_CROP_MODEL_PATH, data_path=DATA_PATH):
+        self.model_path = model_path
+        self.data_path = data_path
+        self.lock = threading.Lock()
+
+        if os.path.exists(model_path):
+            state = joblib.load(model_path)
+        else:
+            state = self._initial_state()
+            _save_atomically(state, model_path)
+        self.file_version = _file_version(model_path)
+
+        self.model = state['model']
+        self.mean = state['mean']
+        self.scale = state['scale']
+        self.feedback_count = state['feedback_count']
+
+    def _initial_state(self):
+        """Seed the learner with one pass over the training dataset"""
+        dataset = load_dataset(self.data_path)
+        X = dataset.matrix(FEATURE_COLUMNS)
+        y = dataset.values(LABEL_COLUMN)
+
+        # Feature scaling is frozen at the training-set statistics so that
+        # feedback batches never shift the feature space under the model
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+
+        model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+        model.partial_fit((X - mean) / scale, y, classes=np.unique(y))
+
+        return {'model': model, 'mean': mean, 'scale': scale, 'feedback_count': 0}
+
+    @property
+    def is_trained(self):
+        return self.feedback_count > 0
+
+    def _features(self, inputs):
+        X = np.array([[float(row[key]) for key in CROP_INPUT_KEYS] for row in inputs])
+        return (X - self.mean) / self.scale
+
+    def update(self, inputs, labels):
+        """
+        Apply one mini-batch of feedback
+
+        Args:
+            inputs: List of input dictionaries as saved in prediction_history
+            labels: Actual crop names
+        """
+        known = set(self.model.classes_)
+        pairs = [(x, y) for x, y in zip(inputs, labels) if y in known]
+        if not pairs:
+            return 0
+
+        X = self._features([x for x, _ in pairs])
+        y = np.array([label for _, label in pairs])
+
+        with self.lock:
+            self.model.partial_fit(X, y)
+            self.feedback_count += len(pairs)
+            _save_atomically({
+                'model': self.model,
+                'mean': self.mean,
+                'scale': self.scale,
+                'feedback_count': self.feedback_count
+            }, self.model_path)
+            self.file_version = _file_version(self.model_path)
+        return len(pairs)
+
+    def predict(self, input_data):
+        """Predict a crop name from a saved-style input dictionary"""
+        with self.lock:
+            return self.model.predict(self._features([input_data]))[0]
+
+
+class OnlineYieldLearner:
+    """Yield regressor updated with partial_fit from reported harvests"""
+
+    def __init__(self, model_path=ONLINE_YIELD_MODEL_PATH, preprocessor_path=YIELD_PREPROCESSOR_PATH):
+        self.model_path = model_path
+        self.preprocessor = joblib.load(preprocessor_path)
+        self.lock = threading.Lock()
+
+        if os.path.exists(model_path):
+            state = joblib.load(model_path)
+            self.model = state['model']
+            self.feedback_count = state['feedback_count']
+        else:
+            self.model = SGDRegressor(alpha=1e-4, learning_rate='adaptive', eta0=0.01, random_state=42)
+            self.feedback_count = 0
+        self.file_version = _file_version(model_path)
+
+    def _features(self, inputs):
+        # Same frame MLModules.show_yield_prediction builds for the batch model
+        df = pd.DataFrame([{
+            "index": 0,
+            "State": row['state'],
+            "Crop": row['crop'],
+            "Crop_Year": row['year'],
+            "Season": row['season'],
+            "Area": row['area']
+        } for row in inputs])
+        return self.preprocessor.transform(df)
+
+    @property
+    def is_trained(self):
+        return self.feedback_count > 0
+
+    def update(self, inputs, labels):
+        """
+        Apply one mini-batch of feedback
+
+        Args:
+            inputs: List of input dictionaries as saved in prediction_history
+            labels: Actual yields in tons per hectare
+        """
+        if not inputs:
+            return 0
+
+        X = self._features(inputs)
+        y = np.asarray(labels, dtype=float)
+
+        with self.lock:
+            self.model.partial_fit(X, y)
+            self.feedback_count += len(y)
+            _save_atomically({'model': self.model, 'feedback_count': self.feedback_count}, self.model_path)
+            self.file_version = _file_version(self.model_path)
+        return len(y)
+
+    def predict(self, input_data):
+        """Predict yield (tons/ha) from a saved-style input dictionary"""
+        with self.lock:
+            return float(self.model.predict(self._features([input_data]))[0])
+
+
+def parse_yield(value):
+    """Parse '3.25 tons/ha' or a bare number into a float"""
+    return float(str(value).split()[0])
+
+
+_learners = {}
+_learners_lock = threading.Lock()
+_worker = None
+_worker_stop = threading.Event()
+
+
+def get_learner(prediction_type):
+    """
+    Get the process-wide online learner for a prediction type
+
+    The learner is reloaded when its model file was replaced by the feedback
+    worker of another process.
+
+    Returns:
+        OnlineCropLearner, OnlineYieldLearner or None if it cannot be created
+    """
+    with _learners_lock:
+        learner = _learners.get(prediction_type)
+        if learner is not None and learner.file_version != _file_version(learner.model_path):
+            del _learners[prediction_type]
+        if prediction_type not in _learners:
+            try:
+                if prediction_type == 'crop':
+                    _learners[prediction_type] = OnlineCropLearner()
+                elif prediction_type == 'yield':
+                    _learners[prediction_type] = OnlineYieldLearner()
+                else:
+                    _learners[prediction_type] = None
+            except Exception as e:
+                print(f"Online {prediction_type} learner unavailable: {e}")
+                _learners[prediction_type] = None
+        return _learners[prediction_type]
+
+
+def apply_pending_feedback(db, batch_size=FEEDBACK_BATCH_SIZE):
+    """
+    Apply all queued feedback to the online learners in mini-batches
+
+    Args:
+        db: Database instance
+        batch_size: Feedback rows per partial_fit call
+
+    Returns:
+        dict: Number of rows applied per prediction type
+    """
+    applied = {}
+    for prediction_type in ('crop', 'yield'):
+        learner = get_learner(prediction_type)
+        applied[prediction_type] = 0
+        if learner is None:
+            continue
+
+        while True:
+            batch = db.get_pending_feedback(prediction_type, batch_size)
+            if not batch:
+                break
+
+            ids, inputs, labels = [], [], []
+            for feedback_id, input_data, actual_result in batch:
+                ids.append(feedback_id)
+                try:
+                    label = parse_yield(actual_result) if prediction_type == 'yield' else actual_result
+                    inputs.append(json.loads(input_data))
+                    labels.append(label)
+                except (ValueError, TypeError, IndexError):
+                    # Unusable rows are still marked applied so they are not retried forever
+                    continue
+
+            try:
+                applied[prediction_type] += _update_skipping_bad_rows(learner, inputs, labels)
+            finally:
+                db.mark_feedback_applied(ids)
+
+    return applied
+
+
+def _update_skipping_bad_rows(learner, inputs, labels):
+    """
+    Apply a mini-batch, dropping rows the learner cannot build features for
+
+    A row missing an input key, or carrying a category the yield preprocessor
+    never saw, makes the whole batch fail; those rows are found one at a
+    time and the rest are applied in a single update.
+
+    Returns:
+        int: Number of rows applied
+    """
+    try:
+        return learner.update(inputs, labels)
+    except (KeyError, ValueError, TypeError):
+        pass
+
+    usable = []
+    for row, label in zip(inputs, labels):
+        try:
+            learner._features([row])
+        except (KeyError, ValueError, TypeError):
+            continue
+        usable.append((row, label))
+    if not usable:
+        return 0
+    return learner.update([row for row, _ in usable], [label for _, label in usable])
+
+
+def worker_lock_path(db_name):
+    return f"{os.path.abspath(db_name)}.feedback.lock"
+
+
+def _try_worker_lock(db_name):
+    """
+    Try to become the process that applies feedback for a database
+
+    Returns:
+        file: Open lock file, held until the process exits, or None if another process holds it
+    """
+    handle = open(worker_lock_path(db_name), 'a')
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def start_feedback_worker(db_name="agrivision.db", poll_seconds=FEEDBACK_POLL_SECONDS):
+    """
+    Start the background feedback worker once per process
+
+    Safe to call on every Streamlit rerun; later calls are no-ops. The
+    worker of every process polls, but only the one holding the database's
+    feedback lock applies feedback.
+    """
+    global _worker
+    with _learners_lock:
+        if _worker is not None:
+            return
+        _worker = threading.Thread(target=_worker_loop, args=(db_name, poll_seconds), name="agrivision-feedback")
+        _worker.daemon = True
+        _worker.start()
+
+
+def _worker_loop(db_name, poll_seconds):
+    from database import Database
+    db = Database(db_name)
+    lock = None
+    while not _worker_stop.is_set():
+        # The lock is released when its holder exits, so a waiting process takes over
+        if lock is None:
+            lock = _try_worker_lock(db_name)
+        if lock is not None:
+            try:
+                apply_pending_feedback(db)
+            except Exception as e:
+                print(f"Feedback worker error: {e}")
+        _worker_stop.wait(poll_seconds)
@@ -0,0 +1,57 @@
+"""
+Pagination Helpers for AgriVision
+Renders large listings one keyset page at a time. The Database *_page methods
+return (rows, next_cursor); the cursors of the pages visited so far are kept
+in session state, so Previous/Next never re-read earlier pages and every page
+costs the same regardless of table size.
+"""
+
+import streamlit as st
+
+PAGE_SIZE = 20
+
+
+def _next_page(key, cursor):
+    st.session_state[key]['cursors'].append(cursor)
+
+
+def _previous_page(key):
+    cursors = st.session_state[key]['cursors']
+    if len(cursors) > 1:
+        cursors.pop()
+
+
+def paginate(key, fetch_page, reset_on=None):
+    """
+    Fetch the current page of a listing and show Previous/Next controls
+
+    Args:
+        key: Session state key, unique per listing
+        fetch_page: Callable taking a cursor (None for the first page) and
+            returning (rows, next_cursor)
+        reset_on: Value such as the search term; the listing restarts at the
+            first page when it changes
+
+    Returns:
+        list: Rows of the current page
+    """
+    state = st.session_state.get(key)
+    if state is None or state['reset_on'] != reset_on:
+        state = {'cursors': [None], 'reset_on': reset_on}
+        st.session_state[key] = state
+
+    rows, next_cursor = fetch_page(state['cursors'][-1])
+
+    page_number = len(state['cursors'])
+    if page_number > 1 or next_cursor is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("Previous", key=f"{key}_prev", disabled=page_number == 1,
+                      on_click=_previous_page, args=(key,))
+        with col2:
+            st.caption(f"Page {page_number}")
+        with col3:
+            st.button("Next", key=f"{key}_next", disabled=next_cursor is None,
+                      on_click=_next_page, args=(key, next_cursor))
+
+    return rows
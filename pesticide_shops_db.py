@@ -246,12 +246,12 @@ def populate_sample_data(db_connection):
     Args:
         db_connection: Database connection
     """
-    for shop in SAMPLE_SHOPS_PUNE:
-        try:
-            add_shop_to_database(db_connection, shop)
-            print(f"Added: {shop['shop_name']}")
-        except Exception as e:
-            print(f"Error adding {shop['shop_name']}: {e}")
+    from shop_import import import_records
+    
+    report = import_records(db_connection, SAMPLE_SHOPS_PUNE)
+    print(f"Added {report['inserted']} shops ({report['duplicates']} duplicates, {report['invalid']} invalid)")
+    for error in report['errors']:
+        print(f"Error: {error}")
 
 
 def integrate_with_existing_db():
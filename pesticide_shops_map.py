@@ -4,19 +4,27 @@ Find and display nearby pesticide shops on an interactive map
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import folium
-from streamlit_folium import st_folium
-import requests
 import json
-from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 import pandas as pd
+import geocode_cache
+import places_client
+import map_render_cache
+import shop_index
+from gazetteer import get_gazetteer
+
+# Contact-only details for search results (cheaper than the full field set)
+CONTACT_FIELDS = "formatted_phone_number"
 
 class PesticideShopLocator:
     """Handle pesticide shop location and mapping"""
     
-    def __init__(self):
-        self.geolocator = Nominatim(user_agent="agrivision_pesticide_locator")
+    def __init__(self, db_name="agrivision.db"):
+        self.db_name = db_name
+        # Shared, persistent and rate limited; repeated village names never hit Nominatim twice
+        self.geocoder = geocode_cache.get_cache(db_name)
         self.default_location = (18.5204, 73.8567)  # Pune, Maharashtra
         
     def get_user_location_from_browser(self):
@@ -97,15 +105,28 @@ class PesticideShopLocator:
         Returns:
             tuple: (latitude, longitude) or None
         """
+        # Offline gazetteer first; Nominatim only for places it does not know
+        coords = get_gazetteer().geocode(address)
+        if coords:
+            return coords
         try:
-            location = self.geolocator.geocode(address)
-            if location:
-                return (location.latitude, location.longitude)
+            return self.geocoder.geocode(address)
+        except geocode_cache.RateLimited as e:
+            st.warning(str(e))
             return None
         except Exception as e:
             st.error(f"Geocoding error: {str(e)}")
             return None
     
+    def suggest_locations(self, text, limit=8):
+        """
+        Offline type-ahead suggestions for a partly typed place or pincode
+        
+        Returns:
+            list: Place dicts with 'label', 'latitude' and 'longitude'
+        """
+        return get_gazetteer().complete(text, limit=limit)
+    
     def reverse_geocode(self, lat, lng):
         """
         Convert coordinates to address
@@ -118,12 +139,11 @@ class PesticideShopLocator:
             str: Address string
         """
         try:
-            location = self.geolocator.reverse(f"{lat}, {lng}")
-            return location.address if location else "Unknown location"
+            return self.geocoder.reverse(lat, lng) or "Unknown location"
         except Exception as e:
             return "Unknown location"
     
-    def search_nearby_shops_google(self, lat, lng, radius=5000, api_key=None):
+    def search_nearby_shops_google(self, lat, lng, radius=5000, api_key=None, products=None, open_only=False):
         """
         Search for nearby pesticide shops using Google Places API
         
@@ -132,48 +152,53 @@ class PesticideShopLocator:
             lng: Longitude
             radius: Search radius in meters (default 5km)
             api_key: Google Places API key
+            products: Products the shops must stock (database search only)
+            open_only: Only shops open right now
         
         Returns:
             list: List of shop dictionaries
         """
+        if products:
+            # Google has no stock information; only registered shops can be filtered
+            return self.get_shops_from_database(lat, lng, radius/1000, products, open_only)
+        
         if not api_key:
             st.warning("Google Places API key not configured. Using database data.")
-            return self.get_shops_from_database(lat, lng, radius/1000)
+            return self.get_shops_from_database(lat, lng, radius/1000, open_only=open_only)
         
         try:
-            url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-            params = {
-                'location': f"{lat},{lng}",
-                'radius': radius,
-                'keyword': 'pesticide shop agricultural store farm supply',
-                'key': api_key
-            }
+            client = places_client.get_client(api_key)
+            places = client.nearby_search(lat, lng, radius=radius, open_now=open_only)
+            if not places:
+                st.warning("Google Places API: ZERO_RESULTS")
+                return self.get_shops_from_database(lat, lng, radius/1000, open_only=open_only)
             
-            response = requests.get(url, params=params)
-            data = response.json()
+            # Phone numbers for the map popups and call buttons, fetched in parallel
+            contacts = client.details_many([place['place_id'] for place in places], fields=CONTACT_FIELDS)
             
-            if data['status'] == 'OK':
-                shops = []
-                for place in data['results']:
-                    shops.append({
-                        'name': place['name'],
-                        'address': place.get('vicinity', 'N/A'),
-                        'lat': place['geometry']['location']['lat'],
-                        'lng': place['geometry']['location']['lng'],
-                        'rating': place.get('rating', 'N/A'),
-                        'open_now': place.get('opening_hours', {}).get('open_now', None),
-                        'place_id': place['place_id']
-                    })
-                return shops
-            else:
-                st.warning(f"Google Places API: {data['status']}")
-                return self.get_shops_from_database(lat, lng, radius/1000)
-                
+            shops = []
+            for place in places:
+                contact = contacts.get(place['place_id']) or {}
+                shops.append({
+                    'name': place['name'],
+                    'address': place.get('vicinity', 'N/A'),
+                    'lat': place['geometry']['location']['lat'],
+                    'lng': place['geometry']['location']['lng'],
+                    'rating': place.get('rating', 'N/A'),
+                    'phone': contact.get('formatted_phone_number', ''),
+                    'open_now': place.get('opening_hours', {}).get('open_now', None),
+                    'place_id': place['place_id']
+                })
+            return shops
+        
+        except places_client.PlacesError as e:
+            st.warning(f"Google Places API: {e.status}")
+            return self.get_shops_from_database(lat, lng, radius/1000, open_only=open_only)
         except Exception as e:
             st.error(f"Error searching shops: {str(e)}")
-            return self.get_shops_from_database(lat, lng, radius/1000)
+            return self.get_shops_from_database(lat, lng, radius/1000, open_only=open_only)
     
-    def get_shops_from_database(self, lat, lng, radius_km=5):
+    def get_shops_from_database(self, lat, lng, radius_km=5, products=None, open_only=False):
         """
         Get shops from the local database
         
@@ -181,14 +206,16 @@ class PesticideShopLocator:
             lat: Latitude
             lng: Longitude
             radius_km: Search radius in kilometers
+            products: Products the shops must all stock
+            open_only: Only shops open right now (by their opening hours)
         
         Returns:
             list: List of shop dictionaries
         """
         try:
             from database import Database
-            db = Database()
-            shops = db.get_nearby_shops(lat, lng, radius_km)
+            db = Database(self.db_name)
+            shops = db.get_nearby_shops(lat, lng, radius_km, products=products, open_only=open_only)
             
             # Convert database format to map format
             map_shops = []
@@ -202,6 +229,8 @@ class PesticideShopLocator:
                     'phone': shop.get('phone', ''),
                     'open_now': shop.get('open_now', True),
                     'products': shop.get('products', []),
+                    'opening_time': shop.get('opening_time'),
+                    'closing_time': shop.get('closing_time'),
                     'distance': shop.get('distance', 0)
                 })
             
@@ -292,7 +321,25 @@ class PesticideShopLocator:
         """
         return geodesic((lat1, lng1), (lat2, lng2)).kilometers
     
-    def create_map(self, center_lat, center_lng, shops, zoom_start=13):
+    def sort_shops_by_distance(self, lat, lng, shops):
+        """
+        Set each shop's 'distance' in km and order the shops for the list view
+        
+        Open shops come first, closed ones last, nearest first within each.
+        
+        Args:
+            lat: User latitude
+            lng: User longitude
+            shops: List of shop dictionaries (updated in place)
+        
+        Returns:
+            list: The shop dictionaries, sorted
+        """
+        for shop in shops:
+            shop['distance'] = self.calculate_distance(lat, lng, shop['lat'], shop['lng'])
+        return sorted(shops, key=lambda x: (x.get('open_now') is False, x['distance']))
+    
+    def create_map(self, center_lat, center_lng, shops, zoom_start=13, radius_km=5):
         """
         Create interactive folium map with shop markers
         
@@ -301,6 +348,7 @@ class PesticideShopLocator:
             center_lng: Map center longitude
             shops: List of shop dictionaries
             zoom_start: Initial zoom level
+            radius_km: Search radius drawn around the center
         
         Returns:
             folium.Map: Interactive map object
@@ -322,12 +370,12 @@ class PesticideShopLocator:
         
         # Add circle to show search radius
         folium.Circle(
-            radius=5000,  # 5km
+            radius=radius_km * 1000,
             location=[center_lat, center_lng],
             color='blue',
             fill=True,
             fillOpacity=0.1,
-            popup='Search Area (5km radius)'
+            popup=f'Search Area ({radius_km}km radius)'
         ).add_to(m)
         
         # Add shop markers
@@ -387,6 +435,24 @@ class PesticideShopLocator:
         
         return m
     
+    def render_map_html(self, center_lat, center_lng, shops, zoom_start=13, radius_km=5):
+        """
+        HTML of the shop map, rendered once per search and shared across reruns and sessions
+        
+        Centers within ~11 m of each other share an entry.
+        
+        Returns:
+            str: Standalone map HTML
+        """
+        key = map_render_cache.map_key(
+            'locator', center_lat, center_lng, radius_km,
+            map_render_cache.shops_version(shops), zoom_start
+        )
+        lat, lng = key[1], key[2]
+        return map_render_cache.get_cache().get_or_render(
+            key, lambda: map_render_cache.render_html(self.create_map(lat, lng, shops, zoom_start, radius_km))
+        )
+    
     def get_shop_details_google(self, place_id, api_key):
         """
         Get detailed information about a shop using Google Places API
@@ -399,19 +465,7 @@ class PesticideShopLocator:
             dict: Detailed shop information
         """
         try:
-            url = "https://maps.googleapis.com/maps/api/place/details/json"
-            params = {
-                'place_id': place_id,
-                'fields': 'name,formatted_address,formatted_phone_number,opening_hours,rating,website,reviews',
-                'key': api_key
-            }
-            
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            if data['status'] == 'OK':
-                return data['result']
-            
+            return places_client.get_client(api_key).details(place_id)
         except Exception as e:
             st.error(f"Error getting shop details: {str(e)}")
         
@@ -498,13 +552,23 @@ def render_pesticide_shops_map():
         )
         
         if address:
-            with st.spinner("Searching for location..."):
-                coords = locator.geocode_address(address)
-                if coords:
-                    user_lat, user_lng = coords
-                    st.success(f"Location found: {user_lat:.4f}, {user_lng:.4f}")
-                else:
-                    st.error("Could not find location. Please try a different address.")
+            suggestions = locator.suggest_locations(address)
+            if suggestions:
+                choice = st.selectbox(
+                    "Matching places",
+                    range(len(suggestions)),
+                    format_func=lambda i: suggestions[i]['label']
+                )
+                user_lat, user_lng = suggestions[choice]['latitude'], suggestions[choice]['longitude']
+                st.success(f"Location found: {user_lat:.4f}, {user_lng:.4f}")
+            else:
+                with st.spinner("Searching for location..."):
+                    coords = locator.geocode_address(address)
+                    if coords:
+                        user_lat, user_lng = coords
+                        st.success(f"Location found: {user_lat:.4f}, {user_lng:.4f}")
+                    else:
+                        st.error("Could not find location. Please try a different address.")
     
     else:  # Manual coordinates
         col1, col2 = st.columns(2)
@@ -523,6 +587,18 @@ def render_pesticide_shops_map():
         help="How far to search for pesticide shops"
     )
     
+    try:
+        from database import Database
+        product_options = [name for name, _ in Database().get_shop_products()]
+    except Exception:
+        product_options = []
+    wanted_products = st.multiselect(
+        "Must stock",
+        product_options,
+        help="Only show shops that stock all of these products"
+    )
+    open_only = st.checkbox("Open now only", help="Hide shops that are closed at the moment")
+    
     # Search button
     if st.button("Find Nearby Shops", type="primary", use_container_width=True):
         if user_lat and user_lng:
@@ -531,12 +607,15 @@ def render_pesticide_shops_map():
                 # You can add Google API key here if you have one
                 shops = locator.search_nearby_shops_google(
                     user_lat, user_lng, 
-                    radius=search_radius * 1000  # Convert km to meters
+                    radius=search_radius * 1000,  # Convert km to meters
+                    products=wanted_products,
+                    open_only=open_only
                 )
                 
                 if shops:
                     st.session_state.shops_data = shops
                     st.session_state.user_location = (user_lat, user_lng)
+                    st.session_state.shops_radius = search_radius
                     st.success(f"Found {len(shops)} shops within {search_radius} km")
                 else:
                     st.warning("No shops found in this area. Try increasing the search radius.")
@@ -555,8 +634,12 @@ def render_pesticide_shops_map():
             user_lat, user_lng = st.session_state.user_location
             shops = st.session_state.shops_data
             
-            map_obj = locator.create_map(user_lat, user_lng, shops)
-            st_folium(map_obj, width=700, height=500)
+            # Reruns of the same search reuse the rendered HTML
+            map_html = locator.render_map_html(
+                user_lat, user_lng, shops,
+                radius_km=st.session_state.get('shops_radius', 5)
+            )
+            components.html(map_html, height=500)
             
             # Map legend
             st.markdown("""
@@ -569,16 +652,7 @@ def render_pesticide_shops_map():
         
         with tab2:
             # Sort shops by distance
-            shops_with_distance = []
-            for shop in shops:
-                distance = locator.calculate_distance(
-                    user_lat, user_lng,
-                    shop['lat'], shop['lng']
-                )
-                shop['distance'] = distance
-                shops_with_distance.append(shop)
-            
-            shops_with_distance.sort(key=lambda x: x['distance'])
+            shops_with_distance = locator.sort_shops_by_distance(user_lat, user_lng, shops)
             
             # Display shop cards
             for i, shop in enumerate(shops_with_distance):
@@ -595,10 +669,14 @@ def render_pesticide_shops_map():
                         if 'phone' in shop and shop['phone']:
                             st.markdown(f"**Phone:** {shop['phone']}")
                         
-                        if 'open_now' in shop:
+                        if shop.get('open_now') is not None:
                             status = 'Open Now' if shop['open_now'] else 'Closed'
                             st.markdown(f"**Status:** {status}")
                         
+                        if shop.get('opening_time') and shop.get('closing_time'):
+                            st.markdown(f"**Hours:** {shop_index.format_time(shop['opening_time'])} - "
+                                        f"{shop_index.format_time(shop['closing_time'])}")
+                        
                         if 'products' in shop and shop['products']:
                             st.markdown(f"**Products:** {', '.join(shop['products'])}")
                     
@@ -0,0 +1,219 @@
+"""
+Google Places Client for AgriVision
+Nearby-search and place-details calls for the shop locator, made over one
+pooled requests.Session with timeouts and retries:
+- nearby searches are cached by (location rounded to ~110 m, radius,
+  keyword) for NEARBY_TTL_SECONDS and follow next_page_token pagination
+- place details are cached per place and fetched in parallel on a bounded
+  thread pool
+
+The endpoint can be pointed at a local stub server with base_url or the
+AGRIVISION_PLACES_URL environment variable.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PLACES_BASE_URL = "https://maps.googleapis.com/maps/api/place"
+SHOP_KEYWORD = "pesticide shop agricultural store farm supply"
+DETAIL_FIELDS = "name,formatted_address,formatted_phone_number,opening_hours,rating,website,reviews"
+# (connect, read) seconds
+TIMEOUT = (3.05, 10)
+MAX_WORKERS = 8
+MAX_PAGES = 3
+# A next_page_token only becomes valid a moment after it is issued
+PAGE_TOKEN_DELAY_SECONDS = 2.0
+PAGE_TOKEN_ATTEMPTS = 3
+LOCATION_DECIMALS = 3
+NEARBY_TTL_SECONDS = 15 * 60
+DETAILS_TTL_SECONDS = 60 * 60
+MAX_CACHE_ENTRIES = 2000
+
+_MISSING = object()
+
+
+class PlacesError(Exception):
+    """The Places API answered with an error status"""
+
+    def __init__(self, status, message=None):
+        super().__init__(f"{status}: {message}" if message else status)
+        self.status = status
+
+
+class _TTLCache:
+    """Small thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, ttl_seconds, max_entries=MAX_CACHE_ENTRIES):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def _make_session(pool_size):
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PlacesClient:
+    """Pooled, cached Places API client; safe to share between sessions"""
+
+    def __init__(self, api_key, base_url=None, session=None, max_workers=MAX_WORKERS):
+        self.api_key = api_key
+        self.base_url = (base_url or os.environ.get('AGRIVISION_PLACES_URL') or PLACES_BASE_URL).rstrip('/')
+        self.session = session or _make_session(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agrivision-places")
+        self.nearby_cache = _TTLCache(NEARBY_TTL_SECONDS)
+        self.details_cache = _TTLCache(DETAILS_TTL_SECONDS)
+        self.requests_made = 0
+        self.lock = threading.Lock()
+
+    def _get(self, endpoint, params):
+        params = dict(params, key=self.api_key)
+        response = self.session.get(f"{self.base_url}/{endpoint}/json", params=params, timeout=TIMEOUT)
+        with self.lock:
+            self.requests_made += 1
+        response.raise_for_status()
+        data = response.json()
+        if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+            raise PlacesError(data.get('status', 'UNKNOWN_ERROR'), data.get('error_message'))
+        return data
+
+    def _next_page(self, token):
+        # INVALID_REQUEST here means the token is not active yet
+        for attempt in range(PAGE_TOKEN_ATTEMPTS):
+            time.sleep(PAGE_TOKEN_DELAY_SECONDS)
+            try:
+                return self._get('nearbysearch', {'pagetoken': token})
+            except PlacesError as e:
+                if e.status != 'INVALID_REQUEST' or attempt == PAGE_TOKEN_ATTEMPTS - 1:
+                    raise
+
+    def nearby_search(self, lat, lng, radius=5000, keyword=SHOP_KEYWORD, max_pages=MAX_PAGES, open_now=False):
+        """
+        Places around a point, following up to max_pages result pages
+
+        Args:
+            lat: Latitude
+            lng: Longitude
+            radius: Search radius in meters
+            keyword: Search keyword
+            max_pages: Result pages to follow (Google returns at most 3 of 20)
+            open_now: Only places open right now
+
+        Returns:
+            list: Raw Places results
+        """
+        key = (round(lat, LOCATION_DECIMALS), round(lng, LOCATION_DECIMALS), int(radius), keyword, max_pages,
+               bool(open_now))
+        results = self.nearby_cache.get(key)
+        if results is not None:
+            return list(results)
+
+        params = {'location': f"{key[0]},{key[1]}", 'radius': key[2], 'keyword': keyword}
+        if open_now:
+            params['opennow'] = 'true'
+        data = self._get('nearbysearch', params)
+        results = list(data.get('results', []))
+        pages = 1
+        while data.get('next_page_token') and pages < max_pages:
+            data = self._next_page(data['next_page_token'])
+            results.extend(data.get('results', []))
+            pages += 1
+
+        self.nearby_cache.put(key, results)
+        return list(results)
+
+    def details(self, place_id, fields=DETAIL_FIELDS):
+        """
+        Details for one place
+
+        Returns:
+            dict: Place details, or None if Google no longer knows the place
+        """
+        key = (place_id, fields)
+        result = self.details_cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        try:
+            result = self._get('details', {'place_id': place_id, 'fields': fields}).get('result')
+        except PlacesError as e:
+            if e.status != 'NOT_FOUND':
+                raise
+            # Closed or merged places stay gone; remember that too
+            result = None
+        self.details_cache.put(key, result)
+        return result
+
+    def details_many(self, place_ids, fields=DETAIL_FIELDS):
+        """
+        Details for several places, fetched in parallel on the client's pool
+
+        A place whose request fails maps to None rather than failing the rest.
+
+        Returns:
+            dict: place_id -> details dict or None
+        """
+        place_ids = list(dict.fromkeys(place_ids))
+        futures = {place_id: self.executor.submit(self.details, place_id, fields) for place_id in place_ids}
+        results = {}
+        for place_id, future in futures.items():
+            try:
+                results[place_id] = future.result()
+            except (requests.RequestException, PlacesError):
+                results[place_id] = None
+        return results
+
+    def stats(self):
+        """Request count and cache hit/miss counters"""
+        return {
+            'requests': self.requests_made,
+            'nearby_hits': self.nearby_cache.hits,
+            'nearby_misses': self.nearby_cache.misses,
+            'details_hits': self.details_cache.hits,
+            'details_misses': self.details_cache.misses
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url=None):
+    """Process-wide client per API key and endpoint, so sessions share the pool and caches"""
+    key = (api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = PlacesClient(api_key, base_url=base_url)
+        return _clients[key]
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Typed Prediction Inputs for AgriVision
+prediction_history keeps the form inputs as a JSON string. This module keeps a
+typed copy in one table per prediction type (crop_inputs, irrigation_inputs,
+yield_inputs) together with the prediction's user, result and time, so
+filters such as "rice recommendations with rainfall > 200" and drift
+statistics run inside SQLite on indexes. Insert triggers fill the tables for
+new predictions; backfill() migrates existing hot and archived rows in
+resumable chunks. Rows are keyed by prediction id and are not archived.
+
+Usage:
+    python prediction_inputs.py --db agrivision.db
+    python prediction_inputs.py --db agrivision.db --chunk-size 20000
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+
+BACKFILL_CHUNK_SIZE = 10000
+
+# Per prediction type: (column, SQL type, expression). Expressions use {row}
+# for the row prefix: 'NEW.' in triggers, '' for table scans and ':' for
+# named parameters.
+INPUT_COLUMNS = {
+    'crop': [
+        ('n', 'REAL', "json_extract({row}input_data, '$.N')"),
+        ('p', 'REAL', "json_extract({row}input_data, '$.P')"),
+        ('k', 'REAL', "json_extract({row}input_data, '$.K')"),
+        ('temperature', 'REAL', "json_extract({row}input_data, '$.temp')"),
+        ('humidity', 'REAL', "json_extract({row}input_data, '$.humidity')"),
+        ('ph', 'REAL', "json_extract({row}input_data, '$.ph')"),
+        ('rainfall', 'REAL', "json_extract({row}input_data, '$.rainfall')")
+    ],
+    'irrigation': [
+        ('soil_moisture', 'REAL', "json_extract({row}input_data, '$.soil_moisture')"),
+        ('temperature', 'REAL', "json_extract({row}input_data, '$.temperature')"),
+        ('rainfall', 'REAL', "json_extract({row}input_data, '$.rainfall')"),
+        ('soil_type', 'TEXT', "json_extract({row}input_data, '$.soil_type')"),
+        ('crop', 'TEXT', "json_extract({row}input_data, '$.crop')"),
+        ('growth_stage', 'TEXT', "json_extract({row}input_data, '$.growth_stage')")
+    ],
+    'yield': [
+        ('area', 'REAL', "json_extract({row}input_data, '$.area')"),
+        ('state', 'TEXT', "json_extract({row}input_data, '$.state')"),
+        ('crop', 'TEXT', "json_extract({row}input_data, '$.crop')"),
+        ('season', 'TEXT', "json_extract({row}input_data, '$.season')"),
+        ('rainfall', 'REAL', "json_extract({row}input_data, '$.rainfall')"),
+        ('fertilizer', 'REAL', "json_extract({row}input_data, '$.fertilizer')"),
+        ('year', 'INTEGER', "json_extract({row}input_data, '$.year')"),
+        # "3.25 tons/ha" -> 3.25
+        ('yield_tons', 'REAL', "CAST({row}result AS REAL)")
+    ]
+}
+
+# Filter columns first, then the range column, so "result = ? AND rainfall > ?" is one index range
+INPUT_INDEXES = {
+    'crop': [('result', 'rainfall'), ('created_at',)],
+    'irrigation': [('crop', 'soil_type'), ('result', 'soil_moisture'), ('created_at',)],
+    'yield': [('crop', 'state', 'season'), ('state', 'yield_tons'), ('created_at',)]
+}
+
+CREATE_BACKFILL_SQL = '''
+    CREATE TABLE IF NOT EXISTS prediction_inputs_backfill (
+        partition TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def input_table(prediction_type):
+    """Typed input table for a prediction type"""
+    if prediction_type not in INPUT_COLUMNS:
+        raise ValueError(f"Unknown prediction type: {prediction_type}")
+    return f"{prediction_type}_inputs"
+
+
+def numeric_columns(prediction_type):
+    """Feature columns that hold numbers"""
+    return [name for name, sql_type, _ in INPUT_COLUMNS[prediction_type] if sql_type != 'TEXT']
+
+
+def _insert_sql(prediction_type, row):
+    """INSERT OR IGNORE ... SELECT of one prediction's typed inputs for a row prefix"""
+    columns = INPUT_COLUMNS[prediction_type]
+    names = ", ".join(name for name, _, _ in columns)
+    values = ", ".join(expression.format(row=row) for _, _, expression in columns)
+    return f'''
+        INSERT OR IGNORE INTO {input_table(prediction_type)}
+            (prediction_id, user_id, result, created_at, {names})
+        SELECT {row}id, {row}user_id, {row}result, {row}created_at, {values}
+    '''
+
+
+def init_input_tables(cursor):
+    """Create the typed tables, their indexes and insert triggers (called from Database.init_database)"""
+    for prediction_type, columns in INPUT_COLUMNS.items():
+        table = input_table(prediction_type)
+        column_sql = ",\n".join(f"            {name} {sql_type}" for name, sql_type, _ in columns)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                prediction_id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                result TEXT,
+                created_at TIMESTAMP,
+{column_sql}
+            )
+        ''')
+        for index_columns in INPUT_INDEXES[prediction_type]:
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{table}_{"_".join(index_columns)}
+                ON {table}({", ".join(index_columns)})
+            ''')
+        # Malformed JSON would abort the user's insert; skip it instead
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table} AFTER INSERT ON prediction_history
+            WHEN NEW.prediction_type = '{prediction_type}' AND json_valid(NEW.input_data)
+            BEGIN
+                {_insert_sql(prediction_type, 'NEW.')};
+            END
+        ''')
+    cursor.execute(CREATE_BACKFILL_SQL)
+
+
+def _backfill_partition(conn, table, chunk_size, progress=None):
+    """Copy typed inputs of one history partition, committing after every chunk"""
+    import history_archive
+
+    cursor = conn.cursor()
+    compressed = table != 'prediction_history'
+    cursor.execute("SELECT last_id FROM prediction_inputs_backfill WHERE partition = ?", (table,))
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    copied = 0
+
+    while True:
+        cursor.execute(f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+                       (last_id, chunk_size))
+        high_id = cursor.fetchone()[0]
+        if high_id is None:
+            break
+
+        try:
+            if compressed:
+                # Archived JSON is decompressed in Python and parsed by the same SQL expressions
+                cursor.execute(f'''
+                    SELECT id, user_id, prediction_type, input_data, result, created_at
+                    FROM {table}
+                    WHERE id > ? AND id <= ?
+                ''', (last_id, high_id))
+                by_type = {}
+                for row_id, user_id, prediction_type, blob, result, created_at in cursor.fetchall():
+                    if prediction_type in INPUT_COLUMNS:
+                        by_type.setdefault(prediction_type, []).append({
+                            'id': row_id, 'user_id': user_id, 'input_data': history_archive.decompress(blob),
+                            'result': result, 'created_at': created_at
+                        })
+                for prediction_type, params in by_type.items():
+                    cursor.executemany(_insert_sql(prediction_type, ':') + " WHERE json_valid(:input_data)", params)
+                    copied += max(cursor.rowcount, 0)
+            else:
+                for prediction_type in INPUT_COLUMNS:
+                    cursor.execute(_insert_sql(prediction_type, '') + '''
+                        FROM prediction_history
+                        WHERE id > ? AND id <= ? AND prediction_type = ? AND json_valid(input_data)
+                    ''', (last_id, high_id, prediction_type))
+                    copied += max(cursor.rowcount, 0)
+
+            cursor.execute('''
+                INSERT INTO prediction_inputs_backfill (partition, last_id, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (partition) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+            ''', (table, high_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        last_id = high_id
+        if progress:
+            progress(table, last_id, copied)
+
+    return copied
+
+
+def backfill(db_name, chunk_size=BACKFILL_CHUNK_SIZE, progress=None, partitions=None):
+    """
+    Migrate the inputs of existing predictions into the typed tables
+
+    Resumable and idempotent: progress is stored per partition, rows already
+    copied are skipped, and new predictions are handled by the triggers.
+
+    Args:
+        db_name: SQLite database path
+        chunk_size: History rows read per transaction
+        progress: Optional callback(partition, last_id, rows copied so far)
+        partitions: Partitions to migrate (default: hot table and every archive)
+
+    Returns:
+        dict: Rows copied per partition
+    """
+    import history_archive
+
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        cursor = conn.cursor()
+        init_input_tables(cursor)
+        conn.commit()
+        if partitions is None:
+            partitions = ['prediction_history'] + [name for name, _ in history_archive.archive_tables(cursor)]
+        return {table: _backfill_partition(conn, table, chunk_size, progress) for table in partitions}
+    finally:
+        conn.close()
+
+
+def find_predictions(cursor, prediction_type, result=None, since=None, ranges=None, limit=100):
+    """
+    Filter predictions by typed inputs
+
+    Args:
+        cursor: Database cursor
+        prediction_type: 'crop', 'irrigation' or 'yield'
+        result: Exact prediction result (e.g. 'rice')
+        since: Only predictions created at or after this timestamp
+        ranges: {column: (low, high)} inclusive bounds, either may be None
+        limit: Maximum rows
+
+    Returns:
+        list: (prediction_id, user_id, result, created_at, *feature columns) rows, newest first
+    """
+    table = input_table(prediction_type)
+    valid_columns = {name for name, _, _ in INPUT_COLUMNS[prediction_type]}
+    conditions, params = [], []
+    if result is not None:
+        conditions.append("result = ?")
+        params.append(result)
+    if since is not None:
+        conditions.append("created_at >= ?")
+        params.append(since)
+    for column, (low, high) in (ranges or {}).items():
+        if column not in valid_columns:
+            raise ValueError(f"Unknown {prediction_type} input: {column}")
+        if low is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(high)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f'''
+        SELECT *
+        FROM {table}
+        {where}
+        ORDER BY created_at DESC
+        LIMIT ?
+    ''', params + [limit])
+    return cursor.fetchall()
+
+
+def feature_drift(cursor, prediction_type, recent_days=30, baseline_days=365):
+    """
+    Compare recent input distributions with the preceding baseline window
+
+    Means and standard deviations are computed in one SQL pass per window.
+
+    Returns:
+        list: Dicts with feature, baseline/recent count, mean and std, and the
+              shift of the recent mean in baseline standard deviations
+    """
+    table = input_table(prediction_type)
+    columns = numeric_columns(prediction_type)
+    aggregates = ", ".join(f"AVG({name}), AVG({name} * {name})" for name in columns)
+
+    def window(start_days, end_days):
+        cursor.execute(f'''
+            SELECT COUNT(*), {aggregates}
+            FROM {table}
+            WHERE created_at >= datetime('now', ?) AND created_at < datetime('now', ?)
+        ''', (f'-{start_days} days', f'-{end_days} days'))
+        return cursor.fetchone()
+
+    recent = window(recent_days, 0)
+    baseline = window(recent_days + baseline_days, recent_days)
+
+    drift = []
+    for i, name in enumerate(columns):
+        stats = {'feature': name, 'baseline_count': baseline[0], 'recent_count': recent[0]}
+        for label, values in (('baseline', baseline), ('recent', recent)):
+            mean, mean_square = values[1 + 2 * i], values[2 + 2 * i]
+            stats[f'{label}_mean'] = round(mean, 3) if mean is not None else None
+            stats[f'{label}_std'] = round(max(mean_square - mean * mean, 0.0) ** 0.5, 3) if mean is not None else None
+        if stats['baseline_mean'] is not None and stats['recent_mean'] is not None and stats['baseline_std']:
+            stats['shift_std'] = round((stats['recent_mean'] - stats['baseline_mean']) / stats['baseline_std'], 3)
+        else:
+            stats['shift_std'] = None
+        drift.append(stats)
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill typed prediction input tables")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database to migrate')
+    parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help='History rows per transaction')
+    args = parser.parse_args()
+
+    started = time.time()
+
+    def progress(table, last_id, copied):
+        print(f"  {table}: up to id {last_id}, {copied} rows copied")
+
+    print(f"Backfilling typed prediction inputs in {args.db}")
+    copied = backfill(args.db, args.chunk_size, progress)
+    print(f"Copied {sum(copied.values())} rows from {len(copied)} partition(s) in {time.time() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
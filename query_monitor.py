@@ -0,0 +1,375 @@
+"""
+Query Instrumentation for AgriVision
+Times every statement run through the Database layer and records wall time,
+rows returned, the calling Database method and the current app page.
+Recent queries are sampled into an in-memory ring buffer; statements slower
+than the threshold are written to the slow_queries table by a background
+thread, optionally with their EXPLAIN QUERY PLAN.
+"""
+
+import os
+import re
+import sys
+import time
+import queue
+import random
+import sqlite3
+import weakref
+import threading
+from collections import deque
+from urllib.request import pathname2url
+
+SLOW_QUERY_MS = 100.0
+SAMPLE_RATE = 1.0
+RING_BUFFER_SIZE = 5000
+
+CREATE_SLOW_QUERIES_SQL = '''
+    CREATE TABLE IF NOT EXISTS slow_queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sql TEXT NOT NULL,
+        method TEXT,
+        page TEXT,
+        duration_ms REAL NOT NULL,
+        rows INTEGER,
+        query_plan TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+_DATABASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.py')
+
+_settings = {
+    'slow_query_ms': SLOW_QUERY_MS,
+    'sample_rate': SAMPLE_RATE,
+    'capture_plans': False
+}
+_recent = deque(maxlen=RING_BUFFER_SIZE)
+_recent_lock = threading.Lock()
+_page = threading.local()
+
+_slow_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure(slow_query_ms=None, sample_rate=None, capture_plans=None):
+    """Change the slow-query threshold, ring-buffer sample rate or plan capture"""
+    if slow_query_ms is not None:
+        _settings['slow_query_ms'] = float(slow_query_ms)
+    if sample_rate is not None:
+        _settings['sample_rate'] = min(max(float(sample_rate), 0.0), 1.0)
+    if capture_plans is not None:
+        _settings['capture_plans'] = bool(capture_plans)
+
+
+def get_settings():
+    """Current instrumentation settings"""
+    return dict(_settings)
+
+
+def set_page(page):
+    """Tag queries issued by the current thread (one Streamlit session) with a page name"""
+    _page.name = page
+
+
+def get_page():
+    return getattr(_page, 'name', None)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement always groups together"""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def _calling_method():
+    """Name of the Database method that issued the query"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_filename == _DATABASE_FILE:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+
+def _record(db_name, sql, method, page, duration_ms, rows):
+    entry = {
+        'time': time.time(),
+        'sql': sql,
+        'method': method,
+        'page': page,
+        'duration_ms': duration_ms,
+        'rows': rows
+    }
+    if _settings['sample_rate'] >= 1.0 or random.random() < _settings['sample_rate']:
+        with _recent_lock:
+            _recent.append(entry)
+    if duration_ms >= _settings['slow_query_ms']:
+        _slow_queue.put((db_name, entry))
+        _start_writer()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times statements and counts the rows fetched from them"""
+
+    _pending = None
+
+    def _begin(self, sql):
+        self._finish()
+        self._pending = {
+            'sql': sql,
+            'method': _calling_method(),
+            'page': get_page(),
+            'elapsed': 0.0,
+            'rows': 0
+        }
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        rows = pending['rows'] if pending['rows'] or self.rowcount < 0 else self.rowcount
+        _record(self.connection.db_name, normalize_sql(pending['sql']), pending['method'], pending['page'],
+                round(pending['elapsed'] * 1000, 3), rows)
+
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            if self._pending is not None:
+                self._pending['elapsed'] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        self._timed(super().execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self._pending is not None:
+            self._pending['rows'] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._pending is not None:
+            self._pending['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending['rows'] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._pending is not None:
+            self._pending['rows'] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # A cursor dropped mid-statement (rows read with fetchone) is recorded as it goes
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are instrumented (use as sqlite3.connect factory)"""
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.db_name = database
+        # Weak, so long-lived connections do not keep every cursor they handed out
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    # Connection.execute does not go through cursor(), so route it explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        # Statements whose rows were read with fetchone are recorded here
+        for cursor in list(self._cursors):
+            cursor._finish()
+        self._cursors.clear()
+        super().close()
+
+
+def connect(db_name, read_only=False, **kwargs):
+    """
+    sqlite3.connect returning an instrumented connection
+
+    read_only opens the file with mode=ro; in WAL mode such readers never
+    take the write lock, so they run alongside the db_writer process.
+    """
+    if not read_only:
+        return sqlite3.connect(db_name, factory=InstrumentedConnection, **kwargs)
+    uri = f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro"
+    conn = sqlite3.connect(uri, factory=InstrumentedConnection, uri=True, **kwargs)
+    # Slow queries are logged through a normal connection to the plain path
+    conn.db_name = db_name
+    return conn
+
+
+def explain(db_name, sql):
+    """
+    Run EXPLAIN QUERY PLAN for a statement
+
+    Parameters are bound as NULL; the chosen indexes do not depend on values.
+
+    Returns:
+        list: Plan detail lines
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count('?')).fetchall()
+        return [row[-1] for row in rows]
+    finally:
+        conn.close()
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, name="agrivision-slow-queries")
+            _writer.daemon = True
+            _writer.start()
+
+
+def _writer_loop():
+    """Persist slow queries in batches on a plain (uninstrumented) connection"""
+    while True:
+        batch = [_slow_queue.get()]
+        while len(batch) < 100:
+            try:
+                batch.append(_slow_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        by_db = {}
+        for db_name, entry in batch:
+            by_db.setdefault(db_name, []).append(entry)
+
+        for db_name, entries in by_db.items():
+            try:
+                conn = sqlite3.connect(db_name, timeout=30)
+                try:
+                    conn.execute(CREATE_SLOW_QUERIES_SQL)
+                    rows = []
+                    for entry in entries:
+                        plan = None
+                        if _settings['capture_plans'] and entry['sql'].upper().startswith(('SELECT', 'WITH')):
+                            try:
+                                plan = "\n".join(explain(db_name, entry['sql']))
+                            except sqlite3.Error:
+                                plan = None
+                        rows.append((entry['sql'], entry['method'], entry['page'], entry['duration_ms'],
+                                     entry['rows'], plan))
+                    with conn:
+                        conn.executemany('''
+                            INSERT INTO slow_queries (sql, method, page, duration_ms, rows, query_plan)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        ''', rows)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Slow query log error: {e}")
+
+
+def get_recent_queries():
+    """Snapshot of the in-memory ring buffer, newest last"""
+    with _recent_lock:
+        return list(_recent)
+
+
+def get_query_stats():
+    """
+    Aggregate the ring buffer per (method, statement)
+
+    Returns:
+        list: Dicts with calls, total/avg/p95/max ms and avg rows, worst total time first
+    """
+    groups = {}
+    for entry in get_recent_queries():
+        groups.setdefault((entry['method'], entry['sql']), []).append(entry)
+
+    stats = []
+    for (method, sql), entries in groups.items():
+        durations = sorted(entry['duration_ms'] for entry in entries)
+        stats.append({
+            'method': method or '(direct)',
+            'sql': sql,
+            'pages': ", ".join(sorted({entry['page'] for entry in entries if entry['page']})),
+            'calls': len(entries),
+            'total_ms': round(sum(durations), 2),
+            'avg_ms': round(sum(durations) / len(durations), 3),
+            'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            'max_ms': durations[-1],
+            'avg_rows': round(sum(entry['rows'] for entry in entries) / len(entries), 1)
+        })
+    stats.sort(key=lambda item: item['total_ms'], reverse=True)
+    return stats
+
+
+def get_slow_queries(db_name, limit=50):
+    """
+    Worst offenders from the persistent slow-query log
+
+    Returns:
+        list: (method, sql, pages, occurrences, avg ms, max ms, last seen, latest plan)
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute(CREATE_SLOW_QUERIES_SQL)
+        return conn.execute('''
+            SELECT method, sql, GROUP_CONCAT(DISTINCT page), COUNT(*), AVG(duration_ms), MAX(duration_ms),
+                   MAX(created_at),
+                   (SELECT query_plan FROM slow_queries p
+                    WHERE p.sql = s.sql AND p.query_plan IS NOT NULL ORDER BY p.id DESC LIMIT 1)
+            FROM slow_queries s
+            GROUP BY method, sql
+            ORDER BY COUNT(*) * AVG(duration_ms) DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    finally:
+        conn.close()
+
+
+def clear_slow_queries(db_name):
+    """Empty the persistent slow-query log"""
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute(CREATE_SLOW_QUERIES_SQL)
+        with conn:
+            conn.execute("DELETE FROM slow_queries")
+    finally:
+        conn.close()
@@ -0,0 +1,152 @@
+"""
+Reference Data Cache for AgriVision
+Process-wide read-through cache for schemes, pesticides and shops. Entries
+are keyed by method and arguments and tagged with the generation counter of
+their data set. Writers bump the counter in the cache_generations table in
+the same transaction as their change, so every process sharing the SQLite
+file sees the new generation on its next read and reloads.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Data sets with their own generation counter
+GENERATIONS = ('schemes', 'pesticides', 'shops')
+
+MAX_ENTRIES = 256
+
+CREATE_GENERATIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS cache_generations (
+        name TEXT PRIMARY KEY,
+        generation INTEGER NOT NULL DEFAULT 0
+    )
+'''
+
+
+def init_generations(cursor):
+    """
+    Create the generation table, seeding its rows on first creation (called from Database.init_database)
+
+    Seeding only once keeps init read-only on an existing database; a missing
+    row reads as generation 0 and bump_generation creates it.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'cache_generations'")
+    exists = cursor.fetchone() is not None
+    cursor.execute(CREATE_GENERATIONS_SQL)
+    if not exists:
+        cursor.executemany("INSERT INTO cache_generations (name, generation) VALUES (?, 0)",
+                           [(name,) for name in GENERATIONS])
+
+
+def bump_generation(cursor, name):
+    """
+    Invalidate cached reads of a data set
+
+    Call with the cursor of the writing transaction so the bump commits (or
+    rolls back) together with the change itself.
+    """
+    try:
+        cursor.execute('''
+            INSERT INTO cache_generations (name, generation) VALUES (?, 1)
+            ON CONFLICT (name) DO UPDATE SET generation = generation + 1
+        ''', (name,))
+    except sqlite3.OperationalError:
+        # Standalone schemas (e.g. pesticide_shops_db) have no cache to invalidate
+        pass
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+class ReferenceCache:
+    """LRU read-through cache validated against cache_generations on every read"""
+
+    def __init__(self, db_name, max_entries=MAX_ENTRIES):
+        self.db_name = db_name
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, name):
+        # One cheap primary-key lookup on a per-thread connection
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name)
+            self.local.conn = conn
+        try:
+            row = conn.execute("SELECT generation FROM cache_generations WHERE name = ?", (name,)).fetchone()
+        except sqlite3.OperationalError:
+            # Table not created yet; treat as uncached
+            return None
+        return row[0] if row else 0
+
+    def generation(self, name):
+        """Current generation of a data set (None before the schema exists)"""
+        return self._generation(name)
+
+    def get(self, name, key, loader):
+        """
+        Return the cached value for key, reloading it if the data set changed
+
+        Args:
+            name: Data set ('schemes', 'pesticides' or 'shops')
+            key: Hashable key, usually (method name, arguments)
+            loader: Callable producing the value from the database
+
+        Returns:
+            A copy of the cached rows, or the shared object itself for
+            non-list values (which must not be mutated by callers)
+        """
+        # Read the generation before loading, so a write that races with the
+        # load leaves the entry stale rather than silently up to date
+        generation = self._generation(name)
+        cache_key = (name, key)
+
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if generation is not None and entry is not None and entry[0] == generation:
+                self.entries.move_to_end(cache_key)
+                self.hits += 1
+                return _copy(entry[1])
+            self.misses += 1
+
+        value = loader()
+        if generation is not None:
+            with self.lock:
+                self.entries[cache_key] = (generation, value)
+                self.entries.move_to_end(cache_key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return _copy(value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and entry count"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_name):
+    """Process-wide cache for a database file (shared by every Database instance)"""
+    with _caches_lock:
+        if db_name not in _caches:
+            _caches[db_name] = ReferenceCache(db_name)
+        return _caches[db_name]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Prediction History Re-scoring for AgriVision
+Re-scores past predictions with a candidate model to see how many would change.
+
+Usage:
+    python rescore_history.py --type crop --model models/new_crop_model.pkl
+    python rescore_history.py --type irrigation --model new.pkl --preprocessor new_pre.pkl --workers 8
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import joblib
+import pandas as pd
+
+import history_archive
+
+DEFAULT_ARTIFACTS = {
+    'crop': {'model': 'models/crop_recommendation_model.pkl', 'encoder': 'models/crop_encoder.pkl'},
+    'irrigation': {'model': 'models/irrigation_model.pkl', 'preprocessor': 'models/irrigation_preprocessor.pkl'},
+    'yield': {'model': 'models/yield_prediction_model.pkl', 'preprocessor': 'models/yield_preprocessor.pkl'}
+}
+
+# Same decision threshold MLModules.show_irrigation_recommendation uses
+IRRIGATION_THRESHOLD = 0.15
+
+# Candidate model state, loaded once per worker process
+_candidate = {}
+
+
+def _load_candidate(prediction_type, model_path, encoder_path=None, preprocessor_path=None):
+    """Process pool initializer: load the candidate artifacts once per worker"""
+    _candidate['type'] = prediction_type
+    _candidate['model'] = joblib.load(model_path)
+    _candidate['encoder'] = joblib.load(encoder_path) if encoder_path else None
+    _candidate['preprocessor'] = joblib.load(preprocessor_path) if preprocessor_path else None
+
+
+def _score_crop(inputs):
+    frame = pd.DataFrame([[row['N'], row['P'], row['K'], row['temp'], row['humidity'], row['ph'], row['rainfall']]
+                          for row in inputs])
+    encoded = _candidate['model'].predict(frame)
+    if _candidate['encoder'] is not None:
+        return [str(name) for name in _candidate['encoder'].inverse_transform(encoded)]
+    return [str(name) for name in encoded]
+
+
+def _score_irrigation(inputs):
+    # Humidity and water requirement use the page defaults; they are not saved
+    frame = pd.DataFrame([{
+        "soil_moisture": row['soil_moisture'],
+        "Temperature": row['temperature'],
+        "Humidity": 70,
+        "Rainfall": row['rainfall'],
+        "soil_type": row['soil_type'],
+        "Crop": row['crop'],
+        "growth_stage": row['growth_stage'],
+        "water_required_mm": 0
+    } for row in inputs])
+    probabilities = _candidate['model'].predict_proba(_candidate['preprocessor'].transform(frame))[:, 1]
+    return ["Irrigation Required" if p >= IRRIGATION_THRESHOLD else "No Irrigation Needed" for p in probabilities]
+
+
+def _score_yield(inputs):
+    frame = pd.DataFrame([{
+        "index": 0,
+        "State": row['state'],
+        "Crop": row['crop'],
+        "Crop_Year": row['year'],
+        "Season": row['season'],
+        "Area": row['area']
+    } for row in inputs])
+    predictions = _candidate['model'].predict(_candidate['preprocessor'].transform(frame))
+    return [f"{value:.2f} tons/ha" for value in predictions]
+
+
+SCORERS = {
+    'crop': _score_crop,
+    'irrigation': _score_irrigation,
+    'yield': _score_yield
+}
+
+
+def rescore_chunk(rows):
+    """
+    Re-score one chunk of prediction_history rows in a worker process
+
+    Args:
+        rows: List of (id, input_data JSON, old result)
+
+    Returns:
+        dict: Counts, old -> new transitions and the changed rows
+    """
+    ids, inputs, old_results = [], [], []
+    invalid = 0
+    for row_id, input_data, result in rows:
+        try:
+            parsed = json.loads(input_data)
+        except (TypeError, ValueError):
+            invalid += 1
+            continue
+        if not isinstance(parsed, dict):
+            invalid += 1
+            continue
+        inputs.append(parsed)
+        ids.append(row_id)
+        old_results.append(result)
+
+    new_results = []
+    if inputs:
+        try:
+            new_results = SCORERS[_candidate['type']](inputs)
+        except (KeyError, ValueError, TypeError):
+            # A malformed row poisons the whole batch; fall back to row-by-row
+            new_results = []
+            for single in inputs:
+                try:
+                    new_results.extend(SCORERS[_candidate['type']]([single]))
+                except (KeyError, ValueError, TypeError):
+                    new_results.append(None)
+
+    transitions = Counter()
+    changed = []
+    for row_id, old, new in zip(ids, old_results, new_results):
+        if new is None:
+            invalid += 1
+        elif new != old:
+            transitions[f"{old} -> {new}"] += 1
+            changed.append((row_id, old, new))
+
+    return {
+        'scored': len(ids) - sum(1 for new in new_results if new is None),
+        'invalid': invalid,
+        'transitions': dict(transitions),
+        'changed': changed
+    }
+
+
+def iter_history_chunks(db_name, prediction_type, chunk_size=5000):
+    """
+    Stream prediction history in keyset-paginated chunks, archives included
+
+    Yields:
+        list: Up to chunk_size (id, input_data, result) rows, ordered by id within each partition
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        yield from history_archive.iter_history_chunks(conn, prediction_type, chunk_size)
+    finally:
+        conn.close()
+
+
+def rescore_history(db_name, prediction_type, model_path, encoder_path=None, preprocessor_path=None,
+                    workers=None, chunk_size=5000, changes_path=None):
+    """
+    Re-score every prediction of one type against a candidate model
+
+    At most two chunks per worker are in flight at once, so memory stays
+    bounded no matter how large prediction_history grows.
+
+    Args:
+        db_name: SQLite database path
+        prediction_type: 'crop', 'irrigation' or 'yield'
+        model_path: Candidate model file
+        encoder_path: Label encoder (crop only)
+        preprocessor_path: Feature preprocessor (irrigation and yield)
+        workers: Worker processes (defaults to the CPU count)
+        chunk_size: Rows per chunk
+        changes_path: Optional CSV receiving every changed row
+
+    Returns:
+        dict: Diff summary
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    started = time.time()
+
+    summary = {
+        'prediction_type': prediction_type,
+        'candidate_model': model_path,
+        'rows_scored': 0,
+        'rows_changed': 0,
+        'rows_invalid': 0,
+        'transitions': Counter()
+    }
+
+    changes_file = open(changes_path, 'w', newline='') if changes_path else None
+    changes_writer = csv.writer(changes_file) if changes_file else None
+    if changes_writer:
+        changes_writer.writerow(['id', 'old_result', 'new_result'])
+
+    def collect(future):
+        result = future.result()
+        summary['rows_scored'] += result['scored']
+        summary['rows_invalid'] += result['invalid']
+        summary['rows_changed'] += len(result['changed'])
+        summary['transitions'].update(result['transitions'])
+        if changes_writer:
+            changes_writer.writerows(result['changed'])
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_load_candidate,
+            initargs=(prediction_type, model_path, encoder_path, preprocessor_path)
+        ) as pool:
+            in_flight = set()
+            for chunk in iter_history_chunks(db_name, prediction_type, chunk_size):
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+                in_flight.add(pool.submit(rescore_chunk, chunk))
+
+            for future in in_flight:
+                collect(future)
+    finally:
+        if changes_file:
+            changes_file.close()
+
+    elapsed = time.time() - started
+    scored = summary['rows_scored']
+    summary['change_rate'] = round(summary['rows_changed'] / scored, 4) if scored else 0.0
+    summary['transitions'] = dict(summary['transitions'].most_common())
+    summary['elapsed_seconds'] = round(elapsed, 2)
+    summary['rows_per_second'] = round(scored / elapsed, 1) if elapsed > 0 else 0.0
+    summary['workers'] = workers
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score prediction_history against a candidate model")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database path')
+    parser.add_argument('--type', dest='prediction_type', choices=sorted(SCORERS), default='crop')
+    parser.add_argument('--model', help='Candidate model file (defaults to the current model)')
+    parser.add_argument('--encoder', help='Crop label encoder')
+    parser.add_argument('--preprocessor', help='Irrigation/yield preprocessor')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per chunk')
+    parser.add_argument('--output', default='rescore_summary.json', help='Where to write the diff summary')
+    parser.add_argument('--changes', help='Optional CSV of every changed row')
+    args = parser.parse_args()
+
+    defaults = DEFAULT_ARTIFACTS[args.prediction_type]
+    model_path = args.model or defaults['model']
+    encoder_path = args.encoder or defaults.get('encoder')
+    preprocessor_path = args.preprocessor or defaults.get('preprocessor')
+
+    print(f"Re-scoring {args.prediction_type} predictions in {args.db} with {model_path}")
+    summary = rescore_history(
+        args.db, args.prediction_type, model_path,
+        encoder_path=encoder_path,
+        preprocessor_path=preprocessor_path,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        changes_path=args.changes
+    )
+
+    with open(args.output, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Scored: {summary['rows_scored']}  Changed: {summary['rows_changed']} "
+          f"({summary['change_rate']:.1%})  Invalid: {summary['rows_invalid']}")
+    print(f"Throughput: {summary['rows_per_second']} rows/s with {summary['workers']} workers")
+    for transition, count in list(summary['transitions'].items())[:10]:
+        print(f"  {transition}: {count}")
+    print(f"Summary written to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Bulk Pesticide Shop Import for AgriVision
+Streams CSV, JSON, JSON Lines and GeoJSON shop directories into the
+pesticide_shops table. Rows are validated and de-duplicated by licence
+number and normalized coordinates, then inserted with executemany in large
+transactions.
+
+Usage:
+    python shop_import.py shops.csv
+    python shop_import.py directory.geojson --db agrivision.db --batch-size 50000
+    python shop_import.py shops.jsonl --dry-run
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+
+import db_maintenance
+import reference_cache
+
+# Columns written by the importer, in INSERT order
+SHOP_COLUMNS = [
+    'shop_name', 'owner_name', 'address', 'city', 'state', 'pincode',
+    'latitude', 'longitude', 'phone', 'email', 'rating', 'is_open',
+    'opening_time', 'closing_time', 'products_available', 'license_number', 'verified'
+]
+
+# Alternative field names found in shop directories and in the admin form
+FIELD_ALIASES = {
+    'name': 'shop_name',
+    'shop': 'shop_name',
+    'owner': 'owner_name',
+    'contact': 'phone',
+    'contact_number': 'phone',
+    'mobile': 'phone',
+    'lat': 'latitude',
+    'lng': 'longitude',
+    'lon': 'longitude',
+    'long': 'longitude',
+    'products': 'products_available',
+    'services_offered': 'products_available',
+    'license': 'license_number',
+    'licence': 'license_number',
+    'licence_number': 'license_number',
+    'pin': 'pincode',
+    'zip': 'pincode'
+}
+
+INSERT_SQL = f'''
+    INSERT INTO pesticide_shops ({", ".join(SHOP_COLUMNS)})
+    VALUES ({", ".join("?" for _ in SHOP_COLUMNS)})
+'''
+
+# Coordinates are compared at 5 decimal places (about 1 m)
+COORDINATE_PRECISION = 5
+
+DEFAULT_BATCH_SIZE = 50000
+MAX_REPORTED_ERRORS = 20
+
+
+class ShopValidationError(ValueError):
+    """Raised when a shop record cannot be imported"""
+
+
+def _canonical_key(key):
+    key = str(key).strip().lower().replace(' ', '_').replace('-', '_')
+    return FIELD_ALIASES.get(key, key)
+
+
+# Canonical key mapping per distinct set of source keys. A CSV file has one
+# key set for every row, so the mapping is computed once instead of per field.
+_key_maps = {}
+
+
+def _key_map(record):
+    keys = tuple(record)
+    mapping = _key_maps.get(keys)
+    if mapping is None:
+        mapping = [(_canonical_key(key), key) for key in keys]
+        if len(_key_maps) < 1024:
+            _key_maps[keys] = mapping
+    return mapping
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _flag(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return 0 if value.strip().lower() in ('0', 'false', 'no', 'n') else 1
+    return 1 if value else 0
+
+
+def normalize_shop(record):
+    """
+    Validate one raw record and convert it to a pesticide_shops row
+
+    Args:
+        record: Dictionary from any supported source format
+
+    Returns:
+        tuple: Values in SHOP_COLUMNS order
+
+    Raises:
+        ShopValidationError: If the record is not an object, or a required field
+            is missing or out of range
+    """
+    if not isinstance(record, dict):
+        raise ShopValidationError(f"expected an object, got {type(record).__name__}")
+    shop = {canonical: record[key] for canonical, key in _key_map(record)}
+
+    shop_name = _text(shop.get('shop_name'))
+    address = _text(shop.get('address'))
+    if not shop_name:
+        raise ShopValidationError("missing shop_name")
+    if not address:
+        raise ShopValidationError("missing address")
+
+    try:
+        latitude = float(shop.get('latitude'))
+        longitude = float(shop.get('longitude'))
+    except (TypeError, ValueError):
+        raise ShopValidationError("missing or non-numeric coordinates")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ShopValidationError(f"coordinates out of range: {latitude}, {longitude}")
+    if latitude == 0 and longitude == 0:
+        raise ShopValidationError("coordinates not set")
+
+    rating = shop.get('rating')
+    try:
+        rating = float(rating) if rating not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        raise ShopValidationError(f"invalid rating: {rating}")
+    if not 0 <= rating <= 5:
+        raise ShopValidationError(f"rating out of range: {rating}")
+
+    products = shop.get('products_available')
+    if isinstance(products, (list, tuple)):
+        products = ",".join(_text(product) for product in products if _text(product))
+
+    return (
+        shop_name,
+        _text(shop.get('owner_name')),
+        address,
+        _text(shop.get('city')),
+        _text(shop.get('state')),
+        _text(shop.get('pincode')),
+        latitude,
+        longitude,
+        _text(shop.get('phone')),
+        _text(shop.get('email')),
+        rating,
+        _flag(shop.get('is_open'), 1),
+        _text(shop.get('opening_time')),
+        _text(shop.get('closing_time')),
+        _text(products),
+        _text(shop.get('license_number')).upper(),
+        _flag(shop.get('verified'), 1)
+    )
+
+
+def coordinate_key(latitude, longitude):
+    """Normalized coordinates used to detect the same shop listed twice"""
+    return (round(float(latitude), COORDINATE_PRECISION), round(float(longitude), COORDINATE_PRECISION))
+
+
+def _iter_json_array(f, key=None, block_size=1 << 16):
+    """
+    Yield the elements of a JSON array one at a time without loading the file
+
+    Args:
+        f: Text file object
+        key: If given, stream the array stored under this top-level key
+             (e.g. 'features' in a GeoJSON FeatureCollection)
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(block_size)
+    eof = not buffer
+
+    # Position the buffer just after the opening bracket of the array
+    if key:
+        marker = f'"{key}"'
+        while marker not in buffer and not eof:
+            more = f.read(block_size)
+            eof = not more
+            buffer += more
+        if marker not in buffer:
+            raise ShopValidationError(f"no '{key}' array found")
+        buffer = buffer[buffer.index(marker) + len(marker):]
+    while '[' not in buffer and not eof:
+        more = f.read(block_size)
+        eof = not more
+        buffer += more
+    if '[' not in buffer:
+        raise ShopValidationError("no JSON array found")
+    buffer = buffer[buffer.index('[') + 1:]
+
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            element, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise ShopValidationError("truncated JSON array")
+            more = f.read(block_size)
+            eof = not more
+            buffer += more
+            continue
+        yield element
+        buffer = buffer[end:]
+        if len(buffer) < block_size and not eof:
+            more = f.read(block_size)
+            eof = not more
+            buffer += more
+
+
+class UnreadableRecord:
+    """Placeholder for a source record that could not be parsed at all"""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+
+def _feature_to_record(feature, number):
+    """
+    Flatten a GeoJSON Point feature into a shop record
+
+    Returns:
+        dict: Shop record, or an UnreadableRecord if the feature, its
+              properties or its geometry is not a JSON object
+    """
+    if not isinstance(feature, dict):
+        return UnreadableRecord(f"feature {number}: expected an object, got {type(feature).__name__}")
+    properties = feature.get('properties') or {}
+    geometry = feature.get('geometry') or {}
+    for name, value in (('properties', properties), ('geometry', geometry)):
+        if not isinstance(value, dict):
+            return UnreadableRecord(f"feature {number}: {name} is not an object")
+
+    record = dict(properties)
+    if geometry.get('type') == 'Point':
+        coordinates = geometry.get('coordinates') or []
+        if isinstance(coordinates, list) and len(coordinates) >= 2:
+            # GeoJSON stores positions as [longitude, latitude]
+            record['longitude'], record['latitude'] = coordinates[0], coordinates[1]
+    return record
+
+
+def detect_format(filename):
+    """Guess the source format from a file name"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.geojson',):
+        return 'geojson'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.json':
+        return 'json'
+    return 'csv'
+
+
+class _ChainedReader:
+    """Read from a peeked prefix and then the rest of the file"""
+
+    def __init__(self, *sources):
+        self.sources = list(sources)
+
+    def read(self, size=-1):
+        while self.sources:
+            data = self.sources[0].read(size)
+            if data:
+                return data
+            self.sources.pop(0)
+        return ''
+
+
+def iter_records(f, file_format):
+    """
+    Stream raw records from an open text file
+
+    Args:
+        f: Text file object
+        file_format: 'csv', 'json', 'jsonl' or 'geojson'
+
+    Yields:
+        dict: One raw shop record, or an UnreadableRecord for a JSONL line
+              that is not valid JSON or a malformed GeoJSON feature (the
+              import reports it as invalid)
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(f)
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield UnreadableRecord(f"line {line_number}: invalid JSON ({e.msg})")
+    elif file_format == 'geojson':
+        for number, feature in enumerate(_iter_json_array(f, key='features'), start=1):
+            yield _feature_to_record(feature, number)
+    elif file_format == 'json':
+        # Either a bare array or an object wrapping it under "shops"
+        start = f.read(1024)
+        key = None if start.lstrip().startswith('[') else 'shops'
+        yield from _iter_json_array(_ChainedReader(io.StringIO(start), f), key=key)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
+def import_records(conn, records, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Validate, de-duplicate and insert shop records on an open connection
+
+    Duplicates are detected against existing shops and within the import by
+    licence number (when present) and by normalized coordinates.
+
+    Args:
+        conn: sqlite3 connection with the pesticide_shops table
+        records: Iterable of raw shop dictionaries
+        batch_size: Rows per executemany transaction
+        dry_run: Validate and de-duplicate without writing
+
+    Returns:
+        dict: Import report with counts, sample errors and throughput
+    """
+    started = time.time()
+    report = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+
+    licences = set()
+    coordinates = set()
+    for licence, latitude, longitude in conn.execute(
+            "SELECT license_number, latitude, longitude FROM pesticide_shops"):
+        if licence:
+            licences.add(str(licence).strip().upper())
+        if latitude is not None and longitude is not None:
+            coordinates.add(coordinate_key(latitude, longitude))
+
+    def flush(batch):
+        if batch and not dry_run:
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+                reference_cache.bump_generation(conn, 'shops')
+        report['inserted'] += len(batch)
+
+    batch = []
+    for line_number, record in enumerate(records, start=1):
+        report['read'] += 1
+        try:
+            if isinstance(record, UnreadableRecord):
+                raise ShopValidationError(record.reason)
+            row = normalize_shop(record)
+        except (ValueError, TypeError, AttributeError) as e:
+            # ShopValidationError is a ValueError; the others come from values
+            # of an unexpected type inside an otherwise well-formed record
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append(f"record {line_number}: {e}")
+            continue
+
+        licence = row[15]
+        location = coordinate_key(row[6], row[7])
+        if (licence and licence in licences) or location in coordinates:
+            report['duplicates'] += 1
+            continue
+        if licence:
+            licences.add(licence)
+        coordinates.add(location)
+
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+
+    elapsed = time.time() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['read'] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+
+def import_file(db_name, f, file_format, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Import an open shop directory file into a database
+
+    Args:
+        db_name: SQLite database path
+        f: Text file object
+        file_format: 'csv', 'json', 'jsonl' or 'geojson'
+        batch_size: Rows per executemany transaction
+        dry_run: Validate and de-duplicate without writing
+
+    Returns:
+        dict: Import report
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        report = import_records(conn, iter_records(f, file_format), batch_size=batch_size, dry_run=dry_run)
+        if not dry_run and report['inserted']:
+            # Keep the planner's picture of the shop table current after a bulk load
+            db_maintenance.analyze_tables(conn, ['pesticide_shops'])
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import pesticide shops")
+    parser.add_argument('path', help='CSV, JSON, JSON Lines or GeoJSON file')
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database path')
+    parser.add_argument('--format', choices=['csv', 'json', 'jsonl', 'geojson'],
+                        help='Source format (default: from the file extension)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Validate without writing')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"File not found: {args.path}")
+        return False
+
+    from database import Database
+    Database(args.db)  # make sure the schema exists
+
+    file_format = args.format or detect_format(args.path)
+    with open(args.path, newline='', encoding='utf-8-sig') as f:
+        report = import_file(args.db, f, file_format, batch_size=args.batch_size, dry_run=args.dry_run)
+
+    action = "Validated" if args.dry_run else "Imported"
+    print(f"{action} {report['inserted']:,} of {report['read']:,} shops "
+          f"({report['duplicates']:,} duplicates, {report['invalid']:,} invalid) "
+          f"in {report['elapsed_seconds']}s - {report['rows_per_second']:,.0f} rows/s")
+    for error in report['errors']:
+        print(f"  {error}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
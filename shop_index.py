@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Shop Product Index for AgriVision
+pesticide_shops.products_available is a comma-separated string. This module
+keeps it normalized in the shop_products table (one row per shop and
+product, maintained by triggers on pesticide_shops, so the app, the writer
+process, the importer and synthetic_data all stay in sync) and builds an
+in-memory ShopIndex from it:
+- product -> sorted array of shop positions (inverted index)
+- shop ids and coordinates as numpy arrays
+- opening hours parsed once into minute-of-week intervals
+
+"Shops within 10 km stocking Mancozeb, open now" is then an intersection of
+sorted posting arrays, one vectorized interval test and one vectorized
+distance computation over the remaining candidates, with no string parsing
+at query time.
+
+Usage:
+    python shop_index.py --db agrivision.db --products
+    python shop_index.py --db agrivision.db --near 18.52,73.86 --radius 10 --product Mancozeb
+    python shop_index.py --db agrivision.db --near 18.52,73.86 --open-at "2024-06-03 21:30"
+"""
+
+import re
+import sys
+import string
+import argparse
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_LIMIT = 50
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# Shop hours are local Indian time (no daylight saving)
+SHOP_TIMEZONE = timezone(timedelta(hours=5, minutes=30), 'IST')
+
+# "08:30", "08:30:00", "8.30", "8:30 PM", "8 am"
+_TIME_PATTERN = re.compile(r'^\s*(\d{1,2})(?:[:.](\d{2}))?(?::\d{2})?\s*([ap])?\.?m?\.?\s*$', re.IGNORECASE)
+
+# SQLite's lower() only folds ASCII; product keys fold the same way in Python
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# products_available as a JSON array of its comma-separated parts, for json_each().
+# Backslashes and quotes are escaped; anything else JSON rejects (control
+# characters) makes json_valid() false and the shop is simply not indexed.
+_PRODUCTS_JSON = '''('["' || replace(replace(replace({row}products_available, '\\', '\\\\'), '"', '\\"'), ',', '","') || '"]')'''
+
+
+def _insert_products_sql(row, source=''):
+    """INSERT ... SELECT of the shop_products rows of {row} (a single row or a table scan)"""
+    products = _PRODUCTS_JSON.format(row=row)
+    return f'''
+        INSERT OR IGNORE INTO shop_products (product, shop_id, name)
+        SELECT lower(trim(item.value)), {row}id, trim(item.value)
+        FROM {source}json_each({products}) AS item
+        WHERE {row}products_available IS NOT NULL AND json_valid({products}) AND trim(item.value) != ''
+    '''
+
+
+def init_shop_products(cursor):
+    """Create shop_products and its triggers, filling it on first creation (called from Database.init_database)"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'shop_products'")
+    exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shop_products (
+            product TEXT NOT NULL,
+            shop_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (product, shop_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shop_products_shop ON shop_products(shop_id)")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_shop_products_insert AFTER INSERT ON pesticide_shops
+        BEGIN
+            {_insert_products_sql('NEW.')};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_shop_products_update AFTER UPDATE OF products_available ON pesticide_shops
+        BEGIN
+            DELETE FROM shop_products WHERE shop_id = OLD.id;
+            {_insert_products_sql('NEW.')};
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_shop_products_delete AFTER DELETE ON pesticide_shops
+        BEGIN
+            DELETE FROM shop_products WHERE shop_id = OLD.id;
+        END
+    ''')
+    if not exists:
+        rebuild_shop_products(cursor)
+
+
+def rebuild_shop_products(cursor):
+    """Recompute shop_products from every shop's products_available"""
+    cursor.execute("DELETE FROM shop_products")
+    cursor.execute(_insert_products_sql('shop.', source='pesticide_shops AS shop, '))
+
+
+def product_key(name):
+    """Index key of a product name ("  Mancozeb " -> "mancozeb")"""
+    return (name or '').strip(' ').translate(_ASCII_LOWER)
+
+
+def parse_time(value):
+    """
+    Minutes after midnight of a shop opening or closing time
+
+    Returns:
+        int: 0-1439, or None for blank or unreadable values
+    """
+    match = _TIME_PATTERN.match(str(value or ''))
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    if hour == 24 and minute == 0:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def format_time(value):
+    """
+    A stored opening or closing time as 24-hour HH:MM for display
+
+    Returns:
+        str: HH:MM, or the stored value unchanged if parse_time cannot read it
+    """
+    minutes = parse_time(value)
+    if minutes is None:
+        return str(value).strip()
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def minute_of_week(when=None):
+    """
+    Minutes since Monday 00:00 shop time
+
+    Args:
+        when: datetime (naive values are taken as shop time), or None for now
+    """
+    if when is None:
+        when = datetime.now(SHOP_TIMEZONE)
+    elif when.tzinfo is not None:
+        when = when.astimezone(SHOP_TIMEZONE)
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def weekly_intervals(positions, opens, closes):
+    """
+    Minute-of-week [start, end) intervals for daily hours
+
+    A closing time at or before the opening time runs past midnight; equal
+    times mean open around the clock. Intervals running past Sunday midnight
+    are split so every interval lies within the week.
+
+    Args:
+        positions: Shop positions with known hours
+        opens: Opening minute of day per position
+        closes: Closing minute of day per position
+
+    Returns:
+        tuple: (positions, starts, ends) int32 arrays
+    """
+    positions = np.asarray(positions, dtype=np.int32)
+    opens = np.asarray(opens, dtype=np.int32)
+    closes = np.asarray(closes, dtype=np.int32)
+    lengths = (closes - opens) % MINUTES_PER_DAY
+    lengths[lengths == 0] = MINUTES_PER_DAY
+
+    days = np.arange(7, dtype=np.int32)[:, None] * MINUTES_PER_DAY
+    starts = (days + opens).ravel()
+    ends = starts + np.tile(lengths, 7)
+    owners = np.tile(positions, 7)
+
+    wraps = ends > MINUTES_PER_WEEK
+    starts = np.concatenate([starts, np.zeros(wraps.sum(), dtype=np.int32)])
+    owners = np.concatenate([owners, owners[wraps]])
+    ends = np.concatenate([np.minimum(ends, MINUTES_PER_WEEK), ends[wraps] - MINUTES_PER_WEEK])
+    return owners, starts, ends
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distances in km from one point to arrays of points"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class ShopIndex:
+    """Verified shop coordinates, opening hours and a product -> shop inverted index"""
+
+    def __init__(self, ids, lats, lngs, postings, names, is_open=None, opening_times=None, closing_times=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lngs = np.asarray(lngs, dtype=float)
+        # product key -> sorted int32 positions into ids/lats/lngs
+        self.postings = postings
+        # product key -> display name
+        self.names = names
+
+        # is_open = 0 marks a shop as closed whatever its hours say
+        self.active = np.ones(len(self.ids), dtype=bool) if is_open is None else \
+            np.array([bool(flag) if flag is not None else True for flag in is_open], dtype=bool)
+        # Shops without readable hours count as open while active
+        self.has_hours = np.zeros(len(self.ids), dtype=bool)
+        opening_times = opening_times or [None] * len(self.ids)
+        closing_times = closing_times or [None] * len(self.ids)
+        parsed = {}
+        opens, closes = [], []
+        for position, (opening, closing) in enumerate(zip(opening_times, closing_times)):
+            # A few hundred distinct strings at most; parse each once
+            for value in (opening, closing):
+                if value not in parsed:
+                    parsed[value] = parse_time(value)
+            if parsed[opening] is not None and parsed[closing] is not None:
+                self.has_hours[position] = True
+                opens.append(parsed[opening])
+                closes.append(parsed[closing])
+        self.interval_shops, self.interval_starts, self.interval_ends = weekly_intervals(
+            np.flatnonzero(self.has_hours), opens, closes)
+        self._open_cache = (None, None)
+
+    @classmethod
+    def load(cls, conn):
+        """
+        Build the index from verified shops and shop_products
+
+        Args:
+            conn: sqlite3 connection
+
+        Returns:
+            ShopIndex
+        """
+        rows = conn.execute('''
+            SELECT id, latitude, longitude, is_open, opening_time, closing_time FROM pesticide_shops
+            WHERE verified = 1 AND latitude IS NOT NULL AND longitude IS NOT NULL
+            ORDER BY id
+        ''').fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        lats = np.array([row[1] for row in rows], dtype=float)
+        lngs = np.array([row[2] for row in rows], dtype=float)
+
+        postings = {}
+        names = {}
+        product_rows = conn.execute("SELECT product, shop_id, name FROM shop_products ORDER BY product, shop_id")
+        for product, group in groupby(product_rows, key=lambda row: row[0]):
+            group = list(group)
+            shop_ids = np.array([row[1] for row in group], dtype=np.int64)
+            positions = np.searchsorted(ids, shop_ids)
+            # Unverified shops have products too but no position
+            found = positions < len(ids)
+            found[found] = ids[positions[found]] == shop_ids[found]
+            if found.any():
+                postings[product] = positions[found].astype(np.int32)
+                names[product] = group[0][2]
+        return cls(ids, lats, lngs, postings, names, [row[3] for row in rows],
+                   [row[4] for row in rows], [row[5] for row in rows])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def products(self):
+        """
+        Indexed products, most widely stocked first
+
+        Returns:
+            list: (display name, number of shops) tuples
+        """
+        return sorted(((self.names[key], len(positions)) for key, positions in self.postings.items()),
+                      key=lambda item: (-item[1], item[0]))
+
+    def candidates(self, products=None):
+        """
+        Positions of shops stocking every product in products (all shops if none given)
+
+        Returns:
+            np.ndarray: Sorted positions
+        """
+        keys = [product_key(product) for product in (products or []) if product_key(product)]
+        if not keys:
+            return np.arange(len(self.ids), dtype=np.int32)
+        postings = [self.postings.get(key) for key in dict.fromkeys(keys)]
+        if any(posting is None for posting in postings):
+            return np.empty(0, dtype=np.int32)
+        # Smallest list first keeps every intermediate result small
+        postings.sort(key=len)
+        result = postings[0]
+        for posting in postings[1:]:
+            result = np.intersect1d(result, posting, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def open_mask(self, when=None):
+        """
+        Which shops are open at a time
+
+        One vectorized interval test over all shops; the result is reused for
+        every query within the same minute.
+
+        Args:
+            when: datetime (naive values are shop time), or None for now
+
+        Returns:
+            np.ndarray: Boolean per shop position (do not modify)
+        """
+        minute = minute_of_week(when)
+        cached_minute, mask = self._open_cache
+        if cached_minute == minute:
+            return mask
+        inside = (self.interval_starts <= minute) & (minute < self.interval_ends)
+        mask = ~self.has_hours
+        mask[self.interval_shops[inside]] = True
+        mask &= self.active
+        self._open_cache = (minute, mask)
+        return mask
+
+    def nearby(self, lat, lng, radius_km, products=None, limit=DEFAULT_LIMIT, open_only=False, when=None):
+        """
+        Nearest shops within a radius, optionally only those stocking given products
+
+        Args:
+            lat: Latitude
+            lng: Longitude
+            radius_km: Search radius in kilometers
+            products: Product names the shops must all stock
+            limit: Most shops returned
+            open_only: Only shops open at `when`
+            when: datetime for the open status (default now)
+
+        Returns:
+            list: (shop id, distance in km, open at `when`) tuples, nearest first
+        """
+        positions = self.candidates(products)
+        if not len(positions):
+            return []
+
+        # A bounding box cut is cheaper than trigonometry on every candidate
+        lat_span = radius_km / 111.0
+        lng_span = radius_km / (111.0 * max(np.cos(np.radians(lat)), 0.01))
+        lats, lngs = self.lats[positions], self.lngs[positions]
+        inside = (np.abs(lats - lat) <= lat_span) & (np.abs(lngs - lng) <= lng_span)
+        positions, lats, lngs = positions[inside], lats[inside], lngs[inside]
+
+        distances = haversine_km(lat, lng, lats, lngs)
+        within = distances <= radius_km
+        positions, distances = positions[within], distances[within]
+        is_open = self.open_mask(when)[positions]
+        if open_only:
+            positions, distances, is_open = positions[is_open], distances[is_open], is_open[is_open]
+        if len(positions) > limit:
+            nearest = np.argpartition(distances, limit)[:limit]
+            positions, distances, is_open = positions[nearest], distances[nearest], is_open[nearest]
+        order = np.argsort(distances, kind='stable')
+        return [(int(self.ids[position]), float(distance), bool(flag))
+                for position, distance, flag in zip(positions[order], distances[order], is_open[order])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision shop product index")
+    parser.add_argument('--db', default='agrivision.db', help='SQLite database')
+    parser.add_argument('--products', action='store_true', help='List indexed products')
+    parser.add_argument('--near', help='lat,lng to search around')
+    parser.add_argument('--radius', type=float, default=10, help='Search radius in km')
+    parser.add_argument('--product', action='append', default=[], help='Required product (repeatable)')
+    parser.add_argument('--open-now', action='store_true', help='Only shops open now (or at --open-at)')
+    parser.add_argument('--open-at', help='Shop time "YYYY-MM-DD HH:MM" for the open status')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute shop_products from products_available')
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database(args.db)
+    if args.rebuild:
+        conn = db.get_connection()
+        try:
+            rebuild_shop_products(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        print("Rebuilt shop_products")
+
+    index = db.get_shop_index()
+    print(f"{len(index):,} verified shops, {len(index.postings):,} products")
+    if args.products:
+        for name, count in index.products():
+            print(f"  {name}: {count:,}")
+    if args.near:
+        try:
+            lat, lng = (float(value) for value in args.near.split(','))
+        except ValueError:
+            print("--near must be lat,lng")
+            return False
+        when = None
+        if args.open_at:
+            try:
+                when = datetime.strptime(args.open_at, '%Y-%m-%d %H:%M')
+            except ValueError:
+                print('--open-at must be "YYYY-MM-DD HH:MM"')
+                return False
+        shops = db.get_nearby_shops(lat, lng, args.radius, products=args.product,
+                                    open_only=args.open_now, when=when)
+        for shop in shops:
+            status = 'open' if shop['open_now'] else 'closed'
+            print(f"  {shop['distance']:6.2f} km  {status:6}  {shop['name']} ({shop['city']}, "
+                  f"{shop['opening_time']}-{shop['closing_time']}): {', '.join(shop['products'])}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
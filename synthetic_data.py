@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator for AgriVision
+Generates production-sized soil samples, users, pesticide shops across India
+and prediction history, and bulk-loads them into the SQLite schema so load and
+scaling tests can run against realistic volumes on a laptop.
+
+Usage:
+    python synthetic_data.py --scale small                 # quick local dataset
+    python synthetic_data.py --scale full --db load_test.db
+    python synthetic_data.py --users 0 --shops 500000 --history 0 --soil-samples 0
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+import db_maintenance
+import reference_cache
+from database import Database
+from dataset_cache import load_dataset
+from crop_fallback import DATA_PATH, FEATURE_COLUMNS, LABEL_COLUMN
+
+SCALES = {
+    'small': {'users': 1000, 'shops': 5000, 'history': 100000, 'soil_samples': 100000},
+    'medium': {'users': 100000, 'shops': 50000, 'history': 1000000, 'soil_samples': 1000000},
+    'full': {'users': 1000000, 'shops': 500000, 'history': 10000000, 'soil_samples': 5000000}
+}
+
+# (city, state, latitude, longitude, pincode prefix, weight)
+CITIES = [
+    ('Pune', 'Maharashtra', 18.5204, 73.8567, '411', 4),
+    ('Nashik', 'Maharashtra', 19.9975, 73.7898, '422', 3),
+    ('Nagpur', 'Maharashtra', 21.1458, 79.0882, '440', 3),
+    ('Aurangabad', 'Maharashtra', 19.8762, 75.3433, '431', 2),
+    ('Kolhapur', 'Maharashtra', 16.7050, 74.2433, '416', 2),
+    ('Ludhiana', 'Punjab', 30.9010, 75.8573, '141', 3),
+    ('Amritsar', 'Punjab', 31.6340, 74.8723, '143', 2),
+    ('Karnal', 'Haryana', 29.6857, 76.9905, '132', 2),
+    ('Hisar', 'Haryana', 29.1492, 75.7217, '125', 2),
+    ('Lucknow', 'Uttar Pradesh', 26.8467, 80.9462, '226', 3),
+    ('Kanpur', 'Uttar Pradesh', 26.4499, 80.3319, '208', 3),
+    ('Meerut', 'Uttar Pradesh', 28.9845, 77.7064, '250', 2),
+    ('Varanasi', 'Uttar Pradesh', 25.3176, 82.9739, '221', 2),
+    ('Patna', 'Bihar', 25.5941, 85.1376, '800', 3),
+    ('Muzaffarpur', 'Bihar', 26.1209, 85.3647, '842', 2),
+    ('Kolkata', 'West Bengal', 22.5726, 88.3639, '700', 2),
+    ('Bardhaman', 'West Bengal', 23.2324, 87.8615, '713', 2),
+    ('Ahmedabad', 'Gujarat', 23.0225, 72.5714, '380', 3),
+    ('Rajkot', 'Gujarat', 22.3039, 70.8022, '360', 2),
+    ('Jaipur', 'Rajasthan', 26.9124, 75.7873, '302', 3),
+    ('Kota', 'Rajasthan', 25.2138, 75.8648, '324', 2),
+    ('Indore', 'Madhya Pradesh', 22.7196, 75.8577, '452', 3),
+    ('Bhopal', 'Madhya Pradesh', 23.2599, 77.4126, '462', 2),
+    ('Raipur', 'Chhattisgarh', 21.2514, 81.6296, '492', 2),
+    ('Bhubaneswar', 'Odisha', 20.2961, 85.8245, '751', 2),
+    ('Guntur', 'Andhra Pradesh', 16.3067, 80.4365, '522', 3),
+    ('Vijayawada', 'Andhra Pradesh', 16.5062, 80.6480, '520', 2),
+    ('Hyderabad', 'Telangana', 17.3850, 78.4867, '500', 3),
+    ('Warangal', 'Telangana', 17.9689, 79.5941, '506', 2),
+    ('Bengaluru', 'Karnataka', 12.9716, 77.5946, '560', 3),
+    ('Belagavi', 'Karnataka', 15.8497, 74.4977, '590', 2),
+    ('Davangere', 'Karnataka', 14.4644, 75.9218, '577', 2),
+    ('Coimbatore', 'Tamil Nadu', 11.0168, 76.9558, '641', 3),
+    ('Madurai', 'Tamil Nadu', 9.9252, 78.1198, '625', 2),
+    ('Thanjavur', 'Tamil Nadu', 10.7870, 79.1378, '613', 2),
+    ('Kochi', 'Kerala', 9.9312, 76.2673, '682', 2),
+    ('Guwahati', 'Assam', 26.1445, 91.7362, '781', 2),
+    ('Dehradun', 'Uttarakhand', 30.3165, 78.0322, '248', 1),
+    ('Shimla', 'Himachal Pradesh', 31.1048, 77.1734, '171', 1),
+    ('Ranchi', 'Jharkhand', 23.3441, 85.3096, '834', 2)
+]
+
+SHOP_PREFIXES = ['Kisan', 'Green Farm', 'Krishi', 'Bharat', 'Annapurna', 'Shree', 'Jai Kisan',
+                 'Farm Fresh', 'Crop Care', 'Agri', 'Sai', 'Balaji', 'Ganesh', 'Gramin', 'Hariyali']
+SHOP_SUFFIXES = ['Seva Kendra', 'Agro Center', 'Pesticides & Seeds', 'Agro Store', 'Krishi Kendra',
+                 'Solutions & Supplies', 'Fertilizers', 'Agro Agencies', 'Traders', 'Beej Bhandar']
+FIRST_NAMES = ['Ramesh', 'Suresh', 'Vijay', 'Prakash', 'Santosh', 'Ganesh', 'Anil', 'Sunil', 'Rajesh',
+               'Mahesh', 'Sita', 'Lakshmi', 'Kavita', 'Anita', 'Pooja', 'Harpreet', 'Gurpreet',
+               'Arjun', 'Ravi', 'Manoj', 'Deepak', 'Meena', 'Asha', 'Kiran', 'Mohan']
+LAST_NAMES = ['Patil', 'Kamble', 'Deshmukh', 'Jadhav', 'More', 'Shinde', 'Singh', 'Kumar', 'Sharma',
+              'Yadav', 'Reddy', 'Naidu', 'Gowda', 'Iyer', 'Das', 'Ghosh', 'Patel', 'Chauhan',
+              'Verma', 'Mishra']
+STREETS = ['Market Yard', 'Main Road', 'Near Bus Stand', 'Station Road', 'APMC Market', 'Mandi Road',
+           'Shop Complex', 'Gandhi Chowk', 'Near Railway Station', 'Tehsil Road']
+PRODUCTS = ['Insecticides', 'Fungicides', 'Herbicides', 'Seeds', 'Fertilizers', 'Bio-fertilizers',
+            'Organic Fertilizers', 'Sprayers', 'Safety Equipment', 'Tools', 'Irrigation Equipment',
+            'Growth Regulators', 'Weedicides']
+OPENING_TIMES = ['07:00:00', '07:30:00', '08:00:00', '08:30:00', '09:00:00']
+CLOSING_TIMES = ['19:00:00', '20:00:00', '20:30:00', '21:00:00']
+
+# Options offered by the irrigation and yield pages in ml_modules.py
+IRRIGATION_CROPS = ["Rice", "Maize", "Wheat", "Cotton", "Sugarcane", "Pulses", "Vegetables"]
+SOIL_TYPES = ["Sandy", "Loamy", "Clay", "Silt", "Peat"]
+GROWTH_STAGES = ["Early", "Mid", "Late", "Harvest"]
+YIELD_STATES = ["Andhra Pradesh", "Bihar", "Gujarat", "Haryana", "Karnataka", "Maharashtra",
+                "Punjab", "Tamil Nadu", "Uttar Pradesh", "West Bengal"]
+YIELD_CROPS = ["Rice", "Wheat", "Maize", "Cotton", "Pulses", "Sugarcane"]
+SEASONS = ["Kharif", "Rabi", "Summer", "Whole Year"]
+
+# Share of each prediction type in generated history
+PREDICTION_MIX = {'crop': 0.6, 'irrigation': 0.25, 'yield': 0.15}
+
+SYNTHETIC_PASSWORD = "farmer123"
+
+
+def open_bulk_connection(db_name):
+    """
+    Open a connection tuned for one-off bulk loads
+
+    The rollback journal is kept in memory and fsyncs are skipped, which is
+    only safe because a crashed load is simply re-run on a fresh file.
+    """
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+    return conn
+
+
+def bulk_insert(conn, sql, chunks, label, total):
+    """
+    Insert chunks of rows with executemany, one transaction per chunk
+
+    Args:
+        conn: Bulk-load connection
+        sql: Parameterized INSERT statement
+        chunks: Iterable of row lists
+        label: Name shown in progress output
+        total: Expected row count (for progress only)
+
+    Returns:
+        int: Rows inserted
+    """
+    started = time.time()
+    inserted = 0
+    for rows in chunks:
+        with conn:
+            conn.executemany(sql, rows)
+        inserted += len(rows)
+        elapsed = time.time() - started
+        rate = inserted / elapsed if elapsed > 0 else 0
+        print(f"\r{label}: {inserted:,}/{total:,} rows ({rate:,.0f} rows/s)", end="", flush=True)
+    print()
+    return inserted
+
+
+def _chunk_sizes(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield min(chunk_size, total - start)
+
+
+def _timestamps(rng, count, days):
+    """Random 'YYYY-MM-DD HH:MM:SS' strings within the last `days` days"""
+    now = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    offsets = rng.integers(0, days * 86400, size=count).astype('timedelta64[s]')
+    return [value.replace('T', ' ') for value in np.datetime_as_string(now - offsets, unit='s')]
+
+
+class SoilModel:
+    """Per-crop Gaussian fitted to the bundled recommendation dataset"""
+
+    def __init__(self, data_path=DATA_PATH):
+        dataset = load_dataset(data_path)
+        X = dataset.matrix(FEATURE_COLUMNS)
+        codes = np.asarray(dataset.codes(LABEL_COLUMN))
+        self.crops = list(dataset.categories(LABEL_COLUMN))
+        self.means = np.array([X[codes == i].mean(axis=0) for i in range(len(self.crops))])
+        self.stds = np.array([X[codes == i].std(axis=0) for i in range(len(self.crops))])
+        self.mins = np.array([X[codes == i].min(axis=0) for i in range(len(self.crops))])
+        self.maxs = np.array([X[codes == i].max(axis=0) for i in range(len(self.crops))])
+
+    def sample(self, rng, count):
+        """
+        Draw samples that stay inside each crop's observed feature range
+
+        Returns:
+            tuple: (features array of shape (count, 7), crop index array)
+        """
+        labels = rng.integers(0, len(self.crops), size=count)
+        features = rng.normal(self.means[labels], self.stds[labels])
+        features = np.clip(features, self.mins[labels], self.maxs[labels])
+        # N, P and K are whole numbers in the source data
+        features[:, :3] = np.round(features[:, :3])
+        return features, labels
+
+
+def generate_soil_samples(output_path, total, rng, soil_model, chunk_size=100000):
+    """
+    Write a Crop_Recommendation-style CSV with `total` synthetic rows
+
+    Returns:
+        int: Rows written
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    written = 0
+    started = time.time()
+    with open(output_path, 'w') as f:
+        f.write(",".join(FEATURE_COLUMNS + [LABEL_COLUMN]) + "\n")
+        for count in _chunk_sizes(total, chunk_size):
+            features, labels = soil_model.sample(rng, count)
+            lines = [
+                f"{int(row[0])},{int(row[1])},{int(row[2])},{row[3]:.6f},{row[4]:.6f},{row[5]:.6f},"
+                f"{row[6]:.6f},{soil_model.crops[label]}\n"
+                for row, label in zip(features.tolist(), labels.tolist())
+            ]
+            f.writelines(lines)
+            written += count
+            rate = written / (time.time() - started or 1)
+            print(f"\rSoil samples: {written:,}/{total:,} rows ({rate:,.0f} rows/s)", end="", flush=True)
+    print()
+    return written
+
+
+def user_chunks(rng, total, first_id, chunk_size, password_hash):
+    """Yield users rows; e-mail and mobile are unique per generated id"""
+    for start in range(first_id, first_id + total, chunk_size):
+        count = min(chunk_size, first_id + total - start)
+        first = rng.integers(0, len(FIRST_NAMES), size=count)
+        last = rng.integers(0, len(LAST_NAMES), size=count)
+        created = _timestamps(rng, count, 730)
+        rows = []
+        for i in range(count):
+            user_number = start + i
+            rows.append((
+                f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}",
+                f"farmer{user_number}@synthetic.agrivision.in",
+                f"9{user_number:09d}",
+                password_hash,
+                'english',
+                created[i]
+            ))
+        yield rows
+
+
+def shop_chunks(rng, total, first_number, chunk_size):
+    """Yield pesticide_shops rows clustered around agricultural towns"""
+    weights = np.array([city[5] for city in CITIES], dtype=float)
+    weights /= weights.sum()
+
+    for start in range(first_number, first_number + total, chunk_size):
+        count = min(chunk_size, first_number + total - start)
+        cities = rng.choice(len(CITIES), size=count, p=weights)
+        # Roughly 15 km spread around each town centre
+        offsets = rng.normal(0, 0.12, size=(count, 2))
+        prefixes = rng.integers(0, len(SHOP_PREFIXES), size=count)
+        suffixes = rng.integers(0, len(SHOP_SUFFIXES), size=count)
+        owners = rng.integers(0, len(FIRST_NAMES), size=(count, 2))
+        streets = rng.integers(0, len(STREETS), size=count)
+        product_masks = rng.random((count, len(PRODUCTS))) < 0.35
+        ratings = np.round(rng.uniform(3.0, 5.0, size=count), 1)
+        opening = rng.integers(0, len(OPENING_TIMES), size=count)
+        closing = rng.integers(0, len(CLOSING_TIMES), size=count)
+        verified = rng.random(count) < 0.9
+        pin_suffix = rng.integers(1, 100, size=count)
+        offsets = offsets.tolist()
+        owners = owners.tolist()
+        ratings = ratings.tolist()
+        verified = verified.tolist()
+
+        rows = []
+        for i in range(count):
+            shop_number = start + i
+            city, state, lat, lng, pin_prefix, _ = CITIES[cities[i]]
+            products = [name for name, present in zip(PRODUCTS, product_masks[i]) if present] or ['Pesticides']
+            rows.append((
+                f"{SHOP_PREFIXES[prefixes[i]]} {SHOP_SUFFIXES[suffixes[i]]}",
+                f"{FIRST_NAMES[owners[i][0]]} {LAST_NAMES[owners[i][1] % len(LAST_NAMES)]}",
+                f"Shop No. {shop_number % 200 + 1}, {STREETS[streets[i]]}",
+                city,
+                state,
+                f"{pin_prefix}{pin_suffix[i]:03d}",
+                round(lat + offsets[i][0], 6),
+                round(lng + offsets[i][1], 6),
+                f"+91 9{shop_number:09d}",
+                f"shop{shop_number}@synthetic.agrivision.in",
+                ratings[i],
+                1,
+                OPENING_TIMES[opening[i]],
+                CLOSING_TIMES[closing[i]],
+                ",".join(products),
+                f"SYN/PEST/{shop_number:07d}",
+                int(verified[i])
+            ))
+        yield rows
+
+
+def history_chunks(rng, total, user_ids, chunk_size, soil_model):
+    """
+    Yield prediction_history rows with the same input_data layout MLModules saves
+
+    Crop rows are sampled from the soil model so inputs and results agree.
+    """
+    types = list(PREDICTION_MIX)
+    probabilities = np.array([PREDICTION_MIX[name] for name in types])
+    low, high = user_ids
+
+    for count in _chunk_sizes(total, chunk_size):
+        kinds = rng.choice(len(types), size=count, p=probabilities)
+        users = rng.integers(low, high + 1, size=count)
+        created = _timestamps(rng, count, 365)
+        crop_features, crop_labels = soil_model.sample(rng, count)
+        crop_features = crop_features.tolist()
+
+        # Irrigation and yield inputs are drawn for the whole chunk at once
+        soil_moisture = np.round(rng.uniform(5, 60, size=count), 1).tolist()
+        temperature = np.round(rng.uniform(15, 42, size=count), 1).tolist()
+        irrigation_rain = np.round(rng.uniform(0, 300, size=count), 1).tolist()
+        soil_types = rng.integers(0, len(SOIL_TYPES), size=count).tolist()
+        irrigation_crops = rng.integers(0, len(IRRIGATION_CROPS), size=count).tolist()
+        stages = rng.integers(0, len(GROWTH_STAGES), size=count).tolist()
+        areas = np.round(rng.uniform(0.5, 20, size=count), 1).tolist()
+        states = rng.integers(0, len(YIELD_STATES), size=count).tolist()
+        yield_crops = rng.integers(0, len(YIELD_CROPS), size=count).tolist()
+        seasons = rng.integers(0, len(SEASONS), size=count).tolist()
+        yield_rain = np.round(rng.uniform(300, 2000, size=count), 1).tolist()
+        fertilizer = np.round(rng.uniform(50, 300, size=count), 1).tolist()
+        years = rng.integers(2015, 2025, size=count).tolist()
+        yields = rng.gamma(4.0, 0.8, size=count).tolist()
+        kinds = kinds.tolist()
+        users = users.tolist()
+
+        rows = []
+        for i in range(count):
+            prediction_type = types[kinds[i]]
+            if prediction_type == 'crop':
+                N, P, K, temp, humidity, ph, rainfall = crop_features[i]
+                input_data = {'N': int(N), 'P': int(P), 'K': int(K), 'temp': round(temp, 1),
+                              'humidity': round(humidity, 1), 'ph': round(ph, 1), 'rainfall': round(rainfall, 1)}
+                result = soil_model.crops[crop_labels[i]]
+            elif prediction_type == 'irrigation':
+                input_data = {
+                    'soil_moisture': soil_moisture[i],
+                    'temperature': temperature[i],
+                    'rainfall': irrigation_rain[i],
+                    'soil_type': SOIL_TYPES[soil_types[i]],
+                    'crop': IRRIGATION_CROPS[irrigation_crops[i]],
+                    'growth_stage': GROWTH_STAGES[stages[i]]
+                }
+                needs_water = soil_moisture[i] < 30 and irrigation_rain[i] < 100
+                result = "Irrigation Required" if needs_water else "No Irrigation Needed"
+            else:
+                input_data = {
+                    'area': areas[i],
+                    'state': YIELD_STATES[states[i]],
+                    'crop': YIELD_CROPS[yield_crops[i]],
+                    'season': SEASONS[seasons[i]],
+                    'rainfall': yield_rain[i],
+                    'fertilizer': fertilizer[i],
+                    'year': years[i]
+                }
+                result = f"{yields[i]:.2f} tons/ha"
+            rows.append((users[i], prediction_type, json.dumps(input_data), result, created[i]))
+        yield rows
+
+
+def generate(db_name, users=0, shops=0, history=0, soil_samples=0, soil_output=None,
+             seed=42, chunk_size=50000):
+    """
+    Generate and load every requested dataset
+
+    Args:
+        db_name: SQLite database to load (created with the app schema if missing)
+        users: Users to add
+        shops: Pesticide shops to add
+        history: prediction_history rows to add
+        soil_samples: Rows for the synthetic soil CSV
+        soil_output: Path of the soil CSV
+        seed: Random seed, so runs are reproducible
+        chunk_size: Rows per executemany transaction
+
+    Returns:
+        dict: Rows generated per dataset and elapsed seconds
+    """
+    started = time.time()
+    rng = np.random.default_rng(seed)
+    soil_model = SoilModel()
+    summary = {}
+
+    if soil_samples:
+        summary['soil_samples'] = generate_soil_samples(soil_output, soil_samples, rng, soil_model)
+
+    # Creates the schema and default reference data on a fresh file
+    db = Database(db_name)
+    conn = open_bulk_connection(db_name)
+    try:
+        if users:
+            first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]) + 1
+            summary['users'] = bulk_insert(conn, '''
+                INSERT INTO users (name, email, mobile, password, language, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', user_chunks(rng, users, first_id, chunk_size, db.hash_password(SYNTHETIC_PASSWORD)),
+                'Users', users)
+
+        if shops:
+            first_number = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM pesticide_shops").fetchone()[0]) + 1
+            summary['shops'] = bulk_insert(conn, '''
+                INSERT INTO pesticide_shops (shop_name, owner_name, address, city, state, pincode,
+                                             latitude, longitude, phone, email, rating, is_open,
+                                             opening_time, closing_time, products_available,
+                                             license_number, verified)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', shop_chunks(rng, shops, first_number, chunk_size), 'Shops', shops)
+            with conn:
+                reference_cache.bump_generation(conn, 'shops')
+
+        if history:
+            user_range = conn.execute("SELECT MIN(id), MAX(id) FROM users").fetchone()
+            if user_range[0] is None:
+                print("No users in the database; generate users before prediction history")
+            else:
+                summary['history'] = bulk_insert(conn, '''
+                    INSERT INTO prediction_history (user_id, prediction_type, input_data, result, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', history_chunks(rng, history, user_range, chunk_size, soil_model), 'Prediction history', history)
+
+        # Refresh planner statistics after the bulk load
+        db_maintenance.analyze_tables(conn)
+    finally:
+        conn.close()
+
+    summary['elapsed_seconds'] = round(time.time() - started, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic AgriVision data for load tests")
+    parser.add_argument('--db', default='agrivision_synthetic.db', help='SQLite database to load')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Preset volumes')
+    parser.add_argument('--users', type=int, help='Users to add (overrides the preset)')
+    parser.add_argument('--shops', type=int, help='Pesticide shops to add (overrides the preset)')
+    parser.add_argument('--history', type=int, help='Prediction history rows to add (overrides the preset)')
+    parser.add_argument('--soil-samples', type=int, help='Soil sample CSV rows (overrides the preset)')
+    parser.add_argument('--soil-output', default='data/synthetic/Crop_Recommendation_synthetic.csv',
+                        help='Where to write the soil sample CSV')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per transaction')
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for key in volumes:
+        override = getattr(args, key)
+        if override is not None:
+            volumes[key] = override
+
+    if os.path.abspath(args.db) == os.path.abspath('agrivision.db'):
+        print("Refusing to load synthetic data into the application database agrivision.db")
+        return False
+
+    print(f"Generating into {args.db}: " + ", ".join(f"{key}={value:,}" for key, value in volumes.items()))
+    summary = generate(args.db, soil_output=args.soil_output, seed=args.seed,
+                       chunk_size=args.chunk_size, **volumes)
+    print(f"Done in {summary['elapsed_seconds']}s")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)
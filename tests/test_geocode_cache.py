@@ -0,0 +1,159 @@
+"""
+Tests for geocode_cache against a local stub geocoder
+"""
+
+import time
+import threading
+from collections import namedtuple
+
+import pytest
+
+import geocode_cache
+from geocode_cache import GeocodeCache, RateLimited, TokenBucket, normalize_address
+
+Location = namedtuple('Location', ['latitude', 'longitude', 'address'])
+
+PUNE = Location(18.5204, 73.8567, "Pune, Maharashtra, India")
+
+
+class StubGeocoder:
+    """geopy-style geocoder answering from a dict and counting upstream calls"""
+
+    def __init__(self, places=None, gate=None):
+        self.places = places or {}
+        self.gate = gate
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def geocode(self, query, timeout=None):
+        with self.lock:
+            self.calls.append(('geocode', query))
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.places.get(query.casefold())
+
+    def reverse(self, query, timeout=None):
+        with self.lock:
+            self.calls.append(('reverse', query))
+        return self.places.get(query)
+
+
+def make_cache(tmp_path, geocoder, limiter=None):
+    # A generous bucket so tests that are not about rate limiting never wait
+    return GeocodeCache(str(tmp_path / "geo.db"), geocoder=geocoder,
+                        limiter=limiter or TokenBucket(rate_per_second=1000, capacity=1000))
+
+
+def test_normalize_address():
+    assert normalize_address("Hadapsar,  PUNE.") == "hadapsar, pune"
+    assert normalize_address("hadapsar, pune, India") == "hadapsar, pune"
+    assert normalize_address("  Shop No. 4 (Main Rd), Nashik ") == "shop no 4 main rd, nashik"
+    assert normalize_address("Pune, Hadapsar") != normalize_address("Hadapsar, Pune")
+    assert normalize_address("   ") == ""
+    assert normalize_address(None) == ""
+
+
+def test_address_variants_share_one_entry(tmp_path):
+    geocoder = StubGeocoder({"hadapsar, pune": PUNE})
+    cache = make_cache(tmp_path, geocoder)
+
+    assert cache.geocode("hadapsar, pune") == (PUNE.latitude, PUNE.longitude)
+    assert cache.geocode("Hadapsar,  PUNE.") == (PUNE.latitude, PUNE.longitude)
+    assert cache.geocode("HADAPSAR, Pune, India") == (PUNE.latitude, PUNE.longitude)
+
+    assert len(geocoder.calls) == 1
+    assert cache.stats()['hits'] == 2
+
+
+def test_blank_address_never_goes_upstream(tmp_path):
+    geocoder = StubGeocoder()
+    cache = make_cache(tmp_path, geocoder)
+
+    assert cache.geocode("  ,  ") is None
+    assert geocoder.calls == []
+
+
+def test_concurrent_lookups_are_coalesced(tmp_path):
+    gate = threading.Event()
+    geocoder = StubGeocoder({"hadapsar, pune": PUNE}, gate=gate)
+    cache = make_cache(tmp_path, geocoder)
+    results = []
+
+    def lookup():
+        results.append(cache.geocode("Hadapsar, Pune"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    # Hold the upstream call open until every other caller is waiting on it
+    deadline = time.monotonic() + 5
+    while cache.stats()['coalesced'] < 19 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(geocoder.calls) == 1
+    assert results == [(PUNE.latitude, PUNE.longitude)] * 20
+    assert cache.stats()['coalesced'] == 19
+
+
+def test_not_found_is_cached_for_the_negative_ttl(tmp_path, monkeypatch):
+    geocoder = StubGeocoder({"hadapsar, pune": PUNE})
+    cache = make_cache(tmp_path, geocoder)
+
+    assert cache.geocode("Nowhere Village") is None
+    assert cache.geocode("nowhere village") is None
+    assert len(geocoder.calls) == 1
+    assert cache.stats()['negative_hits'] == 1
+    assert cache.geocode("Hadapsar, Pune") is not None
+
+    now = time.time()
+    monkeypatch.setattr(geocode_cache.time, 'time', lambda: now + geocode_cache.NEGATIVE_TTL_DAYS * 86400 + 1)
+
+    # The miss has expired and is asked again; the found address has not
+    assert cache.geocode("Nowhere Village") is None
+    assert cache.geocode("Hadapsar, Pune") == (PUNE.latitude, PUNE.longitude)
+    assert [query for _, query in geocoder.calls] == ["Nowhere Village", "Hadapsar, Pune", "Nowhere Village"]
+
+
+def test_upstream_errors_are_not_cached(tmp_path):
+    class FailingOnce(StubGeocoder):
+        def geocode(self, query, timeout=None):
+            if not self.calls:
+                self.calls.append(('geocode', query))
+                raise TimeoutError("upstream timed out")
+            return super().geocode(query, timeout)
+
+    geocoder = FailingOnce({"hadapsar, pune": PUNE})
+    cache = make_cache(tmp_path, geocoder)
+
+    with pytest.raises(TimeoutError):
+        cache.geocode("Hadapsar, Pune")
+    assert cache.geocode("Hadapsar, Pune") == (PUNE.latitude, PUNE.longitude)
+    assert cache.stats()['errors'] == 1
+
+
+def test_reverse_lookups_round_to_about_11_m(tmp_path):
+    geocoder = StubGeocoder({"18.5204, 73.8567": PUNE})
+    cache = make_cache(tmp_path, geocoder)
+
+    assert cache.reverse(18.52041, 73.85672) == PUNE.address
+    assert cache.reverse(18.52039, 73.85668) == PUNE.address
+    assert geocoder.calls == [('reverse', "18.5204, 73.8567")]
+
+
+def test_rate_limited_when_the_bucket_is_empty(tmp_path):
+    geocoder = StubGeocoder({"hadapsar, pune": PUNE})
+    # One token, refilled far slower than MAX_WAIT_SECONDS allows waiting for
+    cache = make_cache(tmp_path, geocoder, limiter=TokenBucket(rate_per_second=0.001, capacity=1))
+
+    assert cache.geocode("Hadapsar, Pune") is not None
+    with pytest.raises(RateLimited):
+        cache.geocode("Nashik")
+
+    # Cached answers are still served, and the refused lookup was not cached
+    assert cache.geocode("hadapsar, pune") is not None
+    assert len(geocoder.calls) == 1
+    assert cache.stats()['rate_limited'] == 1
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,148 @@
+"""
+Tests for places_client against a local stub Places server
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import places_client
+from places_client import PlacesClient, PlacesError
+
+
+class StubPlaces:
+    """
+    Canned Places API behaviour
+
+    Nearby searches return three pages of 20 results linked by
+    next_page_token. Place ids starting with 'flaky' answer 503 until they
+    have been asked `failures` times; 'down' always answers 503 and 'gone'
+    answers NOT_FOUND.
+    """
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def count(self, endpoint, value=None):
+        with self.lock:
+            return sum(1 for logged, params in self.requests
+                       if logged == endpoint and (value is None or value in params.values()))
+
+    def handle(self, endpoint, params):
+        with self.lock:
+            self.requests.append((endpoint, params))
+            seen = sum(1 for logged, logged_params in self.requests
+                       if logged == endpoint and logged_params == params)
+
+        if endpoint == 'nearbysearch':
+            page = int(params['pagetoken'][len('page-'):]) if 'pagetoken' in params else 1
+            body = {'status': 'OK',
+                    'results': [{'place_id': f"p{page}-{i}", 'name': f"Shop {page}-{i}"} for i in range(20)]}
+            if page < 3:
+                body['next_page_token'] = f"page-{page + 1}"
+            return 200, body
+
+        place_id = params.get('place_id', '')
+        if place_id == 'down' or (place_id.startswith('flaky') and seen <= self.failures):
+            return 503, {'status': 'UNKNOWN_ERROR'}
+        if place_id == 'gone':
+            return 200, {'status': 'NOT_FOUND'}
+        return 200, {'status': 'OK', 'result': {'name': f"Shop {place_id}"}}
+
+
+@pytest.fixture
+def stub():
+    places = StubPlaces()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.strip('/').split('/')[0]
+            params = {key: values[0] for key, values in parse_qs(url.query).items() if key != 'key'}
+            status, body = places.handle(endpoint, params)
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    places.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield places
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    # Stub page tokens are valid at once
+    monkeypatch.setattr(places_client, 'PAGE_TOKEN_DELAY_SECONDS', 0)
+    client = PlacesClient('test-key', base_url=stub.base_url)
+    yield client
+    client.executor.shutdown(wait=True)
+
+
+def test_nearby_search_follows_page_tokens(stub, client):
+    results = client.nearby_search(18.5204, 73.8567, radius=5000)
+
+    assert len(results) == 60
+    assert len({result['place_id'] for result in results}) == 60
+    assert stub.count('nearbysearch') == 3
+
+
+def test_nearby_search_is_cached_per_rounded_location(stub, client):
+    first = client.nearby_search(18.5204, 73.8567, radius=5000, max_pages=1)
+    # Within LOCATION_DECIMALS of the first search
+    second = client.nearby_search(18.52042, 73.85668, radius=5000, max_pages=1)
+
+    assert first == second
+    assert stub.count('nearbysearch') == 1
+    assert client.stats()['nearby_hits'] == 1
+
+    # Callers get their own list
+    second.clear()
+    assert len(client.nearby_search(18.5204, 73.8567, radius=5000, max_pages=1)) == 20
+
+    client.nearby_search(18.5204, 73.8567, radius=5000, max_pages=1, open_now=True)
+    assert stub.count('nearbysearch') == 2
+
+
+def test_details_retries_a_503(stub, client):
+    assert client.details('flaky-1') == {'name': "Shop flaky-1"}
+    assert stub.count('details', 'flaky-1') == 2
+
+
+def test_details_many_maps_a_failing_place_to_none(stub, client):
+    details = client.details_many(['a', 'down', 'b', 'a'])
+
+    assert details == {'a': {'name': "Shop a"}, 'down': None, 'b': {'name': "Shop b"}}
+    # The first try plus two retries, then the place is given up on
+    assert stub.count('details', 'down') == 3
+    assert stub.count('details', 'a') == 1
+
+
+def test_not_found_details_are_cached(stub, client):
+    assert client.details('gone') is None
+    assert client.details('gone') is None
+
+    assert stub.count('details', 'gone') == 1
+    assert client.stats()['details_hits'] == 1
+
+
+def test_error_status_raises(stub, client, monkeypatch):
+    monkeypatch.setattr(stub, 'handle', lambda endpoint, params: (200, {'status': 'REQUEST_DENIED',
+                                                                        'error_message': 'bad key'}))
+    with pytest.raises(PlacesError) as error:
+        client.nearby_search(18.5204, 73.8567)
+    assert error.value.status == 'REQUEST_DENIED'
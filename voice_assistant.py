@@ -148,19 +148,19 @@ class VoiceAssistant:
         # Search Pesticides
         if any(w in query for w in ['pesticide', 'medicine', 'spray', 'fungicide', 'herbicide']):
             # Try to extract pesticide name if possible, otherwise search general
-            pesticides = self.db.search_pesticides("")
+            pesticides, _ = self.db.get_pesticides_page(limit=3)
             if pesticides:
                 res = "🧪 **Commonly Used Pesticides:**\n\n"
-                for p in pesticides[:3]:
+                for p in pesticides:
                     res += f"🔹 **{p[0]}**: {p[2]}\n"
                 return res
         
         # Search Shops
         if any(w in query for w in ['shop', 'store', 'market', 'buy']):
-            shops = self.db.get_pesticide_shops()
+            shops, _ = self.db.get_pesticide_shops_page(limit=3)
             if shops:
                 res = "🏠 **Nearby Pesticide Shops:**\n\n"
-                for s in shops[:3]:
+                for s in shops:
                     res += f"🔹 **{s[1]}**: {s[3]}\n"
                 return res
         
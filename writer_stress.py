@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Write Concurrency Stress Test for AgriVision
+Starts several processes that each hammer save_prediction, create_user and
+add_pesticide_shop (as separate Streamlit processes would) while reader
+processes page through history and shops. Every operation builds its own
+Database, as each Streamlit rerun does, so construction is timed with the
+write or read it precedes. The run is repeated with direct
+writes and through the db_writer process, and reports throughput, latency
+percentiles and "database is locked" failures for both.
+
+Usage:
+    python writer_stress.py --db stress.db
+    python writer_stress.py --db stress.db --processes 16 --writes 500 --mode writer
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import subprocess
+import multiprocessing
+
+import numpy as np
+
+import db_writer
+from database import Database
+
+# Share of writes per operation; the rest are save_prediction
+CREATE_USER_SHARE = 0.1
+ADD_SHOP_SHARE = 0.1
+WRITER_START_TIMEOUT = 30
+
+
+def _write_worker(db_name, worker_id, writes, start, results):
+    rng = random.Random(worker_id)
+    latencies = []
+    locked = failed = 0
+    start.wait()
+    for i in range(writes):
+        roll = rng.random()
+        began = time.perf_counter()
+        try:
+            db = Database(db_name)
+            if roll < CREATE_USER_SHARE:
+                tag = f"{os.getpid()}-{i}-{rng.getrandbits(32)}"
+                db.create_user(f"Stress {tag}", f"stress-{tag}@example.com", None, "password")
+            elif roll < CREATE_USER_SHARE + ADD_SHOP_SHARE:
+                db.add_pesticide_shop({
+                    'shop_name': f"Stress Shop {worker_id}-{i}",
+                    'address': f"{i} Market Road",
+                    'latitude': 18.5 + rng.random() / 10,
+                    'longitude': 73.8 + rng.random() / 10
+                })
+            else:
+                db.save_prediction(1, 'crop', {'N': rng.randint(0, 140), 'P': rng.randint(5, 145),
+                                               'K': rng.randint(5, 205), 'temperature': 25.0,
+                                               'humidity': 70.0, 'ph': 6.5, 'rainfall': 120.0}, 'rice')
+            latencies.append(time.perf_counter() - began)
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e):
+                locked += 1
+            else:
+                failed += 1
+        except Exception:
+            failed += 1
+    results.put(('write', latencies, locked, failed))
+
+
+def _read_worker(db_name, start, stop, results):
+    latencies = []
+    failed = 0
+    start.wait()
+    while not stop.is_set():
+        began = time.perf_counter()
+        try:
+            db = Database(db_name)
+            db.get_prediction_history_page(1, limit=20)
+            db.get_pesticide_shops_page(limit=20)
+            latencies.append(time.perf_counter() - began)
+        except sqlite3.Error:
+            failed += 1
+    results.put(('read', latencies, 0, failed))
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50': None, 'p99': None, 'max': None}
+    values = np.array(latencies) * 1000
+    return {'p50': round(float(np.percentile(values, 50)), 1), 'p99': round(float(np.percentile(values, 99)), 1),
+            'max': round(float(values.max()), 1)}
+
+
+def run(db_name, processes, writes, readers):
+    """
+    One stress round against whatever write path Database picks up
+
+    Returns:
+        dict: Write and read throughput, latency percentiles (ms) and failures
+    """
+    start = multiprocessing.Event()
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_write_worker, args=(db_name, n, writes, start, results))
+               for n in range(processes)]
+    reader_workers = [multiprocessing.Process(target=_read_worker, args=(db_name, start, stop, results))
+                      for _ in range(readers)]
+    for worker in workers + reader_workers:
+        worker.start()
+
+    time.sleep(1.0)  # let every process open the database before the clock starts
+    began = time.perf_counter()
+    start.set()
+    collected = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - began
+    stop.set()
+    collected += [results.get() for _ in reader_workers]
+    for worker in workers + reader_workers:
+        worker.join()
+
+    write_latencies = [value for kind, latencies, _, _ in collected if kind == 'write' for value in latencies]
+    read_latencies = [value for kind, latencies, _, _ in collected if kind == 'read' for value in latencies]
+    return {
+        'seconds': round(elapsed, 2),
+        'writes': len(write_latencies),
+        'writes_per_second': round(len(write_latencies) / elapsed, 1),
+        'locked': sum(locked for kind, _, locked, _ in collected if kind == 'write'),
+        'failed': sum(failed for kind, _, _, failed in collected if kind == 'write'),
+        'write_ms': _percentiles(write_latencies),
+        'reads_per_second': round(len(read_latencies) / elapsed, 1),
+        'read_failed': sum(failed for kind, _, _, failed in collected if kind == 'read'),
+        'read_ms': _percentiles(read_latencies)
+    }
+
+
+def start_writer(db_name):
+    """Launch db_writer.py for db_name and wait until it accepts connections"""
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_writer.py'),
+                                '--db', db_name])
+    deadline = time.time() + WRITER_START_TIMEOUT
+    while time.time() < deadline:
+        client = db_writer.get_client(db_name)
+        if client is not None:
+            try:
+                client.stats()
+                return process
+            except (db_writer.WriterUnavailable, ConnectionError):
+                pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The writer process did not start")
+
+
+def _print_result(label, result):
+    print(f"\n{label}")
+    print(f"  writes: {result['writes']:,} ok in {result['seconds']}s ({result['writes_per_second']:,}/s), "
+          f"{result['locked']} 'database is locked', {result['failed']} other failures")
+    print(f"  write latency ms: p50 {result['write_ms']['p50']}, p99 {result['write_ms']['p99']}, "
+          f"max {result['write_ms']['max']}")
+    print(f"  reads: {result['reads_per_second']:,} page pairs/s, {result['read_failed']} failures; "
+          f"latency ms p50 {result['read_ms']['p50']}, p99 {result['read_ms']['p99']}, max {result['read_ms']['max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriVision write concurrency stress test")
+    parser.add_argument('--db', default='stress.db', help='SQLite database (created if missing)')
+    parser.add_argument('--processes', type=int, default=8, help='Writer processes')
+    parser.add_argument('--writes', type=int, default=300, help='Writes per process')
+    parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+    parser.add_argument('--mode', choices=['direct', 'writer', 'both'], default='both')
+    args = parser.parse_args()
+
+    if db_writer.get_client(args.db) is not None:
+        print(f"A writer socket already exists for {args.db}; stop that writer first")
+        return False
+
+    db = Database(args.db)
+    if db.get_user(1) is None:
+        db.create_user("Stress Farmer", "stress-farmer@example.com", None, "password")
+    conn = sqlite3.connect(args.db)
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+
+    print(f"{args.processes} writer processes x {args.writes} writes, {args.readers} reader processes")
+    if args.mode in ('direct', 'both'):
+        _print_result(f"Direct writes (journal_mode={journal_mode})", run(args.db, args.processes, args.writes, args.readers))
+
+    if args.mode in ('writer', 'both'):
+        writer = start_writer(args.db)
+        try:
+            result = run(args.db, args.processes, args.writes, args.readers)
+            stats = db_writer.get_client(args.db).stats()
+        finally:
+            writer.terminate()
+            writer.wait()
+        _print_result("Through db_writer (journal_mode=wal)", result)
+        print(f"  {stats['writes']:,} writes in {stats['batches']:,} transactions "
+              f"(avg {stats['writes'] / max(stats['batches'], 1):.1f}, largest {stats['largest_batch']})")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    if not success:
+        sys.exit(1)